@@ -0,0 +1,303 @@
+import asyncio
+import copy
+import json
+import logging
+import threading
+import time
+import uuid
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+import config
+from api.session_store import SessionStore, create_session_store
+from helper.metrics import metrics
+from rag.rag_engine import rag_engine
+from services.conversation_state import ConversationState
+from services.generate_response import GenerateResponseService
+from services.startup import mark, prewarm, startup_report
+
+logger = logging.getLogger(__name__)
+
+
+class ChatRequest(BaseModel):
+    message: str = Field(min_length=1, max_length=4000)
+    # Omit to start a new session; the reply carries the ID to send on later turns
+    session_id: Optional[str] = None
+
+
+class ChatResponse(BaseModel):
+    session_id: str
+    reply: str
+    latency_ms: float
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class CapacitySlot:
+    """One admitted request's share of the worker pool and queue
+
+    Held from admission until the pipeline work it submitted has finished on its worker,
+    which can be after the request itself has timed out. Releasing is idempotent.
+    """
+
+    def __init__(self, chat_api: "ChatAPI"):
+        self.chat_api = chat_api
+        # Set once a worker owns the slot; from then on only the worker releases it
+        self.submitted = False
+        self._released = False
+
+    def release(self) -> None:
+        with self.chat_api._capacity_lock:
+            if self._released:
+                return
+            self._released = True
+            self.chat_api.in_flight -= 1
+
+    def release_unsubmitted(self) -> None:
+        """Release a slot whose work never reached a worker, e.g. a request cancelled while queued"""
+        if not self.submitted:
+            self.release()
+
+
+class SlotStreamingResponse(StreamingResponse):
+    """StreamingResponse that gives back its capacity slot even when the body is never iterated"""
+
+    def __init__(self, content: Any, slot: CapacitySlot, **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self.slot = slot
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.slot.release_unsubmitted()
+
+
+class ChatAPI:
+    """Runs turns of the blocking response pipeline on a bounded worker pool for the HTTP endpoints"""
+
+    def __init__(
+        self,
+        service: Optional[GenerateResponseService] = None,
+        store: Optional[SessionStore] = None,
+        worker_threads: int = config.API_WORKER_THREADS,
+        max_queued: int = config.API_MAX_QUEUED_REQUESTS,
+        timeout: float = config.API_REQUEST_TIMEOUT_SECONDS,
+    ):
+        self.service = service if service is not None else GenerateResponseService()
+        # Not `store or ...`: an empty store is falsy
+        self.store = store if store is not None else create_session_store()
+        self.executor = ThreadPoolExecutor(max_workers=worker_threads, thread_name_prefix="api-worker")
+        self.capacity = worker_threads + max_queued
+        self.timeout = timeout
+        # Admitted requests, counted until their work leaves the worker pool
+        self.in_flight = 0
+        self._capacity_lock = threading.Lock()
+        # Turns of one session run one at a time so each sees the previous turn's state
+        self._session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def reserve(self, endpoint: str) -> CapacitySlot:
+        """Take a worker or queue slot, refusing with 503 rather than queue without bound once all are taken"""
+        with self._capacity_lock:
+            if self.in_flight < self.capacity:
+                self.in_flight += 1
+                return CapacitySlot(self)
+        metrics.increment("shopez_api_rejected_total", help_text="Requests refused because every worker was busy",
+                          endpoint=endpoint)
+        raise HTTPException(status_code=503, detail="Server busy, retry shortly")
+
+    def submit(self, slot: CapacitySlot, fn: Callable[..., Any], *args: Any) -> Future:
+        """Run fn on the worker pool; the slot is released when the worker is done with it, not before"""
+        def run() -> Any:
+            try:
+                return fn(*args)
+            finally:
+                slot.release()
+
+        future = self.executor.submit(run)
+        slot.submitted = True
+        return future
+
+    @staticmethod
+    def abandon(slot: CapacitySlot, future: Future) -> None:
+        """Give up on work that has not started yet; work already running keeps its slot until it ends"""
+        if future.cancel():
+            slot.release()
+
+    def _session_lock(self, session_id: str) -> asyncio.Lock:
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._session_locks[session_id] = lock
+        return lock
+
+    def _load_state(self, session_id: str) -> ConversationState:
+        # Work on a copy: a turn that times out must not change the stored session after the fact
+        state = self.store.load(session_id)
+        return copy.deepcopy(state) if state is not None else ConversationState()
+
+    async def chat(self, request: ChatRequest) -> ChatResponse:
+        session_id = request.session_id or uuid.uuid4().hex
+        slot = self.reserve("chat")
+        start = time.perf_counter()
+        try:
+            with metrics.span("api.chat") as span:
+                async with self._session_lock(session_id):
+                    state = self._load_state(session_id)
+                    future = self.submit(slot, self.service.generate_response, request.message, state)
+                    try:
+                        # shield: a timed-out turn keeps running on its worker, holding its slot until it ends
+                        reply = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+                    except asyncio.TimeoutError:
+                        span.update(timed_out=True)
+                        self.abandon(slot, future)
+                        raise HTTPException(status_code=504, detail="Timed out generating a reply")
+                    except asyncio.CancelledError:
+                        # Client went away
+                        self.abandon(slot, future)
+                        raise
+                    self.store.save(session_id, state)
+        finally:
+            slot.release_unsubmitted()
+        return ChatResponse(session_id=session_id, reply=reply, latency_ms=round((time.perf_counter() - start) * 1000, 1))
+
+    async def stream(self, request: ChatRequest, slot: Optional[CapacitySlot] = None) -> AsyncIterator[str]:
+        """Server-sent events: one "token" event per chunk, then "done" (or "error")
+
+        Pass the slot reserved when the request was admitted; without one a slot is reserved here.
+        """
+        session_id = request.session_id or uuid.uuid4().hex
+        slot = slot if slot is not None else self.reserve("stream")
+        future: Optional[Future] = None
+        loop = asyncio.get_running_loop()
+        tokens: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+        start = time.perf_counter()
+        deadline = loop.time() + self.timeout
+
+        def produce(state: ConversationState) -> None:
+            stream = self.service.stream_response(request.message, state)
+            try:
+                for token in stream:
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(tokens.put_nowait, ("token", token))
+                else:
+                    loop.call_soon_threadsafe(tokens.put_nowait, ("done", None))
+            except Exception as e:
+                logger.error(f"Error streaming reply for session {session_id}: {e}")
+                loop.call_soon_threadsafe(tokens.put_nowait, ("error", str(e)))
+            finally:
+                # Closing early stops generation and skips recording the unfinished turn
+                stream.close()
+
+        try:
+            with metrics.span("api.stream") as span:
+                async with self._session_lock(session_id):
+                    state = self._load_state(session_id)
+                    future = self.submit(slot, produce, state)
+                    first_token_ms = None
+                    while True:
+                        try:
+                            kind, value = await asyncio.wait_for(tokens.get(), max(deadline - loop.time(), 0))
+                        except asyncio.TimeoutError:
+                            span.update(timed_out=True)
+                            yield sse_event("error", {"session_id": session_id, "detail": "Timed out generating a reply"})
+                            return
+                        if kind == "token":
+                            if first_token_ms is None:
+                                first_token_ms = round((time.perf_counter() - start) * 1000, 1)
+                            yield sse_event("token", {"text": value})
+                        elif kind == "error":
+                            yield sse_event("error", {"session_id": session_id, "detail": "Error generating a reply"})
+                            return
+                        else:
+                            self.store.save(session_id, state)
+                            yield sse_event("done", {
+                                "session_id": session_id,
+                                "first_token_ms": first_token_ms,
+                                "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+                            })
+                            return
+        finally:
+            cancelled.set()
+            if future is not None:
+                self.abandon(slot, future)
+            slot.release_unsubmitted()
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_app(chat_api: Optional[ChatAPI] = None) -> FastAPI:
+    state = {"chat_api": chat_api}
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        if state["chat_api"] is None:
+            state["chat_api"] = ChatAPI()
+        prewarm()
+        mark("ready")
+        yield
+        state["chat_api"].close()
+
+    app = FastAPI(title="ShopEZ chat API", lifespan=lifespan)
+
+    @app.post("/chat", response_model=ChatResponse)
+    async def chat(request: ChatRequest):
+        return await state["chat_api"].chat(request)
+
+    @app.post("/chat/stream")
+    async def chat_stream(request: ChatRequest):
+        # Reserved before the response starts, while a 503 can still be sent
+        chat_api = state["chat_api"]
+        slot = chat_api.reserve("stream")
+        return SlotStreamingResponse(
+            chat_api.stream(request, slot),
+            slot,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.delete("/sessions/{session_id}")
+    async def delete_session(session_id: str):
+        if not state["chat_api"].store.delete(session_id):
+            raise HTTPException(status_code=404, detail="Unknown session")
+        return {"deleted": session_id}
+
+    @app.get("/health")
+    async def health():
+        chat_api = state["chat_api"]
+        return {
+            "rag": rag_engine.health(),
+            "startup": startup_report(),
+            "in_flight": chat_api.in_flight,
+            "capacity": chat_api.capacity,
+            "sessions": len(chat_api.store),
+        }
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def prometheus_metrics():
+        return metrics.render_prometheus()
+
+    return app
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    logging.basicConfig(level=config.LOG_LEVEL, format=config.LOG_FORMAT)
+    if config.API_WORKERS > 1 and config.API_SESSION_STORE == "memory":
+        logger.warning("Several API workers with the in-memory session store: sessions are not shared between them")
+    uvicorn.run("api.server:app", host=config.API_HOST, port=config.API_PORT, workers=config.API_WORKERS)
@@ -6,25 +6,33 @@ import logging
 
 # Import our custom modules
 from config import *
-from services.generate_response import GenerateResponseService
+from services.generate_response import GenerateResponseService, TurnInfo
+from services.conversation_state import ConversationState
+from rag.rag_engine import rag_engine
+from helper.metrics import start_metrics_server
+from services.startup import mark, prewarm
 import config
 import os
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
-# logger = logging.get# logger(__name__)
-os.environ["GEMINI_API_KEY"] = config.GEMINI_API_KEY
+logger = logging.getLogger(__name__)
+if config.GEMINI_API_KEY:
+    os.environ["GEMINI_API_KEY"] = config.GEMINI_API_KEY
 
 class ChatbotApp:
     def __init__(self):
         self.generate_response_service = GenerateResponseService()
+        prewarm()
+        if config.METRICS_SERVER_ENABLED:
+            start_metrics_server()
         
     def initialize_session_state(self):
         """Initialize session state variables"""
         if "messages" not in st.session_state:
             st.session_state.messages = []
-        if "conversation_history" not in st.session_state:
-            st.session_state.conversation_history = []
+        if "conversation_state" not in st.session_state:
+            st.session_state.conversation_state = ConversationState()
             
     def setup_page_config(self):
         """Configure Streamlit page settings"""
@@ -55,7 +63,7 @@ class ChatbotApp:
             
             if st.button("🗑️ Clear Chat History", type="secondary"):
                 st.session_state.messages = []
-                st.session_state.conversation_history = []
+                st.session_state.conversation_state = ConversationState()
                 st.rerun()
                 
             # st.markdown("---")
@@ -95,7 +103,7 @@ class ChatbotApp:
         # Chat input
         if prompt := st.chat_input("Type your message here..."):
             # Add user message
-            print(f"messages: {prompt}")
+            logger.debug(f"messages: {prompt}")
             st.session_state.messages.append({
                 "role": "user", 
                 "content": prompt
@@ -114,14 +122,16 @@ class ChatbotApp:
             # Process and display assistant response
             # with st.chat_message("assistant"):
             with chat_container:
-                with st.spinner("Thinking..."):
-                    response = self.generate_response_service.generate_response(prompt, st.session_state.messages)
-                
-                st.markdown(f"""
-                <div style="background-color:#333333; padding: 1rem; border-radius: 10px; color: white; margin-bottom: 0.5rem;">
-                    <strong>Assistant:</strong><br>{response}
-                </div>
-                """, unsafe_allow_html=True)
+                placeholder = st.empty()
+                placeholder.markdown(self._assistant_bubble("<em>Thinking...</em>"), unsafe_allow_html=True)
+
+                response = ""
+                turn = TurnInfo()
+                for token in self.generate_response_service.stream_response(
+                    prompt, st.session_state.conversation_state, turn
+                ):
+                    response += token
+                    placeholder.markdown(self._assistant_bubble(response), unsafe_allow_html=True)
                 
                 # Add assistant message with timestamp
                 current_time = datetime.now().strftime("%H:%M")
@@ -130,9 +140,36 @@ class ChatbotApp:
                     "content": response,
                     "timestamp": current_time
                 })
+                # The on-screen transcript is capped; the model only ever sees conversation_state
+                del st.session_state.messages[:-config.MAX_TRANSCRIPT_MESSAGES]
                 
-                st.caption(f"⏰ {current_time}")
+                if turn.time_to_first_token is not None:
+                    st.caption(
+                        f"⏰ {current_time} · first token {turn.time_to_first_token:.2f}s"
+                        f" · total {turn.total:.2f}s"
+                    )
+                else:
+                    st.caption(f"⏰ {current_time}")
+
+    def _assistant_bubble(self, content: str) -> str:
+        return f"""
+                <div style="background-color:#333333; padding: 1rem; border-radius: 10px; color: white; margin-bottom: 0.5rem;">
+                    <strong>Assistant:</strong><br>{content}
+                </div>
+                """
     
+    def render_status(self):
+        """Render readiness of the shared retrieval engine"""
+        health = rag_engine.health()
+        if health["ready"] and health["vector_store_reachable"]:
+            st.success("Policy search ready")
+            st.caption(f"{health['indexed_chunks']} chunks indexed")
+        elif health["status"] in ("failed", "degraded"):
+            st.error("Policy search unavailable")
+            st.caption(health["error"])
+        else:
+            st.info("Policy search warming up...")
+
     def run(self):
         """Main application entry point"""
         self.setup_page_config()
@@ -172,12 +209,16 @@ class ChatbotApp:
         
         with main_col:
             self.render_chat_interface()
+
+        with status_col:
+            self.render_status()
             
 
 if __name__ == "__main__":
     try:
         app = ChatbotApp()
         app.run()
+        mark("ready")
     except Exception as e:
         st.error(f"Failed to initialize application: {e}")
         # logger.error(f"Application initialization error: {e}")
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""Measure the latency the BM25 pass and rank fusion add to hybrid retrieval.
+
+Usage: python -m benchmarks.bench_lexical --sizes 1000 10000 50000
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from typing import Dict, List
+
+from langchain_core.documents import Document
+
+from benchmarks.bench_vector_backends import summarize
+from rag.hybrid_retriever import reciprocal_rank_fusion
+from rag.lexical_index import BM25Index
+
+VOCABULARY = (
+    "refund return exchange 30-day cod restocking fee shipping delivery order cancel warranty "
+    "damaged item replacement policy customer support payment card wallet invoice address "
+    "pickup courier tracking days business week prepaid voucher coupon discount sale final"
+).split()
+QUERIES = [
+    "what is the 30-day return policy",
+    "is cod available for my order",
+    "restocking fee on exchange",
+    "how long does a refund take to my card",
+    "can I cancel an order after shipping",
+]
+
+
+def synthetic_chunk(rng: random.Random, words: int = 120) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def bench_size(size: int, queries: int, fetch_k: int, k: int, rrf_k: int) -> Dict[str, float]:
+    rng = random.Random(size)
+    with tempfile.TemporaryDirectory(prefix="bench-lexical-") as tmp_dir:
+        index = BM25Index(f"{tmp_dir}/lexical_index.json")
+        start = time.perf_counter()
+        for i in range(size):
+            index.add(str(i), synthetic_chunk(rng), {"page": i})
+        index.save()
+        build_seconds = time.perf_counter() - start
+
+        # Stand-in dense ranking so fusion cost is measured on realistic list sizes
+        dense = [Document(page_content="", metadata={"_id": str(i)}) for i in rng.sample(range(size), min(fetch_k, size))]
+        search_samples: List[float] = []
+        fusion_samples: List[float] = []
+        for n in range(queries):
+            query = QUERIES[n % len(QUERIES)]
+            start = time.perf_counter()
+            hits = index.search(query, k=fetch_k)
+            search_samples.append(time.perf_counter() - start)
+
+            lexical = [Document(page_content="", metadata={"_id": doc_id}) for doc_id, _ in hits]
+            start = time.perf_counter()
+            reciprocal_rank_fusion([dense, lexical], k=k, rrf_k=rrf_k)
+            fusion_samples.append(time.perf_counter() - start)
+
+    return {
+        "build_s": build_seconds,
+        "bm25": summarize(search_samples),
+        "fusion": summarize(fusion_samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--rrf-k", type=int, default=60)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        row = {"size": size, **bench_size(size, args.queries, args.fetch_k, args.k, args.rrf_k)}
+        results.append(row)
+        print(
+            f"n={size:<8} build={row['build_s']:.2f}s "
+            f"bm25 p50={row['bm25']['p50_ms']:.3f}ms p95={row['bm25']['p95_ms']:.3f}ms "
+            f"fusion p50={row['fusion']['p50_ms']:.3f}ms p95={row['fusion']['p95_ms']:.3f}ms"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"fetch_k": args.fetch_k, "k": args.k, "rrf_k": args.rrf_k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
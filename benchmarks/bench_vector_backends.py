@@ -0,0 +1,165 @@
+"""Compare top-k search latency of the in-process NumPy index against Qdrant.
+
+Usage: python -m benchmarks.bench_vector_backends --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+import numpy as np
+
+from config import POLICY_SECTIONS, QDRANT_HOST, QDRANT_PORT
+from rag.vector_index import NumpyVectorIndex
+
+BENCH_COLLECTION = "bench-vector-backends"
+# Points are split into consecutive runs per policy section, the way ingestion writes them;
+# filtered searches ask for one section
+BENCH_SECTIONS = list(POLICY_SECTIONS)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000,
+    }
+
+
+def section_payload(n: int, size: int) -> Dict:
+    return {"metadata": {"section": BENCH_SECTIONS[n * len(BENCH_SECTIONS) // size]}}
+
+
+def bench_numpy(vectors: np.ndarray, queries: np.ndarray, k: int, dtype: str) -> Dict[str, float]:
+    index_dir = tempfile.mkdtemp(prefix="bench-numpy-index-")
+    try:
+        index = NumpyVectorIndex(index_dir, dim=vectors.shape[1], dtype=dtype, indexed_fields=("section",))
+        index.create()
+        ids = [str(uuid.uuid4()) for _ in range(len(vectors))]
+        start = time.perf_counter()
+        for offset in range(0, len(vectors), 1024):
+            index.upsert(
+                ids[offset:offset + 1024],
+                vectors[offset:offset + 1024],
+                [section_payload(n, len(vectors)) for n in range(offset, min(offset + 1024, len(vectors)))],
+            )
+        index.save()
+        ingest_seconds = time.perf_counter() - start
+
+        samples, filtered = [], []
+        where = {"section": BENCH_SECTIONS[:1]}
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, k=k)
+            samples.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            index.search(query, k=k, where=where)
+            filtered.append(time.perf_counter() - start)
+        return {"ingest_s": ingest_seconds, **summarize(samples), "filtered": summarize(filtered)}
+    finally:
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+
+def bench_qdrant(client, vectors: np.ndarray, queries: np.ndarray, k: int) -> Dict[str, float]:
+    from qdrant_client.models import (
+        Distance, FieldCondition, Filter, MatchAny, PayloadSchemaType, PointStruct, VectorParams,
+    )
+
+    if client.collection_exists(BENCH_COLLECTION):
+        client.delete_collection(BENCH_COLLECTION)
+    client.create_collection(
+        collection_name=BENCH_COLLECTION,
+        vectors_config=VectorParams(size=vectors.shape[1], distance=Distance.COSINE),
+    )
+    client.create_payload_index(BENCH_COLLECTION, field_name="metadata.section", field_schema=PayloadSchemaType.KEYWORD)
+    try:
+        start = time.perf_counter()
+        for offset in range(0, len(vectors), 1024):
+            client.upsert(
+                collection_name=BENCH_COLLECTION,
+                points=[
+                    PointStruct(id=str(uuid.uuid4()), vector=v.tolist(), payload=section_payload(offset + n, len(vectors)))
+                    for n, v in enumerate(vectors[offset:offset + 1024])
+                ],
+                wait=True,
+            )
+        ingest_seconds = time.perf_counter() - start
+
+        samples, filtered = [], []
+        section_filter = Filter(must=[FieldCondition(key="metadata.section", match=MatchAny(any=BENCH_SECTIONS[:1]))])
+        for query in queries:
+            start = time.perf_counter()
+            client.query_points(collection_name=BENCH_COLLECTION, query=query.tolist(), limit=k)
+            samples.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            client.query_points(collection_name=BENCH_COLLECTION, query=query.tolist(), limit=k, query_filter=section_filter)
+            filtered.append(time.perf_counter() - start)
+        return {"ingest_s": ingest_seconds, **summarize(samples), "filtered": summarize(filtered)}
+    finally:
+        client.delete_collection(BENCH_COLLECTION)
+
+
+def connect_qdrant(mode: str):
+    if mode == "skip":
+        return None
+    from qdrant_client import QdrantClient
+
+    if mode == "memory":
+        return QdrantClient(":memory:")
+    try:
+        client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+        client.get_collections()
+        return client
+    except Exception as e:
+        print(f"Qdrant server at {QDRANT_HOST}:{QDRANT_PORT} unavailable ({e}); skipping it")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--qdrant", choices=["server", "memory", "skip"], default="server")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    client = connect_qdrant(args.qdrant)
+    results = []
+    for size in args.sizes:
+        vectors = rng.standard_normal((size, args.dim), dtype=np.float32)
+        queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+        row = {"size": size, "numpy": bench_numpy(vectors, queries, args.k, args.dtype)}
+        if client is not None:
+            row["qdrant"] = bench_qdrant(client, vectors, queries, args.k)
+        results.append(row)
+
+        for backend in ("numpy", "qdrant"):
+            if backend in row:
+                r = row[backend]
+                print(
+                    f"{backend:>6} n={size:<8} ingest={r['ingest_s']:.2f}s "
+                    f"p50={r['p50_ms']:.3f}ms p95={r['p95_ms']:.3f}ms mean={r['mean_ms']:.3f}ms "
+                    f"filtered p50={r['filtered']['p50_ms']:.3f}ms"
+                )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"dim": args.dim, "k": args.k, "dtype": args.dtype, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""Replay multi-turn conversations from many concurrent sessions and report throughput and latency.
+
+Targets the in-process GenerateResponseService (stub LLM, hashing embeddings and the NumPy
+index, so no network is needed) or a running HTTP API (python -m api.server). Sessions come
+from a transcript file or are synthesized, and start either closed-loop (a fixed number of
+concurrent customers) or open-loop with Poisson arrivals.
+
+Transcript files are JSON or JSONL. Each session is a list of messages, or an object with a
+"turns" list whose items are strings or {"kind": ..., "message": ...}.
+
+Usage: python -m benchmarks.load_generator --sessions 50 --total-sessions 500 --think-time 0.5
+       python -m benchmarks.load_generator --arrival poisson --rate 20 --duration 60
+       python -m benchmarks.load_generator --target http --url http://localhost:8000 --stream
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from benchmarks.run_suite import enter_scratch_workdir, results_path, run_metadata, summarize, write_results
+
+# Replies the pipeline gives instead of failing outright
+DEGRADED_PREFIXES = (
+    "I apologize, but I'm having trouble",
+    "Could not determine the appropriate response",
+)
+
+SAMPLE_ORDER_IDS = ["ABC-123", "XYZ-456", "DEF-789", "GHI-012", "JKL-345", "MNO-678", "PQR-901", "STU-234"]
+POLICY_QUESTIONS = [
+    "What is your return policy?",
+    "How long does a refund take?",
+    "Do you offer cash on delivery?",
+    "Can I exchange an item for a different size?",
+    "Do you ship internationally?",
+    "How do I cancel my order?",
+]
+# Synthetic session shapes; {order_id}, {other_order_id} and {policy_question} are filled per session
+SESSION_TEMPLATES = [
+    [("chitchat", "Hi!"), ("order", "Where is my order {order_id}?"), ("order_followup", "When will it arrive?")],
+    [("policy", "{policy_question}"), ("policy_followup", "Does that apply to sale items too?"),
+     ("chitchat", "Thanks!")],
+    [("multi_order", "Can you check {order_id} and {other_order_id}?"), ("policy", "{policy_question}")],
+    [("order", "Status of {order_id} please"), ("policy", "{policy_question}"),
+     ("policy_followup", "And what if the item arrived damaged?"), ("chitchat", "Great, bye")],
+    [("unknown_order", "Where is order ZZZ-999?"), ("chitchat", "Okay, thank you")],
+]
+
+Session = List[Tuple[str, str]]
+
+
+@dataclass
+class TurnResult:
+    session: int
+    turn: int
+    kind: str
+    started_at: float
+    latency: float
+    ok: bool
+    degraded: bool = False
+    route: Optional[str] = None
+    first_token: Optional[float] = None
+    error: Optional[str] = None
+
+
+def synthetic_sessions(seed: int) -> Iterator[Session]:
+    rng = random.Random(seed)
+    while True:
+        order_id, other_order_id = rng.sample(SAMPLE_ORDER_IDS, 2)
+        fields = {
+            "order_id": order_id, "other_order_id": other_order_id, "policy_question": rng.choice(POLICY_QUESTIONS),
+        }
+        yield [(kind, message.format(**fields)) for kind, message in rng.choice(SESSION_TEMPLATES)]
+
+
+def load_transcripts(path: str) -> List[Session]:
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".jsonl"):
+        raw = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        raw = json.loads(text)
+    sessions = []
+    for item in raw:
+        turns = item.get("turns", []) if isinstance(item, dict) else item
+        if turns:
+            sessions.append([
+                (turn.get("kind", "replayed"), turn["message"]) if isinstance(turn, dict) else ("replayed", turn)
+                for turn in turns
+            ])
+    return sessions
+
+
+def replayed_sessions(sessions: List[Session]) -> Iterator[Session]:
+    if not sessions:
+        raise ValueError("No sessions to replay")
+    while True:
+        yield from sessions
+
+
+class ServiceTarget:
+    """In-process GenerateResponseService, shared by every worker thread as the API shares it"""
+
+    name = "service"
+
+    def __init__(self, stream: bool):
+        from db.structured_database_manager import DatabaseManager
+        from rag.rag_engine import rag_engine
+        from services.generate_response import GenerateResponseService
+
+        self.stream = stream
+        self.service = GenerateResponseService()
+        # Seed the sample orders the synthetic sessions ask about
+        DatabaseManager(recreate=True).close()
+        rag_engine.warm_up()
+
+    def new_session(self) -> Any:
+        from services.conversation_state import ConversationState
+
+        return ConversationState()
+
+    def send(self, session: Any, message: str) -> Tuple[str, Optional[str], Optional[float]]:
+        from services.generate_response import TurnInfo
+
+        turn = TurnInfo()
+        if self.stream:
+            reply = "".join(self.service.stream_response(message, session, turn))
+        else:
+            reply = self.service.generate_response(message, session, turn)
+        route = "+".join(str(name) for name in turn.tool_names) if turn.route else None
+        return reply, route, turn.time_to_first_token
+
+
+class HttpTarget:
+    """The HTTP chat API; routes are not reported over HTTP, so only per-kind breakdowns are available"""
+
+    name = "http"
+
+    def __init__(self, url: str, stream: bool, timeout: float):
+        import httpx
+
+        self.url = url.rstrip("/")
+        self.stream = stream
+        self.timeout = timeout
+        self._local = threading.local()
+        self._httpx = httpx
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self._httpx.Client(base_url=self.url, timeout=self.timeout)
+        return client
+
+    def new_session(self) -> Any:
+        return {"session_id": uuid.uuid4().hex}
+
+    def send(self, session: Any, message: str) -> Tuple[str, Optional[str], Optional[float]]:
+        payload = {"message": message, "session_id": session["session_id"]}
+        if not self.stream:
+            response = self._client().post("/chat", json=payload)
+            response.raise_for_status()
+            return response.json()["reply"], None, None
+
+        start = time.perf_counter()
+        first_token = None
+        parts = []
+        event = None
+        with self._client().stream("POST", "/chat/stream", json=payload) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    data = json.loads(line[len("data: "):])
+                    if event == "token":
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                        parts.append(data["text"])
+                    elif event == "error":
+                        raise RuntimeError(data.get("detail", "stream error"))
+        return "".join(parts), None, first_token
+
+
+class LoadGenerator:
+    def __init__(self, target, sessions: Iterator[Session], concurrency: int, think_time: float, seed: int):
+        self.target = target
+        self.sessions = sessions
+        self.concurrency = concurrency
+        self.think_time = think_time
+        self.results: List[TurnResult] = []
+        self.arrival_lag: List[float] = []
+        self._lock = threading.Lock()
+        self._session_ids = iter(range(1 << 62))
+        self._rng = random.Random(seed)
+
+    def _next_session(self) -> Tuple[int, Session]:
+        with self._lock:
+            return next(self._session_ids), next(self.sessions)
+
+    def _think(self) -> None:
+        if self.think_time > 0:
+            with self._lock:
+                pause = self._rng.expovariate(1 / self.think_time)
+            time.sleep(pause)
+
+    def run_session(self, session_id: int, turns: Session) -> None:
+        state = self.target.new_session()
+        for turn, (kind, message) in enumerate(turns):
+            if turn:
+                self._think()
+            started_at = time.time()
+            start = time.perf_counter()
+            try:
+                reply, route, first_token = self.target.send(state, message)
+                result = TurnResult(
+                    session_id, turn, kind, started_at, time.perf_counter() - start, ok=True,
+                    degraded=reply.startswith(DEGRADED_PREFIXES), route=route, first_token=first_token,
+                )
+            except Exception as e:
+                result = TurnResult(
+                    session_id, turn, kind, started_at, time.perf_counter() - start, ok=False,
+                    error=f"{type(e).__name__}: {e}"[:200],
+                )
+            with self._lock:
+                self.results.append(result)
+
+    def run_closed(self, total_sessions: int, duration: Optional[float]) -> None:
+        """Each of `concurrency` customers starts a new session as soon as the last one ends"""
+        deadline = time.monotonic() + duration if duration else None
+        remaining = [total_sessions]
+
+        def customer():
+            while True:
+                with self._lock:
+                    if remaining[0] <= 0 or (deadline and time.monotonic() >= deadline):
+                        return
+                    remaining[0] -= 1
+                self.run_session(*self._next_session())
+
+        threads = [threading.Thread(target=customer, daemon=True) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_poisson(self, rate: float, total_sessions: int, duration: Optional[float]) -> None:
+        """Sessions arrive at `rate` per second regardless of how fast earlier ones finish"""
+        deadline = time.monotonic() + duration if duration else None
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            next_arrival = time.monotonic()
+            for _ in range(total_sessions):
+                next_arrival += self._rng.expovariate(rate)
+                if deadline and next_arrival >= deadline:
+                    break
+                time.sleep(max(0.0, next_arrival - time.monotonic()))
+                executor.submit(self._run_arrival, next_arrival, *self._next_session())
+
+    def _run_arrival(self, arrival: float, session_id: int, turns: Session) -> None:
+        # Time a session waited for a free worker: grows once arrivals outpace capacity
+        lag = time.monotonic() - arrival
+        with self._lock:
+            self.arrival_lag.append(lag)
+        self.run_session(session_id, turns)
+
+
+def breakdown(results: List[TurnResult], key: str) -> Dict[str, Any]:
+    groups: Dict[str, List[TurnResult]] = {}
+    for result in results:
+        groups.setdefault(str(getattr(result, key)), []).append(result)
+    return {
+        name: {"turns": len(group), "errors": sum(not r.ok for r in group),
+               **summarize([r.latency for r in group if r.ok])}
+        for name, group in sorted(groups.items())
+    }
+
+
+def build_report(generator: LoadGenerator, wall_seconds: float) -> Dict[str, Any]:
+    results = generator.results
+    ok = [r for r in results if r.ok]
+    errors: Dict[str, int] = {}
+    for result in results:
+        if not result.ok:
+            kind = result.error.split(":", 1)[0]
+            errors[kind] = errors.get(kind, 0) + 1
+    return {
+        "wall_s": wall_seconds,
+        "sessions": len({r.session for r in results}),
+        "turns": len(results),
+        "throughput_turns_per_s": len(ok) / wall_seconds if wall_seconds else None,
+        "error_rate": (len(results) - len(ok)) / len(results) if results else None,
+        "degraded_rate": sum(r.degraded for r in ok) / len(ok) if ok else None,
+        "errors": errors,
+        "latency": summarize([r.latency for r in ok]),
+        "first_token": summarize([r.first_token for r in ok if r.first_token is not None]),
+        "arrival_lag": summarize(generator.arrival_lag),
+        "by_kind": breakdown(results, "kind"),
+        "by_route": breakdown(results, "route") if any(r.route for r in results) else {},
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    latency = report["latency"]
+    print(
+        f"{report['turns']} turns in {report['sessions']} sessions over {report['wall_s']:.1f}s: "
+        f"{report['throughput_turns_per_s']:.2f} turns/s, error rate {report['error_rate']:.2%}, "
+        f"degraded {report['degraded_rate'] or 0:.2%}"
+    )
+    if latency.get("count"):
+        print(f"  turn latency p50={latency['p50_ms']:.1f}ms p95={latency['p95_ms']:.1f}ms p99={latency['p99_ms']:.1f}ms")
+    for section in ("by_route", "by_kind"):
+        for name, row in report[section].items():
+            if row.get("count"):
+                print(f"  {section[3:]:>5} {name:<40} n={row['turns']:<6} p50={row['p50_ms']:.1f}ms "
+                      f"p95={row['p95_ms']:.1f}ms errors={row['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["service", "http"], default="service")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the HTTP API")
+    parser.add_argument("--stream", action="store_true", help="Use the streaming path and report time to first token")
+    parser.add_argument("--transcripts", help="JSON/JSONL sessions to replay instead of synthetic ones")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent sessions (workers)")
+    parser.add_argument("--total-sessions", type=int, default=200)
+    parser.add_argument("--duration", type=float, help="Stop starting sessions after this many seconds")
+    parser.add_argument("--arrival", choices=["closed", "poisson"], default="closed")
+    parser.add_argument("--rate", type=float, default=5.0, help="Session arrivals per second for --arrival poisson")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean seconds between a reply and the next message")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Seconds the fake chat model waits per call")
+    parser.add_argument("--timeout", type=float, default=120.0, help="HTTP request timeout")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="JSON results path (default benchmarks/results/load-<timestamp>.json)")
+    args = parser.parse_args()
+
+    output = results_path(args.output, prefix="load-")
+    transcripts = load_transcripts(os.path.abspath(args.transcripts)) if args.transcripts else None
+    if transcripts is not None and not transcripts:
+        parser.error(f"{args.transcripts} has no sessions with at least one turn")
+    sessions = replayed_sessions(transcripts) if transcripts else synthetic_sessions(args.seed)
+
+    if args.target == "service":
+        enter_scratch_workdir()
+        import config
+
+        config.STUB_LLM_LATENCY = args.stub_latency
+        target = ServiceTarget(stream=args.stream)
+    else:
+        target = HttpTarget(args.url, stream=args.stream, timeout=args.timeout)
+
+    generator = LoadGenerator(target, sessions, args.sessions, args.think_time, args.seed)
+    start = time.perf_counter()
+    if args.arrival == "poisson":
+        generator.run_poisson(args.rate, args.total_sessions, args.duration)
+    else:
+        generator.run_closed(args.total_sessions, args.duration)
+    report = build_report(generator, time.perf_counter() - start)
+
+    print_report(report)
+    write_results(output, {
+        **run_metadata(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "report": report,
+        "turns": [asdict(r) for r in generator.results],
+    })
+
+
+if __name__ == "__main__":
+    main()
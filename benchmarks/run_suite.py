@@ -0,0 +1,342 @@
+"""Offline per-stage benchmark suite: PDF parsing and chunking, embedding, top-k search,
+SQLite order lookups and full generate_response turns.
+
+Runs on CPU without Gemini, Qdrant or a downloaded model: the stub chat model, hashing
+embeddings and the NumPy vector index stand in for them. Everything is written to a
+scratch directory, and the results land in one JSON file so runs can be diffed.
+
+Usage: python -m benchmarks.run_suite --output benchmarks/results/latest.json
+       python -m benchmarks.run_suite --stages orders --order-sizes 1000 10000000
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import random
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+# Offline stand-ins; set before config is first imported since these are read at import time
+os.environ["LLM_BACKEND"] = "stub"
+os.environ["VECTOR_BACKEND"] = "numpy"
+os.environ["EMBEDDING_BACKEND"] = "stub"
+# Measure the pipeline, not the quota the scheduler would hold a real deployment to
+os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "100000000")
+os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "100000000000")
+
+STAGES = ("pdf", "embeddings", "search", "orders", "turns")
+
+# (kind, query) pairs replayed by the turns stage; follow-ups rely on the previous turn
+TURN_SCRIPT = [
+    ("chitchat", "Hi there!"),
+    ("order", "What is the status of my order ABC-123?"),
+    ("order_followup", "And when will it arrive?"),
+    ("policy", "What is your return policy?"),
+    ("policy_followup", "Does that apply to electronics too?"),
+    ("multi_order", "Can you check XYZ-456 and DEF-789?"),
+    ("policy", "Do you offer cash on delivery?"),
+    ("chitchat", "Thanks for the help!"),
+]
+
+
+def timed(fn: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    from benchmarks.bench_vector_backends import percentile, summarize as summarize_ms
+
+    samples = [s for s in samples if s is not None]
+    if not samples:
+        return {"count": 0}
+    return {"count": len(samples), **summarize_ms(samples), "p99_ms": percentile(samples, 99) * 1000}
+
+
+def bench_pdf(repeats: int) -> Dict[str, Any]:
+    from config import ARTIFACTS_FOLDER, CHUNK_OVERLAP, CHUNK_SIZE
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from rag.ingestion_pipeline import parse_pdf_pages
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    files = sorted(f for f in os.listdir(ARTIFACTS_FOLDER) if f.lower().endswith(".pdf"))
+    parse_samples: List[float] = []
+    chunk_samples: List[float] = []
+    pages = chunks = characters = 0
+    for _ in range(repeats):
+        pages = chunks = characters = 0
+        for filename in files:
+            start = time.perf_counter()
+            parsed = parse_pdf_pages(os.path.join(ARTIFACTS_FOLDER, filename))
+            parse_samples.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            for _, text in parsed:
+                chunks += len(splitter.split_text(text))
+                characters += len(text)
+            chunk_samples.append(time.perf_counter() - start)
+            pages += len(parsed)
+
+    parse_total = sum(parse_samples) / repeats
+    return {
+        "files": len(files),
+        "pages": pages,
+        "chunks": chunks,
+        "parse": summarize(parse_samples),
+        "chunk": summarize(chunk_samples),
+        "pages_per_s": pages / parse_total if parse_total else None,
+        "chars_per_s_chunking": characters / (sum(chunk_samples) / repeats) if chunk_samples else None,
+    }
+
+
+def bench_embeddings(texts: int, batch_sizes: List[int]) -> Dict[str, Any]:
+    from rag.embeddings import _load_model
+
+    # The raw model, so the embedding cache does not turn repeats into lookups
+    model = _load_model()
+    rng = random.Random(7)
+    words = "refund return exchange shipping delivery order cancel warranty payment card policy days".split()
+    corpus = [" ".join(rng.choice(words) for _ in range(80)) for _ in range(texts)]
+
+    by_batch = {}
+    for batch_size in batch_sizes:
+        seconds = timed(lambda: [
+            model.embed_documents(corpus[offset:offset + batch_size]) for offset in range(0, texts, batch_size)
+        ])
+        by_batch[str(batch_size)] = {"seconds": seconds, "texts_per_s": texts / seconds}
+    query_samples = []
+    for text in corpus[:200]:
+        query_samples.append(timed(lambda: model.embed_query(text)))
+    return {"model": type(model).__name__, "texts": texts, "batches": by_batch, "embed_query": summarize(query_samples)}
+
+
+def bench_search(sizes: List[int], queries: int, k: int) -> Dict[str, Any]:
+    import numpy as np
+
+    from benchmarks.bench_vector_backends import bench_numpy
+    from config import NUMPY_INDEX_DTYPE, STUB_EMBEDDING_DIM
+
+    rng = np.random.default_rng(42)
+    results = []
+    for size in sizes:
+        vectors = rng.standard_normal((size, STUB_EMBEDDING_DIM), dtype=np.float32)
+        query_vectors = rng.standard_normal((queries, STUB_EMBEDDING_DIM), dtype=np.float32)
+        results.append({"size": size, **bench_numpy(vectors, query_vectors, k, NUMPY_INDEX_DTYPE)})
+        print(f"  search n={size}: p50={results[-1]['p50_ms']:.3f}ms p95={results[-1]['p95_ms']:.3f}ms "
+              f"one-section p50={results[-1]['filtered']['p50_ms']:.3f}ms")
+    return {"backend": "numpy", "dim": STUB_EMBEDDING_DIM, "k": k, "results": results}
+
+
+def order_id(n: int) -> str:
+    """The n-th ID in ABC-123 form; 26^3 * 1000 IDs cover 10^7 rows"""
+    letters = n // 1000
+    prefix = "".join(string.ascii_uppercase[(letters // 26 ** p) % 26] for p in (2, 1, 0))
+    return f"{prefix}-{n % 1000:03d}"
+
+
+def synthetic_orders(size: int):
+    statuses = ("processing", "shipped", "delivered", "cancelled")
+    for n in range(size):
+        yield (
+            order_id(n), f"Customer {n}", f"customer{n % (size // 3 + 1)}@example.com", "Wireless Headphones",
+            1 + n % 3, 19.99 + n % 100, "2025-08-14", statuses[n % 4], f"TRK{n:09d}", "2025-08-29",
+        )
+
+
+def bench_orders(sizes: List[int], lookups: int, batch_size: int) -> Dict[str, Any]:
+    from db.structured_database_manager import DatabaseManager
+
+    results = []
+    for size in sizes:
+        db_path = os.path.join("data", f"bench_orders_{size}.db")
+        manager = DatabaseManager(db_path=db_path)
+        start = time.perf_counter()
+        with manager.pool.connection() as conn:
+            batch = []
+            for row in synthetic_orders(size):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    manager._insert_batch(conn, batch)
+                    batch = []
+            if batch:
+                manager._insert_batch(conn, batch)
+            conn.execute("ANALYZE orders")
+            conn.commit()
+        load_seconds = time.perf_counter() - start
+
+        rng = random.Random(size)
+        hit_ids = [order_id(rng.randrange(size)) for _ in range(lookups)]
+        row = {
+            "rows": size,
+            "load_s": load_seconds,
+            "rows_per_s": size / load_seconds,
+            "get_order": summarize([timed(lambda: manager.get_order(i)) for i in hit_ids]),
+            "get_order_miss": summarize([timed(lambda: manager.get_order("ZZZ-999X")) for _ in range(lookups)]),
+            "get_orders_5": summarize([
+                timed(lambda: manager.get_orders(hit_ids[n:n + 5])) for n in range(0, lookups, 5)
+            ]),
+            "get_orders_by_email": summarize([
+                timed(lambda: manager.get_orders_by_email(f"customer{rng.randrange(size // 3 + 1)}@example.com"))
+                for _ in range(lookups)
+            ]),
+            "db_bytes": os.path.getsize(db_path),
+        }
+        manager.close()
+        os.remove(db_path)
+        results.append(row)
+        print(f"  orders n={size}: load={load_seconds:.2f}s get_order p50={row['get_order']['p50_ms']:.4f}ms")
+    return {"results": results}
+
+
+def bench_turns(rounds: int, stub_latency: float, semantic_cache: bool) -> Dict[str, Any]:
+    import config
+
+    config.STUB_LLM_LATENCY = stub_latency
+    config.SEMANTIC_CACHE_ENABLED = semantic_cache
+
+    from db.structured_database_manager import DatabaseManager
+    from helper.metrics import metrics
+    from rag.rag_engine import rag_engine
+    from services.conversation_state import ConversationState
+    from services.generate_response import GenerateResponseService, TurnInfo
+
+    # Seed the sample orders the turn script asks about
+    DatabaseManager(recreate=True).close()
+    cold_start = timed(rag_engine.warm_up)
+    service = GenerateResponseService()
+    # One untimed pass builds the router centroids and pooled clients
+    for _, query in TURN_SCRIPT:
+        service.generate_response(query, ConversationState())
+    metrics.reset()
+
+    by_kind: Dict[str, List[float]] = {}
+    first_token: List[float] = []
+    for n in range(rounds):
+        state = ConversationState()
+        for kind, query in TURN_SCRIPT:
+            by_kind.setdefault(kind, []).append(timed(lambda: service.generate_response(query, state)))
+        stream_state = ConversationState()
+        for _, query in TURN_SCRIPT:
+            turn = TurnInfo()
+            for _ in service.stream_response(query, stream_state, turn):
+                pass
+            first_token.append(turn.time_to_first_token)
+
+    all_turns = [sample for samples in by_kind.values() for sample in samples]
+    return {
+        "rounds": rounds,
+        "stub_llm_latency_s": stub_latency,
+        "semantic_cache": semantic_cache,
+        "rag_cold_start_s": cold_start,
+        "turn": summarize(all_turns),
+        "by_kind": {kind: summarize(samples) for kind, samples in by_kind.items()},
+        "stream_first_token": summarize(first_token),
+        # Per-stage spans recorded while the turns ran: rewrite, route, retrieval, generation, ...
+        "stages": {
+            series["labels"]["stage"] + ("" if series["labels"].get("status") == "ok" else f" ({series['labels'].get('status')})"): {
+                key: series[key] * 1000 if key != "count" else series[key]
+                for key in ("count", "p50", "p95", "p99", "mean") if key in series
+            }
+            for series in metrics.snapshot()["histograms"].get("shopez_stage_latency_seconds", [])
+        },
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def run_metadata() -> Dict[str, Any]:
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def results_path(output: Optional[str], prefix: str = "") -> str:
+    return os.path.abspath(output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"{prefix}{datetime.now():%Y%m%d-%H%M%S}.json"
+    ))
+
+
+def write_results(output: str, report: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+def enter_scratch_workdir(keep: bool = False) -> str:
+    """chdir into a fresh directory so config's relative data/ and artefacts/ paths resolve there"""
+    workdir = tempfile.mkdtemp(prefix="shopez-bench-")
+    if not keep:
+        # Registered first so it runs last, after caches flush to the scratch directory at exit
+        atexit.register(shutil.rmtree, workdir, True)
+    os.symlink(os.path.join(REPO_ROOT, "artefacts"), os.path.join(workdir, "artefacts"))
+    os.chdir(workdir)
+    return workdir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--output", help="JSON results path (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--pdf-repeats", type=int, default=3)
+    parser.add_argument("--embed-texts", type=int, default=2000)
+    parser.add_argument("--embed-batch-sizes", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--search-sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--search-queries", type=int, default=200)
+    parser.add_argument("--order-sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000],
+                        help="Row counts; add 10000000 for the full sweep (minutes, about 1.5 GB of disk)")
+    parser.add_argument("--order-lookups", type=int, default=2000)
+    parser.add_argument("--turn-rounds", type=int, default=20)
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Seconds the fake chat model waits per call")
+    parser.add_argument("--semantic-cache", action="store_true", help="Leave the policy answer cache on for turns")
+    parser.add_argument("--keep-workdir", action="store_true")
+    args = parser.parse_args()
+
+    output = results_path(args.output)
+    enter_scratch_workdir(keep=args.keep_workdir)
+
+    import config
+
+    runners = {
+        "pdf": lambda: bench_pdf(args.pdf_repeats),
+        "embeddings": lambda: bench_embeddings(args.embed_texts, args.embed_batch_sizes),
+        "search": lambda: bench_search(args.search_sizes, args.search_queries, config.MAX_RETRIEVAL_DOCS),
+        "orders": lambda: bench_orders(args.order_sizes, args.order_lookups, config.SQLITE_BULK_LOAD_BATCH_SIZE),
+        "turns": lambda: bench_turns(args.turn_rounds, args.stub_latency, args.semantic_cache),
+    }
+    report: Dict[str, Any] = {**run_metadata(), "stages": {}}
+    for stage in STAGES:
+        if stage not in args.stages:
+            continue
+        print(f"Running {stage} benchmark...")
+        start = time.perf_counter()
+        report["stages"][stage] = runners[stage]()
+        report["stages"][stage]["wall_s"] = time.perf_counter() - start
+
+    write_results(output, report)
+
+
+if __name__ == "__main__":
+    main()
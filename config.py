@@ -9,26 +9,205 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 # Database Configuration
 SQLITE_DB_PATH = "data/orders.db"
+# Long-lived connections shared by all order lookups
+SQLITE_POOL_SIZE = 4
+# Page cache per connection, and how much of the file is read through mmap
+SQLITE_CACHE_SIZE_KB = 64 * 1024
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+# Rows per transaction when importing orders from CSV
+SQLITE_BULK_LOAD_BATCH_SIZE = 50000
 
 # Vector Database Configuration
 COLLECTION_NAME = "e-commerce-compliance"
 QDRANT_HOST = "localhost"
 QDRANT_PORT = 6333
+# "qdrant" for the Qdrant server, "numpy" for the in-process memory-mapped index
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant")
+NUMPY_INDEX_DIR = "data/vector_index"
+# "float16" halves the index size at a small cost in score precision
+NUMPY_INDEX_DTYPE = "float32"
+
+# Content hashes of everything ingested, used to embed only new or changed chunks
+INGESTION_MANIFEST_PATH = "data/ingestion_manifest.json"
 
 # Text Processing Configuration
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 50
 
+# Policy Section Configuration
+# Topic -> word stems. A heading belongs to the first topic with a stem starting one of its
+# words (else "general"); a policy question is searched only in the topics it mentions, or
+# everywhere when it mentions none. Changing this needs a CHUNKING_VERSION bump to re-tag chunks.
+POLICY_SECTIONS = {
+    "returns": ("return", "refund", "exchang", "restock"),
+    "cancellation": ("cancel",),
+    "shipping": ("ship", "deliver", "courier", "track", "international"),
+    "payments": ("pay", "card", "cash", "upi", "wallet"),
+    "billing": ("invoice", "bill", "receipt", "charge"),
+    "support": ("support", "contact", "hour", "phone", "email"),
+}
+# Short standalone lines starting with a symbol (e.g. an emoji) or in Title Case open a section
+SECTION_HEADING_MAX_CHARS = 60
+SECTION_FILTER_ENABLED = True
+# Metadata fields indexed for filtered search: Qdrant payload indexes, NumPy inverted lists for keywords
+PAYLOAD_INDEX_FIELDS = {"section": "keyword", "source": "keyword", "chunk_hash": "keyword", "page": "integer"}
+# Policy answers end with the file, page and section they were drawn from
+POLICY_CITATIONS_ENABLED = True
+POLICY_MAX_CITATIONS = 3
+
+# Ingestion Pipeline Configuration
+# Worker processes parsing PDFs (None uses every CPU)
+INGEST_MAX_WORKERS = None
+INGEST_EMBED_BATCH_SIZE = 64
+INGEST_UPSERT_BATCH_SIZE = 256
+# Upsert batches allowed to wait for the writer before embedding blocks
+INGEST_MAX_PENDING_BATCHES = 4
+
 # LLM Configuration
 LLM_MODEL = "gemini-2.0-flash"
 LLM_TEMPERATURE = 0.3
+# "gemini" for the hosted model, "stub" for the deterministic offline model
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_TRANSPORT = "grpc"
+STUB_LLM_LATENCY = float(os.getenv("STUB_LLM_LATENCY", "0"))
+# Order status replies come from fixed templates; set True to have the LLM phrase them instead
+ORDER_STATUS_LLM_PHRASING = False
 
 # Embedding Configuration
 EMBEDDING_MODEL = "sentence-transformers/bert-base-nli-mean-tokens"
+# "huggingface" for EMBEDDING_MODEL, "stub" for deterministic offline hashing embeddings
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "huggingface")
+STUB_EMBEDDING_DIM = 768
+STUB_EMBEDDING_LATENCY = float(os.getenv("STUB_EMBEDDING_LATENCY", "0"))
+# Persistent cache of computed embeddings, shared by ingestion and queries
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_DIR = "data/embedding_cache"
+# Capped slot count; the vector file is max_entries * dim * 4 bytes
+EMBEDDING_CACHE_MAX_ENTRIES = 50000
 
 # Application Configuration
+# Raw messages kept per session; older turns survive only as summary lines
 MAX_CONVERSATION_HISTORY = 10
-MAX_RETRIEVAL_DOCS = 5
+CONVERSATION_MESSAGE_MAX_CHARS = 400
+CONVERSATION_SUMMARY_MAX_LINES = 5
+CONVERSATION_SUMMARY_LINE_CHARS = 120
+CONVERSATION_MAX_ORDER_IDS = 5
+# Most recent messages quoted verbatim in the query-rewrite prompt
+REWRITE_CONTEXT_MESSAGES = 4
+# Messages the chat UI keeps on screen
+MAX_TRANSCRIPT_MESSAGES = 100
+# Hybrid retrieval ranks exact policy terms well, so fewer chunks are needed
+MAX_RETRIEVAL_DOCS = 4
+
+# Hybrid Retrieval Configuration
+HYBRID_SEARCH_ENABLED = True
+# Candidates fetched from each of the vector and BM25 indexes before fusion
+HYBRID_FETCH_K = 20
+RRF_K = 60
+LEXICAL_INDEX_PATH = "data/lexical_index.json"
+
+# Context Packing Configuration
+# Estimated tokens of retrieved policy text sent with each question
+CONTEXT_TOKEN_BUDGET = 1200
+
+# Intent Router Configuration
+# The embedding tier answers only when its best centroid is this similar and
+# this far ahead of the runner-up; anything less goes to the LLM planner
+ROUTER_EMBEDDING_TIER_ENABLED = True
+ROUTER_MIN_SIMILARITY = 0.55
+ROUTER_MIN_MARGIN = 0.05
+
+# LLM Scheduler Configuration
+# Every LLM call waits for request and token budget, highest priority first
+LLM_SCHEDULER_ENABLED = True
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+# Bucket size as seconds of quota, i.e. how large a burst may run ahead of the average rate
+LLM_RATE_BURST_SECONDS = 10
+# Reply length assumed when reserving token budget before a call
+LLM_EXPECTED_OUTPUT_TOKENS = 300
+# Lower runs first; stages are matched on the part before the first "."
+LLM_STAGE_PRIORITIES = {"generation": 0, "planner": 1, "rewrite": 2}
+# Time from submitting a call until it must have succeeded, queueing and retries included
+LLM_CALL_DEADLINE_SECONDS = 30.0
+LLM_STAGE_DEADLINES = {"planner": 10.0, "rewrite": 5.0}
+LLM_MAX_RETRIES = 4
+LLM_RETRY_BASE_DELAY = 0.5
+LLM_RETRY_MAX_DELAY = 8.0
+
+# Semantic Answer Cache Configuration
+SEMANTIC_CACHE_ENABLED = True
+SEMANTIC_CACHE_SIMILARITY_THRESHOLD = 0.95
+SEMANTIC_CACHE_MAX_ENTRIES = 1000
+SEMANTIC_CACHE_TTL_SECONDS = 24 * 60 * 60
+# Set to None to keep the cache in memory only
+SEMANTIC_CACHE_DB_PATH = "data/semantic_cache.db"
+
+# Precomputed Answer Configuration
+# Answers to these questions are generated whenever documents are ingested and served
+# without retrieval or generation to any policy question this similar to one of them
+PRECOMPUTED_ANSWERS_ENABLED = True
+PRECOMPUTED_ANSWERS_PATH = "data/precomputed_answers.json"
+# A query must also beat the runner-up question by the margin; tune with python -m rag.answer_index --calibrate
+PRECOMPUTED_ANSWER_SIMILARITY_THRESHOLD = 0.95
+PRECOMPUTED_ANSWER_MIN_MARGIN = 0.02
+# Build missing and stale answers as part of ingest_documents; otherwise run python -m rag.answer_index
+PRECOMPUTED_ANSWERS_BUILD_ON_INGEST = True
+CANONICAL_POLICY_QUESTIONS = [
+    "How do I return an item?",
+    "How long do I have to return an item?",
+    "Who pays for return shipping?",
+    "When will I get my refund?",
+    "Do you ship internationally?",
+    "How long does shipping take?",
+    "Is shipping free?",
+    "How can I track my order?",
+    "Which payment methods do you accept?",
+    "Is my payment information secure?",
+    "How do I cancel my order?",
+    "Where can I find my invoice?",
+    "How do I dispute a charge on my bill?",
+    "What are your customer support hours?",
+    "How can I contact customer support?",
+]
+
+# Identical tool calls in flight at the same time (same tool, same normalized query or
+# order IDs) share one execution across sessions
+SINGLE_FLIGHT_ENABLED = True
+
+# Startup Configuration
+# What happens to the heavy parts (RAG engine, embedding model, router centroids, LLM clients)
+# at start: "background" loads them in a thread while requests are already served, "blocking"
+# loads them before serving, "off" leaves each to the first request that needs it
+STARTUP_PREWARM = os.getenv("STARTUP_PREWARM", "background")
+# Import time allowed per entry module, checked by python -m services.startup
+STARTUP_BUDGET_SECONDS = 1.0
+
+# Metrics Configuration
+# Prometheus text at /metrics and percentiles at /metrics.json
+METRICS_SERVER_ENABLED = True
+METRICS_HOST = "0.0.0.0"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+# One JSON log line per pipeline stage on the "shopez.metrics" logger
+METRICS_JSON_LOGS = True
+# Recent samples per histogram series used for p50/p95/p99
+METRICS_WINDOW_SIZE = 2048
+
+# HTTP API Configuration (python -m api.server)
+API_HOST = "0.0.0.0"
+API_PORT = int(os.getenv("API_PORT", "8000"))
+# Uvicorn processes; more than one needs a session store they can share ("sqlite")
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+# Threads per process running the blocking response pipeline, i.e. turns generated at once
+API_WORKER_THREADS = int(os.getenv("API_WORKER_THREADS", "8"))
+# Turns allowed to wait for a worker thread before new requests get 503
+API_MAX_QUEUED_REQUESTS = 64
+API_REQUEST_TIMEOUT_SECONDS = float(os.getenv("API_REQUEST_TIMEOUT_SECONDS", "60"))
+# "memory" (per process) or "sqlite" (shared by every worker on the host)
+API_SESSION_STORE = os.getenv("API_SESSION_STORE", "memory")
+API_SESSION_DB_PATH = "data/sessions.db"
+API_SESSION_TTL_SECONDS = 60 * 60
+API_MAX_SESSIONS = 10000
 
 # Logging Configuration
 LOG_LEVEL = logging.INFO
@@ -38,9 +217,7 @@ LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 ARTIFACTS_FOLDER = "artefacts"
 DATA_FOLDER = "data"
 
-# Ensure required directories exist
-os.makedirs(DATA_FOLDER, exist_ok=True)
-os.makedirs(ARTIFACTS_FOLDER, exist_ok=True)
+# Directories are created by whatever writes into them, so importing config has no side effects
 
 # SSL Configuration (from your original code)
 os.environ['CURL_CA_BUNDLE'] = ''
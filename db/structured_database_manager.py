@@ -1,25 +1,104 @@
+import csv
+import os
+import queue
 import sqlite3
 import logging
-from typing import List, Dict, Any, Optional
-from config import SQLITE_DB_PATH
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterator, Optional
+from config import (
+    SQLITE_BULK_LOAD_BATCH_SIZE,
+    SQLITE_CACHE_SIZE_KB,
+    SQLITE_DB_PATH,
+    SQLITE_MMAP_SIZE,
+    SQLITE_POOL_SIZE,
+)
 
 logger = logging.getLogger(__name__)
 
+ORDER_COLUMNS = (
+    "order_id", "customer_name", "customer_email", "product_name", "quantity", "total_amount",
+    "order_date", "status", "tracking_number", "estimated_delivery",
+)
+INSERT_ORDER_SQL = f"""
+    INSERT OR REPLACE INTO orders ({", ".join(ORDER_COLUMNS)})
+    VALUES ({", ".join("?" for _ in ORDER_COLUMNS)})
+"""
+# IDs per IN (...) query, below SQLite's bound-variable limit (999 before 3.32)
+ORDER_LOOKUP_CHUNK_SIZE = 500
+
+
+class SQLiteConnectionPool:
+    """Fixed-size pool of long-lived SQLite connections shared across threads"""
+
+    def __init__(self, db_path: str, size: int = SQLITE_POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        conn.row_factory = sqlite3.Row
+        # WAL lets lookups run while a bulk load is writing
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection; uncommitted work is rolled back before it is returned"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.size
+                if can_open:
+                    self._opened += 1
+            if can_open:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._opened -= 1
+
+
 class DatabaseManager:
-    def __init__(self, recreate: bool = False):
-        self.db_path = SQLITE_DB_PATH
+    def __init__(self, recreate: bool = False, db_path: str = SQLITE_DB_PATH, pool_size: int = SQLITE_POOL_SIZE):
+        self.db_path = db_path
         self.recreate = recreate
+        self.pool = SQLiteConnectionPool(db_path, size=pool_size)
         self.setup_database()
-        
+
     def setup_database(self):
-        """Initialize SQLite database with sample order data"""
+        """Create the orders schema and indexes; seed sample order data when recreate is set"""
         try:
-            if self.recreate:
-                conn = sqlite3.connect(self.db_path)
-                cursor = conn.cursor()
-                
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            with self.pool.connection() as conn:
                 # Create orders table
-                cursor.execute("""
+                conn.execute("""
                     CREATE TABLE IF NOT EXISTS orders (
                         order_id TEXT PRIMARY KEY,
                         customer_name TEXT NOT NULL,
@@ -33,48 +112,137 @@ class DatabaseManager:
                         estimated_delivery TEXT
                     )
                 """)
-                
-                # Sample order data
-                sample_orders = [
-                    ("ABC-123", "John Doe", "john@email.com", "Wireless Headphones", 1, 99.99, "2025-08-14", "shipped", "TRK123456789", "2025-08-29"),
-                    ("XYZ-456", "Jane Smith", "jane@email.com", "Smartphone Case", 2, 29.98, "2025-08-25", "processing", None, "2025-09-04"),
-                    ("DEF-789", "Mike Johnson", "mike@email.com", "Gaming Mouse", 1, 79.99, "2025-07-17", "delivered", "TRK987654321", "2025-08-19"),
-                    ("GHI-012", "Sarah Wilson", "sarah@email.com", "USB Cable", 3, 23.97, "2025-08-18", "shipped", "TRK456789123", "2025-08-31"),
-                    ("JKL-345", "Bob Brown", "bob@email.com", "Bluetooth Speaker", 1, 149.99, "2025-08-24", "processing", None, "2025-09-07"),
-                    ("MNO-678", "Lisa Davis", "lisa@email.com", "Laptop Stand", 1, 59.99, "2025-05-20", "cancelled", None, None),
-                    ("PQR-901", "Tom Anderson", "tom@email.com", "Phone Charger", 2, 39.98, "2025-08-15", "shipped", "TRK789123456", "2025-09-01"),
-                    ("STU-234", "Amy Taylor", "amy@email.com", "Tablet Screen Protector", 1, 12.99, "2025-07-22", "delivered", "TRK321654987", "2025-08-20"),
-                ]
-                
-                # Insert sample data
-                cursor.executemany("""
-                    INSERT OR REPLACE INTO orders 
-                    (order_id, customer_name, customer_email, product_name, quantity, total_amount, 
-                    order_date, status, tracking_number, estimated_delivery)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, sample_orders)
-                
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_customer_email ON orders (customer_email)")
+
+                if self.recreate:
+                    # Sample order data
+                    sample_orders = [
+                        ("ABC-123", "John Doe", "john@email.com", "Wireless Headphones", 1, 99.99, "2025-08-14", "shipped", "TRK123456789", "2025-08-29"),
+                        ("XYZ-456", "Jane Smith", "jane@email.com", "Smartphone Case", 2, 29.98, "2025-08-25", "processing", None, "2025-09-04"),
+                        ("DEF-789", "Mike Johnson", "mike@email.com", "Gaming Mouse", 1, 79.99, "2025-07-17", "delivered", "TRK987654321", "2025-08-19"),
+                        ("GHI-012", "Sarah Wilson", "sarah@email.com", "USB Cable", 3, 23.97, "2025-08-18", "shipped", "TRK456789123", "2025-08-31"),
+                        ("JKL-345", "Bob Brown", "bob@email.com", "Bluetooth Speaker", 1, 149.99, "2025-08-24", "processing", None, "2025-09-07"),
+                        ("MNO-678", "Lisa Davis", "lisa@email.com", "Laptop Stand", 1, 59.99, "2025-05-20", "cancelled", None, None),
+                        ("PQR-901", "Tom Anderson", "tom@email.com", "Phone Charger", 2, 39.98, "2025-08-15", "shipped", "TRK789123456", "2025-09-01"),
+                        ("STU-234", "Amy Taylor", "amy@email.com", "Tablet Screen Protector", 1, 12.99, "2025-07-22", "delivered", "TRK321654987", "2025-08-20"),
+                    ]
+
+                    # Insert sample data
+                    conn.executemany(INSERT_ORDER_SQL, sample_orders)
+
                 conn.commit()
-                conn.close()
-                logger.info("Database setup completed successfully")
-            
+            logger.info("Database setup completed successfully")
+
         except Exception as e:
             logger.error(f"Error setting up database: {e}")
             raise
-    
+
     def get_order_status(self, order_id: str) -> Optional[str]:
         """Get the status of an order by order_id"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT status FROM orders WHERE order_id = ?", (order_id,))
-            result = cursor.fetchone()
-            conn.close()
-            
+            with self.pool.connection() as conn:
+                result = conn.execute("SELECT status FROM orders WHERE order_id = ?", (order_id,)).fetchone()
             return result[0] if result else None
-            
+
         except Exception as e:
             logger.error(f"Error getting order status: {e}")
             return None
-    
\ No newline at end of file
+
+    def get_order(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """Get the full order row, including tracking number and estimated delivery, by order_id"""
+        try:
+            with self.pool.connection() as conn:
+                result = conn.execute("SELECT * FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+            return dict(result) if result else None
+
+        except Exception as e:
+            logger.error(f"Error getting order: {e}")
+            return None
+
+    def get_orders(self, order_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get full order rows for several order IDs, keyed by order_id, in as few queries as SQLite allows"""
+        if not order_ids:
+            return {}
+        try:
+            orders = {}
+            with self.pool.connection() as conn:
+                for start in range(0, len(order_ids), ORDER_LOOKUP_CHUNK_SIZE):
+                    chunk = tuple(order_ids[start:start + ORDER_LOOKUP_CHUNK_SIZE])
+                    placeholders = ", ".join("?" for _ in chunk)
+                    rows = conn.execute(f"SELECT * FROM orders WHERE order_id IN ({placeholders})", chunk).fetchall()
+                    orders.update((row["order_id"], dict(row)) for row in rows)
+            return orders
+
+        except Exception as e:
+            logger.error(f"Error getting orders: {e}")
+            return {}
+
+    def get_orders_by_email(self, customer_email: str) -> List[Dict[str, Any]]:
+        """Get every order placed with a customer email, newest first"""
+        try:
+            with self.pool.connection() as conn:
+                rows = conn.execute(
+                    "SELECT * FROM orders WHERE customer_email = ? ORDER BY order_date DESC", (customer_email,)
+                ).fetchall()
+            return [dict(row) for row in rows]
+
+        except Exception as e:
+            logger.error(f"Error getting orders by email: {e}")
+            return []
+
+    def bulk_load_csv(self, csv_path: str, batch_size: int = SQLITE_BULK_LOAD_BATCH_SIZE) -> int:
+        """Stream orders from a CSV with a header row into the table, one transaction per batch"""
+        loaded = 0
+        with open(csv_path, "r", newline="", encoding="utf-8") as f, self.pool.connection() as conn:
+            reader = csv.DictReader(f)
+            missing = set(ORDER_COLUMNS) - set(reader.fieldnames or [])
+            if missing:
+                raise ValueError(f"CSV {csv_path} is missing columns: {', '.join(sorted(missing))}")
+
+            batch = []
+            for row in reader:
+                batch.append(tuple(row[column] or None for column in ORDER_COLUMNS))
+                if len(batch) >= batch_size:
+                    loaded += self._insert_batch(conn, batch)
+                    batch = []
+                    logger.info(f"Loaded {loaded} orders from {csv_path}")
+            if batch:
+                loaded += self._insert_batch(conn, batch)
+
+            conn.execute("ANALYZE orders")
+            conn.commit()
+        logger.info(f"Bulk load of {csv_path} finished: {loaded} orders")
+        return loaded
+
+    def _insert_batch(self, conn: sqlite3.Connection, batch: List[tuple]) -> int:
+        with conn:
+            conn.executemany(INSERT_ORDER_SQL, batch)
+        return len(batch)
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+_shared_manager: Optional[DatabaseManager] = None
+_shared_lock = threading.Lock()
+
+
+def get_database_manager() -> DatabaseManager:
+    """Process-wide DatabaseManager, so lookups reuse pooled connections"""
+    global _shared_manager
+    if _shared_manager is None:
+        with _shared_lock:
+            if _shared_manager is None:
+                _shared_manager = DatabaseManager(recreate=False)
+    return _shared_manager
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bulk load orders from a CSV file into the order store")
+    parser.add_argument("csv_path")
+    parser.add_argument("--batch-size", type=int, default=SQLITE_BULK_LOAD_BATCH_SIZE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(f"Loaded {get_database_manager().bulk_load_csv(args.csv_path, args.batch_size)} orders")
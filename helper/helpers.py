@@ -1,81 +1,320 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from db.structured_database_manager import DatabaseManager
-from langchain_core.tools import tool
-from rag.rag_manager import RAGManager
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from db.structured_database_manager import get_database_manager
+from rag.rag_engine import rag_engine
+from rag.semantic_cache import policy_answer_cache
+from helper.lazy_tool import lazy_tool
+from helper.llm_registry import llm_registry
+from helper.llm_scheduler import llm_scheduler
+from helper.metrics import metrics, token_usage
+from helper.order_responses import (
+    MISSING_ORDER_ID_MESSAGE,
+    normalize_order_ids,
+    order_not_found_message,
+    render_orders_reply,
+)
 import config
 
+logger = logging.getLogger(__name__)
+
 
 def initialize_llm():
-    llm = ChatGoogleGenerativeAI(
-        model=config.LLM_MODEL,
-        temperature=config.LLM_TEMPERATURE,
-        convert_system_message_to_human=True,
-        api_key=config.GEMINI_API_KEY
-    )
-    return llm
+    return llm_registry.get_llm()
             
 
     
-def generate_llm_response(llm, prompt: str) -> str:
+def generate_llm_response(llm, prompt: str, stage: str = "generation") -> str:
     try:
-        response = llm.invoke(prompt)
+        with metrics.span(stage) as span:
+            response = llm_scheduler.invoke(llm, prompt, stage)
+            span["input_tokens"], span["output_tokens"] = token_usage(response)
+        metrics.record_tokens(stage, span["input_tokens"], span["output_tokens"])
         return response.content if hasattr(response, 'content') else str(response)
         
     except Exception as e:
-        print(f"Error generating LLM response: {e}")
+        logger.error(f"Error generating LLM response: {e}")
         return "I apologize, but I'm having trouble generating a response right now. Please try again."
-    
 
-@tool(description="Generate responses for queries related to order status and tracking")
-def get_product_status(order_id: str) -> str:
+
+async def agenerate_llm_response(llm, prompt: str, stage: str = "generation") -> str:
+    """Async variant of generate_llm_response"""
     try:
-        db_manager = DatabaseManager(recreate=False)
-        order_status = db_manager.get_order_status(order_id)
-        if not order_status:
-            return f"I'm sorry, I couldn't find any information for order ID: {order_id}. Please check the ID and try again."
-        status_prompt = f"""
+        with metrics.span(stage) as span:
+            response = await llm_scheduler.ainvoke(llm, prompt, stage)
+            span["input_tokens"], span["output_tokens"] = token_usage(response)
+        metrics.record_tokens(stage, span["input_tokens"], span["output_tokens"])
+        return response.content if hasattr(response, 'content') else str(response)
+
+    except Exception as e:
+        logger.error(f"Error generating LLM response: {e}")
+        return "I apologize, but I'm having trouble generating a response right now. Please try again."
+
+
+def stream_llm_response(llm, prompt: str, stage: str = "generation") -> Iterator[str]:
+    """Yield the response text chunk by chunk as the model produces it"""
+    produced = False
+    try:
+        with metrics.span(stage, streamed=True) as span:
+            start = time.perf_counter()
+            last_chunk = None
+            for chunk in llm_scheduler.stream(llm, prompt, stage):
+                last_chunk = chunk
+                text = chunk.content if hasattr(chunk, 'content') else str(chunk)
+                if text:
+                    if not produced:
+                        span["first_token_ms"] = round((time.perf_counter() - start) * 1000, 3)
+                    produced = True
+                    yield text
+            span["input_tokens"], span["output_tokens"] = token_usage(last_chunk)
+        metrics.record_tokens(stage, span["input_tokens"], span["output_tokens"])
+
+    except Exception as e:
+        logger.error(f"Error streaming LLM response: {e}")
+        if not produced:
+            yield "I apologize, but I'm having trouble generating a response right now. Please try again."
+
+
+def build_order_status_prompt(orders: List[Dict[str, Any]]) -> str:
+    order_details = "\n".join(
+        f"        order {order['order_id']}: status {order['status']}, product {order.get('product_name')}, "
+        f"tracking number {order.get('tracking_number') or 'not available yet'}, "
+        f"estimated delivery {order.get('estimated_delivery') or 'not available'}"
+        for order in orders
+    )
+    return f"""
         You are a helpful customer support agent for ShopEZ, an e-commerce platform.
-        The user is asking about the status of their order with ID: {order_id}.
-        Provide a friendly and professional response regarding the order status.
+        The user is asking about the status of their orders with IDs: {", ".join(o['order_id'] for o in orders)}.
+        Provide a friendly and professional response regarding the status of each order.
         
-        order status: {order_status}
+{order_details}
         
         Response:
         [INST] Provide just the message without any additional commentary or startup message. [/INST]
         """
+
+
+def build_chitchat_prompt(query: str) -> str:
+    return f"""
+        You are a friendly customer support agent for ShopEZ, an e-commerce platform.
+        The user is asking a general question or making conversation.
+        Respond in a helpful, friendly manner while keeping the focus on how you can assist them with their shopping needs.
+        Keep responses concise and professional.
         
-        return generate_llm_response(prompt=status_prompt, llm=initialize_llm())
+        User: {query}
+        
+        Response:
+        """
+    
+
+def lookup_orders(order_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """All requested orders in one set-based query"""
+    with metrics.span("order_lookup", orders=len(order_ids)) as span:
+        orders = get_database_manager().get_orders(order_ids)
+        span["found"] = len(orders)
+    return orders
+
+
+def policy_lookup_enabled() -> bool:
+    return config.PRECOMPUTED_ANSWERS_ENABLED or config.SEMANTIC_CACHE_ENABLED
+
+
+def check_policy_cache(rag_manager, query: str):
+    """Embed the query once and look it up in the precomputed answers, then the semantic cache
+
+    Returns (vector, stored answer or None).
+    """
+    with metrics.span("embed_query"):
+        query_vector = rag_manager.embedding_model.embed_query(query)
+    if config.PRECOMPUTED_ANSWERS_ENABLED:
+        with metrics.span("precomputed_lookup"):
+            precomputed = rag_manager.answer_index.lookup(query_vector)
+        metrics.record_cache("precomputed", precomputed is not None)
+        if precomputed is not None:
+            logger.info(f"Serving precomputed answer to {precomputed.question!r}")
+            return query_vector, precomputed.answer
+    if not config.SEMANTIC_CACHE_ENABLED:
+        return query_vector, None
+    with metrics.span("semantic_cache_lookup"):
+        cached_answer = policy_answer_cache.get(query, query_vector)
+    metrics.record_cache("semantic", cached_answer is not None)
+    if cached_answer is not None:
+        logger.info("Serving policy answer from semantic cache")
+    return query_vector, cached_answer
+
+
+def split_found_orders(order_ids: List[str], orders: Dict[str, Dict[str, Any]]):
+    found = [orders[order_id] for order_id in order_ids if order_id in orders]
+    missing = [order_not_found_message(order_id) for order_id in order_ids if order_id not in orders]
+    return found, missing
+
+
+@lazy_tool(description="Generate responses for queries related to order status and tracking. Pass every order ID the user mentions.")
+def get_product_status(order_ids: List[str]) -> str:
+    try:
+        order_ids = normalize_order_ids(order_ids)
+        if not order_ids:
+            return MISSING_ORDER_ID_MESSAGE
+        orders = lookup_orders(order_ids)
+        if not config.ORDER_STATUS_LLM_PHRASING:
+            return render_orders_reply(order_ids, orders)
+
+        found, missing = split_found_orders(order_ids, orders)
+        replies = [
+            generate_llm_response(prompt=build_order_status_prompt(found), llm=initialize_llm(), stage="generation.order")
+        ] if found else []
+        return "\n\n".join(replies + missing)
         
     except Exception as e:
-        print(f"Error generating order status response: {e}")
+        logger.error(f"Error generating order status response: {e}")
         return "I apologize, but I'm having trouble accessing your order information right now. Please try again or contact support."
     
 
-@tool(description="Generate responses for queries related to returns, exchanges, payments, billing, shipping, and general policies")
+@lazy_tool(description="Generate responses for queries related to returns, exchanges, payments, billing, shipping, and general policies")
 def policy_related_answers(query: str) -> str:
-    rag_manager = RAGManager()
+    rag_manager = rag_engine.get_manager()
+    query_vector = None
+    if policy_lookup_enabled():
+        query_vector, cached_answer = check_policy_cache(rag_manager, query)
+        if cached_answer is not None:
+            return cached_answer
+
     llm = initialize_llm()
-    rag_result = rag_manager.get_context_for_query(query, llm)
-    return rag_result.get("result")
+    rag_result = rag_manager.answer_query(query, llm)
+    if not rag_result:
+        return "I apologize, but I'm having trouble looking up our policies right now. Please try again."
+
+    answer = rag_result.get("result")
+    logger.info(f"Policy answer sources: {rag_result.get('sources')}")
+    if config.SEMANTIC_CACHE_ENABLED and answer:
+        policy_answer_cache.put(query, query_vector, answer)
+    return answer
 
 
-@tool(description="Generate a conversational response for chitchat or any general questions/conversation that doesn't fit in other two. This is the default.")
+@lazy_tool(description="Generate a conversational response for chitchat or any general questions/conversation that doesn't fit in other two. This is the default.")
 def generate_chitchat_response(query: str) -> str:
     try:
-        print("Generating chitchat response...")
-        chitchat_prompt = f"""
-        You are a friendly customer support agent for ShopEZ, an e-commerce platform.
-        The user is asking a general question or making conversation.
-        Respond in a helpful, friendly manner while keeping the focus on how you can assist them with their shopping needs.
-        Keep responses concise and professional.
+        logger.info("Generating chitchat response...")
+        chitchat_prompt = build_chitchat_prompt(query)
         
-        User: {query}
-        
-        Response:
-        """
-        
-        return generate_llm_response(prompt=chitchat_prompt, llm=initialize_llm())
+        return generate_llm_response(prompt=chitchat_prompt, llm=initialize_llm(), stage="generation.chitchat")
         
     except Exception as e:
-        print(f"Error generating chitchat response: {e}")
-        return "Hello! I'm here to help you with any questions about your orders, returns, or our policies. How can I assist you today?"
\ No newline at end of file
+        logger.error(f"Error generating chitchat response: {e}")
+        return "Hello! I'm here to help you with any questions about your orders, returns, or our policies. How can I assist you today?"
+
+
+def stream_product_status(order_ids: List[str]) -> Iterator[str]:
+    """Streaming variant of get_product_status"""
+    try:
+        order_ids = normalize_order_ids(order_ids)
+        orders = lookup_orders(order_ids) if order_ids else {}
+    except Exception as e:
+        logger.error(f"Error generating order status response: {e}")
+        yield "I apologize, but I'm having trouble accessing your order information right now. Please try again or contact support."
+        return
+
+    if not order_ids:
+        yield MISSING_ORDER_ID_MESSAGE
+        return
+    if not config.ORDER_STATUS_LLM_PHRASING:
+        yield render_orders_reply(order_ids, orders)
+        return
+    found, missing = split_found_orders(order_ids, orders)
+    if found:
+        yield from stream_llm_response(initialize_llm(), build_order_status_prompt(found), stage="generation.order")
+    if missing:
+        yield ("\n\n" if found else "") + "\n\n".join(missing)
+
+
+def stream_policy_answer(query: str) -> Iterator[str]:
+    """Streaming variant of policy_related_answers; a cached answer is yielded in one piece"""
+    rag_manager = rag_engine.get_manager()
+    query_vector = None
+    if policy_lookup_enabled():
+        query_vector, cached_answer = check_policy_cache(rag_manager, query)
+        if cached_answer is not None:
+            yield cached_answer
+            return
+
+    chunks = []
+    try:
+        for text in rag_manager.stream_answer_for_query(query, initialize_llm()):
+            chunks.append(text)
+            yield text
+    except Exception as e:
+        logger.error(f"Error streaming policy answer: {e}")
+        if not chunks:
+            yield "I apologize, but I'm having trouble looking up our policies right now. Please try again."
+        return
+
+    answer = "".join(chunks)
+    if config.SEMANTIC_CACHE_ENABLED and answer:
+        policy_answer_cache.put(query, query_vector, answer)
+
+
+def stream_chitchat_response(query: str) -> Iterator[str]:
+    """Streaming variant of generate_chitchat_response"""
+    logger.info("Generating chitchat response...")
+    yield from stream_llm_response(initialize_llm(), build_chitchat_prompt(query), stage="generation.chitchat")
+
+
+# Marks orders that have not been looked up yet, since an empty dict means "none found"
+NOT_FETCHED = object()
+
+
+async def alookup_orders(order_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Run the blocking SQLite lookup off the event loop"""
+    return await asyncio.to_thread(lookup_orders, order_ids)
+
+
+async def aget_product_status(order_ids: List[str], orders=NOT_FETCHED) -> str:
+    """Async variant of get_product_status that can reuse prefetched orders"""
+    try:
+        order_ids = normalize_order_ids(order_ids)
+        if not order_ids:
+            return MISSING_ORDER_ID_MESSAGE
+        if orders is NOT_FETCHED:
+            orders = await alookup_orders(order_ids)
+        if not config.ORDER_STATUS_LLM_PHRASING:
+            return render_orders_reply(order_ids, orders)
+
+        found, missing = split_found_orders(order_ids, orders)
+        replies = [
+            await agenerate_llm_response(initialize_llm(), build_order_status_prompt(found), stage="generation.order")
+        ] if found else []
+        return "\n\n".join(replies + missing)
+
+    except Exception as e:
+        logger.error(f"Error generating order status response: {e}")
+        return "I apologize, but I'm having trouble accessing your order information right now. Please try again or contact support."
+
+
+async def apolicy_related_answers(query: str, documents: Optional[List] = None) -> str:
+    """Async variant of policy_related_answers that can reuse prefetched documents"""
+    try:
+        rag_manager = await asyncio.to_thread(rag_engine.get_manager)
+        query_vector = None
+        if policy_lookup_enabled():
+            query_vector, cached_answer = await asyncio.to_thread(check_policy_cache, rag_manager, query)
+            if cached_answer is not None:
+                return cached_answer
+
+        if documents is None:
+            documents = await rag_manager.aretrieve(query)
+        answer = await rag_manager.aanswer_from_documents(query, documents, initialize_llm())
+    except Exception as e:
+        logger.error(f"Error generating policy answer: {e}")
+        return "I apologize, but I'm having trouble looking up our policies right now. Please try again."
+
+    if config.SEMANTIC_CACHE_ENABLED and answer:
+        policy_answer_cache.put(query, query_vector, answer)
+    return answer
+
+
+async def agenerate_chitchat_response(query: str) -> str:
+    """Async variant of generate_chitchat_response"""
+    logger.info("Generating chitchat response...")
+    return await agenerate_llm_response(initialize_llm(), build_chitchat_prompt(query), stage="generation.chitchat")
\ No newline at end of file
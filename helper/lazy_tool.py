@@ -0,0 +1,55 @@
+import threading
+from typing import Any, Callable, Optional
+
+
+class LazyTool:
+    """A LangChain tool built on first use
+
+    langchain_core.tools pulls in langsmith, around half a second of imports, so the
+    StructuredTool behind each helper is only created when the tool is invoked or bound
+    to a planner rather than when the module defining it is imported.
+    """
+
+    def __init__(self, func: Callable[..., Any], description: str):
+        self.func = func
+        self.name = func.__name__
+        self.description = description
+        self.__doc__ = func.__doc__
+        self._tool: Optional[Any] = None
+        self._lock = threading.Lock()
+
+    @property
+    def tool(self):
+        if self._tool is None:
+            with self._lock:
+                if self._tool is None:
+                    from langchain_core.tools import StructuredTool
+
+                    self._tool = StructuredTool.from_function(self.func, description=self.description)
+        return self._tool
+
+    def invoke(self, input: Any, config: Optional[Any] = None, **kwargs: Any) -> Any:
+        return self.tool.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Optional[Any] = None, **kwargs: Any) -> Any:
+        return await self.tool.ainvoke(input, config, **kwargs)
+
+    def __getattr__(self, attr: str) -> Any:
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self.tool, attr)
+
+    def __repr__(self) -> str:
+        return f"LazyTool({self.name!r})"
+
+
+def lazy_tool(description: str) -> Callable[[Callable[..., Any]], LazyTool]:
+    """Drop-in for @tool(description=...) that defers building the tool"""
+    def decorator(func: Callable[..., Any]) -> LazyTool:
+        return LazyTool(func, description)
+    return decorator
+
+
+def resolve_tool(tool: Any) -> Any:
+    """The real LangChain tool behind a LazyTool; anything else is returned unchanged"""
+    return tool.tool if isinstance(tool, LazyTool) else tool
@@ -0,0 +1,91 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import config
+from helper.lazy_tool import resolve_tool
+
+logger = logging.getLogger(__name__)
+
+
+def _build_gemini_client(model: str, temperature: float):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(
+        model=model,
+        temperature=temperature,
+        convert_system_message_to_human=True,
+        api_key=config.GEMINI_API_KEY,
+        transport=config.LLM_TRANSPORT,
+        # Retries go through the LLM scheduler so they wait for quota like any other call
+        **({"max_retries": 1} if config.LLM_SCHEDULER_ENABLED else {}),
+    )
+
+
+def _build_stub_client(model: str, temperature: float):
+    from helper.stub_llm import StubChatModel
+
+    return StubChatModel(model_name=model, temperature=temperature, latency=config.STUB_LLM_LATENCY)
+
+
+class LLMRegistry:
+    """Process-wide pool of chat clients keyed by backend, model and temperature"""
+
+    def __init__(self):
+        self._backends: Dict[str, Callable[[str, float], Any]] = {
+            "gemini": _build_gemini_client,
+            "stub": _build_stub_client,
+        }
+        self._clients: Dict[Tuple[str, str, float], Any] = {}
+        self._planners: Dict[Tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def register_backend(self, name: str, factory: Callable[[str, float], Any]) -> None:
+        """Register a factory building a chat model from (model, temperature)"""
+        with self._lock:
+            self._backends[name] = factory
+
+    def get_llm(self, model: Optional[str] = None, temperature: Optional[float] = None, backend: Optional[str] = None):
+        """Return the pooled client for the given settings, creating it once"""
+        key = (
+            backend or config.LLM_BACKEND,
+            model or config.LLM_MODEL,
+            config.LLM_TEMPERATURE if temperature is None else temperature,
+        )
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                if key[0] not in self._backends:
+                    raise ValueError(f"Unknown LLM backend: {key[0]}")
+                client = self._backends[key[0]](key[1], key[2])
+                self._clients[key] = client
+                logger.info(f"Created pooled LLM client backend={key[0]} model={key[1]} temperature={key[2]}")
+            return client
+
+    def get_planner(self, tools: Sequence[Any], model: Optional[str] = None, temperature: Optional[float] = None):
+        """Return the pooled client with the given tools already bound"""
+        llm = self.get_llm(model=model, temperature=temperature)
+        key = (id(llm), tuple(t.name for t in tools))
+        planner = self._planners.get(key)
+        if planner is not None:
+            return planner
+
+        with self._lock:
+            planner = self._planners.get(key)
+            if planner is None:
+                planner = llm.bind_tools([resolve_tool(t) for t in tools])
+                self._planners[key] = planner
+            return planner
+
+    def clear(self) -> None:
+        """Drop every pooled client, e.g. after changing backend settings"""
+        with self._lock:
+            self._clients.clear()
+            self._planners.clear()
+
+
+llm_registry = LLMRegistry()
@@ -0,0 +1,270 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Iterator, List, Optional
+
+import config
+from helper.metrics import metrics, token_usage
+from rag.context_packer import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Async waiters poll instead of blocking a thread on the condition variable
+ASYNC_POLL_SECONDS = 0.02
+# Substrings of provider errors worth retrying: rate limits, quota, overload and timeouts
+RETRYABLE_MARKERS = (
+    "429", "resource exhausted", "resourceexhausted", "rate limit", "quota",
+    "503", "unavailable", "deadline exceeded", "deadlineexceeded", "timed out",
+)
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """The call could not be started, or retried, before its deadline"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, LLMDeadlineExceeded):
+        # Its name would otherwise match the "deadlineexceeded" marker below
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in RETRYABLE_MARKERS)
+
+
+def stage_group(stage: str) -> str:
+    return stage.split(".", 1)[0]
+
+
+def stage_priority(stage: str) -> int:
+    return config.LLM_STAGE_PRIORITIES.get(stage_group(stage), max(config.LLM_STAGE_PRIORITIES.values(), default=0))
+
+
+def stage_deadline(stage: str) -> float:
+    return config.LLM_STAGE_DEADLINES.get(stage_group(stage), config.LLM_CALL_DEADLINE_SECONDS)
+
+
+class TokenBucket:
+    """Refills continuously at per_minute / 60 per second, holding at most burst_seconds of quota"""
+
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # A request larger than the bucket waits for a full bucket rather than forever
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """Settle the difference between reserved and actual usage; debt delays later calls"""
+        self.level = max(-self.capacity, min(self.capacity, self.level - amount))
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    stage: str = field(compare=False)
+    tokens: int = field(compare=False)
+
+
+class LLMScheduler:
+    """Admits LLM calls in priority order within request and token quotas, retrying transient failures"""
+
+    def __init__(
+        self,
+        requests_per_minute: float = config.LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = config.LLM_TOKENS_PER_MINUTE,
+        burst_seconds: float = config.LLM_RATE_BURST_SECONDS,
+    ):
+        self.requests = TokenBucket(requests_per_minute, burst_seconds)
+        self.tokens = TokenBucket(tokens_per_minute, burst_seconds)
+        self._queue: List[_Waiter] = []
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+
+    def _publish_depth(self) -> None:
+        depths = Counter(stage_group(w.stage) for w in self._queue)
+        for group in set(config.LLM_STAGE_PRIORITIES) | set(depths):
+            metrics.set_gauge("shopez_llm_queue_depth", depths.get(group, 0), "LLM calls waiting for quota", stage=group)
+
+    def _enqueue(self, stage: str, tokens: int) -> _Waiter:
+        waiter = _Waiter(stage_priority(stage), next(self._seq), stage, tokens)
+        with self._cond:
+            heapq.heappush(self._queue, waiter)
+            self._publish_depth()
+        return waiter
+
+    def _try_acquire(self, waiter: _Waiter) -> float:
+        """0 once the waiter is admitted, otherwise seconds worth waiting before checking again; holds _cond"""
+        if self._queue[0] is not waiter:
+            return config.LLM_CALL_DEADLINE_SECONDS
+        now = time.monotonic()
+        wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(waiter.tokens, now))
+        if wait > 0:
+            return wait
+        heapq.heappop(self._queue)
+        self.requests.take(1)
+        self.tokens.take(waiter.tokens)
+        self._publish_depth()
+        self._cond.notify_all()
+        return 0.0
+
+    def _leave(self, waiter: _Waiter) -> None:
+        with self._cond:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+                self._publish_depth()
+                self._cond.notify_all()
+
+    def _expired(self, waiter: _Waiter) -> LLMDeadlineExceeded:
+        self._leave(waiter)
+        metrics.increment("shopez_llm_deadline_exceeded_total", help_text="LLM calls that missed their deadline",
+                          stage=waiter.stage)
+        return LLMDeadlineExceeded(f"LLM call for {waiter.stage} not admitted before its deadline")
+
+    def acquire(self, stage: str, tokens: int, deadline: float) -> None:
+        waiter = self._enqueue(stage, tokens)
+        start = time.perf_counter()
+        try:
+            with self._cond:
+                while True:
+                    wait = self._try_acquire(waiter)
+                    if wait == 0:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._expired(waiter)
+                    self._cond.wait(min(wait, remaining))
+        except BaseException:
+            self._leave(waiter)
+            raise
+        self._observe_wait(stage, start)
+
+    async def aacquire(self, stage: str, tokens: int, deadline: float) -> None:
+        waiter = self._enqueue(stage, tokens)
+        start = time.perf_counter()
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_acquire(waiter)
+                if wait == 0:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._expired(waiter)
+                await asyncio.sleep(min(wait, remaining, ASYNC_POLL_SECONDS))
+        except BaseException:
+            self._leave(waiter)
+            raise
+        self._observe_wait(stage, start)
+
+    def _observe_wait(self, stage: str, start: float) -> None:
+        metrics.observe("shopez_llm_queue_wait_seconds", time.perf_counter() - start,
+                        "Time LLM calls waited for quota", stage=stage_group(stage))
+
+    def _backoff(self, error: Exception, attempt: int, stage: str, deadline: float) -> Optional[float]:
+        """Seconds to sleep before retrying, or None when the error should be raised"""
+        retryable = is_retryable(error)
+        metrics.increment("shopez_llm_errors_total", help_text="LLM call failures by stage and retryability",
+                          stage=stage, retryable=retryable)
+        if not retryable or attempt >= config.LLM_MAX_RETRIES:
+            return None
+        # Full jitter keeps callers that failed together from retrying together
+        delay = random.uniform(0, min(config.LLM_RETRY_MAX_DELAY, config.LLM_RETRY_BASE_DELAY * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return None
+        metrics.increment("shopez_llm_retries_total", help_text="LLM calls retried after a transient error", stage=stage)
+        logger.warning(f"Retrying {stage} LLM call in {delay:.2f}s after: {error}")
+        return delay
+
+    def _settle(self, response: Any, reserved: int) -> None:
+        input_tokens, output_tokens = token_usage(response)
+        if input_tokens is not None and output_tokens is not None:
+            with self._cond:
+                self.tokens.adjust(input_tokens + output_tokens - reserved)
+
+    @staticmethod
+    def _reserve(prompt: Any) -> int:
+        return estimate_tokens(str(prompt)) + config.LLM_EXPECTED_OUTPUT_TOKENS
+
+    def invoke(self, llm, prompt: Any, stage: str) -> Any:
+        if not config.LLM_SCHEDULER_ENABLED:
+            return llm.invoke(prompt)
+        reserved = self._reserve(prompt)
+        deadline = time.monotonic() + stage_deadline(stage)
+        for attempt in itertools.count():
+            self.acquire(stage, reserved, deadline)
+            try:
+                response = llm.invoke(prompt)
+            except Exception as e:
+                delay = self._backoff(e, attempt, stage, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._settle(response, reserved)
+            return response
+
+    async def ainvoke(self, llm, prompt: Any, stage: str) -> Any:
+        if not config.LLM_SCHEDULER_ENABLED:
+            return await llm.ainvoke(prompt)
+        reserved = self._reserve(prompt)
+        deadline = time.monotonic() + stage_deadline(stage)
+        for attempt in itertools.count():
+            await self.aacquire(stage, reserved, deadline)
+            try:
+                # Unlike the sync path, the call itself is abandoned at the deadline
+                response = await asyncio.wait_for(llm.ainvoke(prompt), max(deadline - time.monotonic(), 0.001))
+            except Exception as e:
+                delay = self._backoff(e, attempt, stage, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._settle(response, reserved)
+            return response
+
+    def stream(self, llm, prompt: Any, stage: str) -> Iterator[Any]:
+        """Yield chunks of llm.stream(prompt); only failures before the first chunk are retried"""
+        if not config.LLM_SCHEDULER_ENABLED:
+            yield from llm.stream(prompt)
+            return
+        reserved = self._reserve(prompt)
+        deadline = time.monotonic() + stage_deadline(stage)
+        for attempt in itertools.count():
+            self.acquire(stage, reserved, deadline)
+            last_chunk = None
+            try:
+                for chunk in llm.stream(prompt):
+                    last_chunk = chunk
+                    yield chunk
+            except Exception as e:
+                delay = None if last_chunk is not None else self._backoff(e, attempt, stage, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._settle(last_chunk, reserved)
+            return
+
+
+llm_scheduler = LLMScheduler()
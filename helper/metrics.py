@@ -0,0 +1,251 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+# Structured span and event records, one JSON object per line
+event_logger = logging.getLogger("shopez.metrics")
+
+# Prometheus-style cumulative bucket bounds in seconds, from SQLite lookups to slow generations
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{v.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Histogram:
+    """Cumulative-bucket histogram plus a window of recent samples for exact percentiles"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window: int = 2048):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent: deque = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def summary(self) -> Dict[str, float]:
+        samples = list(self.recent)
+        if not samples:
+            return {"count": self.count}
+        return {
+            "count": self.count,
+            "p50": percentile(samples, 50),
+            "p95": percentile(samples, 95),
+            "p99": percentile(samples, 99),
+            "mean": self.sum / self.count,
+        }
+
+
+class MetricsRegistry:
+    """Process-wide counters and latency histograms, keyed by metric name and labels"""
+
+    def __init__(self, window: int = config.METRICS_WINDOW_SIZE):
+        self.window = window
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, help_text: str = "", **labels) -> None:
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = _label_key(labels)
+            if key not in series:
+                series[key] = Histogram(window=self.window)
+            series[key].observe(value)
+            if help_text:
+                self._help.setdefault(name, help_text)
+
+    def increment(self, name: str, amount: float = 1.0, help_text: str = "", **labels) -> None:
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0.0) + amount
+            if help_text:
+                self._help.setdefault(name, help_text)
+
+    def set_gauge(self, name: str, value: float, help_text: str = "", **labels) -> None:
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+            if help_text:
+                self._help.setdefault(name, help_text)
+
+    @contextmanager
+    def span(self, stage: str, **attributes) -> Iterator[Dict[str, Any]]:
+        """Time a pipeline stage; attributes added to the yielded dict go into its log line"""
+        record: Dict[str, Any] = dict(attributes)
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield record
+        except GeneratorExit:
+            # A streaming consumer stopped reading early
+            status = "cancelled"
+            raise
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self.observe(
+                "shopez_stage_latency_seconds", duration, "Latency of each response pipeline stage",
+                stage=stage, status=status,
+            )
+            log_event("span", stage=stage, status=status, duration_ms=round(duration * 1000, 3), **record)
+
+    def record_route(self, tier: str, tool_name: Optional[str]) -> None:
+        self.increment("shopez_route_decisions_total", help_text="Routing decisions by tier and tool",
+                       tier=tier, tool=tool_name or "none")
+
+    def record_cache(self, cache: str, hit: bool) -> None:
+        self.increment("shopez_cache_requests_total", help_text="Cache lookups by cache and result",
+                       cache=cache, result="hit" if hit else "miss")
+
+    def record_coalesced(self, flight: str, leader: bool) -> None:
+        # Follower calls are the executions saved by sharing an identical in-flight call
+        self.increment("shopez_singleflight_calls_total", help_text="Coalesced calls by role; followers were saved",
+                       flight=flight, role="leader" if leader else "follower")
+
+    def record_tokens(self, stage: str, input_tokens: Optional[int], output_tokens: Optional[int]) -> None:
+        if input_tokens:
+            self.increment("shopez_llm_tokens_total", input_tokens, "LLM tokens by stage and direction",
+                           stage=stage, direction="input")
+        if output_tokens:
+            self.increment("shopez_llm_tokens_total", output_tokens, "LLM tokens by stage and direction",
+                           stage=stage, direction="output")
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            for name, series in sorted(self._gauges.items()):
+                lines.append(f"# HELP {name} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {name} gauge")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus p50/p95/p99 of each histogram series over its recent window"""
+        with self._lock:
+            return {
+                "counters": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self._counters.items()
+                },
+                "gauges": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self._gauges.items()
+                },
+                "histograms": {
+                    name: [{"labels": dict(key), **histogram.summary()} for key, histogram in series.items()]
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+
+def log_event(event: str, **fields) -> None:
+    if config.METRICS_JSON_LOGS:
+        event_logger.info(json.dumps({"event": event, "ts": round(time.time(), 3), **fields}, default=str))
+
+
+def token_usage(response) -> Tuple[Optional[int], Optional[int]]:
+    """(input, output) token counts from a LangChain message's usage metadata, when reported"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("input_tokens"), usage.get("output_tokens")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body = json.dumps(metrics.snapshot()).encode("utf-8")
+            content_type = "application/json"
+        elif self.path.startswith("/metrics"):
+            body = metrics.render_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(host: str = config.METRICS_HOST, port: int = config.METRICS_PORT) -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread; safe to call repeatedly"""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            logger.warning(f"Metrics endpoint not started on {host}:{port}: {e}")
+            return None
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+        return _server
+
+
+metrics = MetricsRegistry()
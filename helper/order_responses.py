@@ -0,0 +1,80 @@
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+ORDER_ID_PATTERN = re.compile(r"\b[A-Z]{3}-\d{3}\b")
+ORDER_ID_HINT = "provide a valid order ID like ABC-123, XYZ-456 etc."
+MISSING_ORDER_ID_MESSAGE = f"I couldn't find an order ID in your message. Please {ORDER_ID_HINT}"
+
+# One sentence per order status; {details} carries tracking and delivery information when known
+ORDER_STATUS_TEMPLATES = {
+    "processing": "Your order {order_id} ({product_name}) is being processed and will ship soon.{details}",
+    "shipped": "Good news! Your order {order_id} ({product_name}) has shipped.{details}",
+    "delivered": "Your order {order_id} ({product_name}) has been delivered.{details} We hope you enjoy it!",
+    "cancelled": (
+        "Your order {order_id} ({product_name}) has been cancelled. "
+        "If you didn't request this, please contact our support team."
+    ),
+}
+DEFAULT_ORDER_STATUS_TEMPLATE = "The current status of your order {order_id} ({product_name}) is: {status}.{details}"
+
+
+def format_date(value: Optional[str]) -> Optional[str]:
+    """Render an ISO date as e.g. 'August 29, 2025'; anything else is returned unchanged"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        return value
+    return f"{parsed:%B} {parsed.day}, {parsed.year}"
+
+
+def _order_details(order: Dict[str, Any], status: str) -> str:
+    details = []
+    if order.get("tracking_number") and status in ("shipped", "delivered"):
+        details.append(f"Your tracking number is {order['tracking_number']}.")
+    delivery_date = format_date(order.get("estimated_delivery"))
+    if delivery_date and status in ("processing", "shipped"):
+        details.append(f"Estimated delivery is {delivery_date}.")
+    elif delivery_date and status == "delivered":
+        details.append(f"It was scheduled to arrive on {delivery_date}.")
+    return "".join(f" {d}" for d in details)
+
+
+def render_order_status(order: Dict[str, Any]) -> str:
+    """Deterministic customer-facing sentence for an order row"""
+    status = (order.get("status") or "unknown").lower()
+    template = ORDER_STATUS_TEMPLATES.get(status, DEFAULT_ORDER_STATUS_TEMPLATE)
+    return template.format(
+        order_id=order.get("order_id"),
+        product_name=order.get("product_name") or "your item",
+        status=status,
+        details=_order_details(order, status),
+    )
+
+
+def order_not_found_message(order_id: str) -> str:
+    return f"I'm sorry, I couldn't find any information for order ID: {order_id}. Please check the ID and try again."
+
+
+def render_orders_reply(order_ids: List[str], orders: Dict[str, Dict[str, Any]]) -> str:
+    """One paragraph per requested order, in the order the user asked"""
+    if not order_ids:
+        return MISSING_ORDER_ID_MESSAGE
+    return "\n\n".join(
+        render_order_status(orders[order_id]) if order_id in orders else order_not_found_message(order_id)
+        for order_id in order_ids
+    )
+
+
+def normalize_order_ids(order_ids) -> List[str]:
+    """Uppercased, de-duplicated IDs in first-seen order; accepts a single ID or a list"""
+    if isinstance(order_ids, str):
+        order_ids = [order_ids]
+    seen: List[str] = []
+    for order_id in order_ids or []:
+        order_id = str(order_id).strip().upper()
+        if order_id and order_id not in seen:
+            seen.append(order_id)
+    return seen
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, Optional
+
+from helper.metrics import metrics
+
+
+class LeaderAbandoned(Exception):
+    """The leading call stopped before producing a result; followers compute their own"""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+    def wait(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution; every caller receives its result"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key: Hashable):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+        metrics.record_coalesced(self.name, leader)
+        return call, leader
+
+    def _finish(self, key: Hashable, call: _Call, result: Any = None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+        call.result, call.error = result, error
+        call.done.set()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        call, leader = self._join(key)
+        if not leader:
+            try:
+                return call.wait()
+            except LeaderAbandoned:
+                return self.do(key, fn)
+        try:
+            result = fn()
+        except Exception as e:
+            self._finish(key, call, error=e)
+            raise
+        except BaseException:
+            self._finish(key, call, error=LeaderAbandoned())
+            raise
+        self._finish(key, call, result=result)
+        return result
+
+    def stream(self, key: Hashable, fn: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """The leader streams as usual; followers get the leader's full text as one chunk once it finishes"""
+        call, leader = self._join(key)
+        if not leader:
+            try:
+                yield call.wait()
+            except LeaderAbandoned:
+                yield from self.stream(key, fn)
+            return
+        parts = []
+        try:
+            for token in fn():
+                parts.append(token)
+                yield token
+        except Exception as e:
+            self._finish(key, call, error=e)
+            raise
+        except BaseException:
+            # Includes GeneratorExit when the leader's reader stops early
+            self._finish(key, call, error=LeaderAbandoned())
+            raise
+        self._finish(key, call, result="".join(parts))
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines sharing one event loop"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is not None:
+            metrics.record_coalesced(self.name, leader=False)
+            try:
+                # Shielded so a follower's cancellation does not cancel the shared call
+                return await asyncio.shield(future)
+            except LeaderAbandoned:
+                return await self.do(key, fn)
+
+        metrics.record_coalesced(self.name, leader=True)
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            future.set_exception(LeaderAbandoned())
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._calls.pop(key, None)
+            # Nobody may be waiting; mark any exception retrieved so asyncio does not log it
+            if future.done() and not future.cancelled():
+                future.exception()
@@ -0,0 +1,119 @@
+import asyncio
+import re
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+ORDER_ID_PATTERN = re.compile(r"\b[A-Z]{3}-\d{3}\b")
+POLICY_KEYWORDS = (
+    "return", "refund", "exchange", "payment", "pay", "billing", "ship",
+    "deliver", "policy", "policies", "cancel", "warranty", "cod",
+)
+
+
+class StubChatModel(BaseChatModel):
+    """Deterministic offline chat model that mimics the parts of Gemini the app relies on"""
+
+    model_name: str = "stub"
+    temperature: float = 0.0
+    latency: float = 0.0
+    response: Optional[str] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        """Bind tools the same way real chat models expose them to the planner"""
+        formatted_tools = [convert_to_openai_tool(t) for t in tools]
+        return self.bind(tools=formatted_tools, **kwargs)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages, kwargs.get("tools")))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages, kwargs.get("tools")))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        if self.latency:
+            time.sleep(self.latency)
+        content = self._reply(messages, None).content
+        for word in re.findall(r"\S+\s*", content):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word))
+            if run_manager:
+                run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
+
+    def _reply(self, messages: List[BaseMessage], tools: Optional[List[Dict]]) -> AIMessage:
+        prompt = str(messages[-1].content) if messages else ""
+        if tools:
+            return AIMessage(content="", tool_calls=[self._pick_tool(prompt, tools)])
+        return AIMessage(content=self._text_reply(prompt))
+
+    def _text_reply(self, prompt: str) -> str:
+        if self.response is not None:
+            return self.response
+
+        # Behave as an identity rewriter so query rewriting stays meaningful offline
+        for line in prompt.splitlines():
+            line = line.strip()
+            if line.startswith("Current Query:"):
+                return line[len("Current Query:"):].strip()
+
+        snippet = " ".join(prompt.split())[-160:]
+        return f"Thanks for contacting ShopEZ support. (offline stub reply to: {snippet})"
+
+    def _pick_tool(self, prompt: str, tools: List[Dict]) -> Dict[str, Any]:
+        functions = [t["function"] for t in tools]
+        order_ids = ORDER_ID_PATTERN.findall(prompt)
+        lowered = prompt.lower()
+
+        chosen = None
+        if order_ids:
+            chosen = next((f for f in functions if any("order" in p for p in _params(f))), None)
+        if chosen is None and any(word in lowered for word in POLICY_KEYWORDS):
+            chosen = next((f for f in functions if "polic" in f.get("description", "").lower()), None)
+        if chosen is None:
+            chosen = next((f for f in functions if "default" in f.get("description", "").lower()), functions[-1])
+
+        args = {}
+        for name, schema in _params(chosen).items():
+            if schema.get("type") == "array":
+                args[name] = order_ids
+            elif "order" in name:
+                args[name] = order_ids[0] if order_ids else ""
+            else:
+                args[name] = prompt
+        return {"name": chosen["name"], "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"}
+
+
+def _params(function: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    return function.get("parameters", {}).get("properties", {})
@@ -0,0 +1,327 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from config import (
+    CANONICAL_POLICY_QUESTIONS,
+    PRECOMPUTED_ANSWER_MIN_MARGIN,
+    PRECOMPUTED_ANSWER_SIMILARITY_THRESHOLD,
+    PRECOMPUTED_ANSWERS_PATH,
+)
+from helper.llm_scheduler import llm_scheduler
+from helper.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Answers that only say the context did not cover the question are kept for review, never served
+NON_ANSWER_MARKERS = ("don't know", "do not know", "i apologize", "not able to answer", "no information")
+
+
+@dataclass
+class PrecomputedAnswer:
+    question: str
+    answer: str
+    vector: List[float]
+    # Hashes of the retrieved chunks the answer was generated from
+    chunk_hashes: List[str]
+    # The same chunks with their file, page and section, which the citations are drawn from
+    chunk_keys: List[str] = field(default_factory=list)
+    sources: List[Dict[str, Any]] = field(default_factory=list)
+    vetted: bool = False
+    rejection: Optional[str] = None
+    built_at: float = field(default_factory=time.time)
+
+    def is_current(self, live_chunk_hashes: Set[str]) -> bool:
+        """False once any chunk it was built from has changed or been removed"""
+        return all(chunk_hash in live_chunk_hashes for chunk_hash in self.chunk_hashes)
+
+
+def corpus_fingerprint(live_chunk_hashes: Iterable[str]) -> str:
+    """Changes whenever any chunk is added, edited or removed"""
+    return hashlib.sha256("\n".join(sorted(live_chunk_hashes)).encode("utf-8")).hexdigest()
+
+
+def document_chunk_hashes(documents) -> List[str]:
+    return sorted({d.metadata["chunk_hash"] for d in documents if d.metadata.get("chunk_hash")})
+
+
+def document_chunk_keys(documents) -> List[str]:
+    """Chunk hash and position of each document; differs when the same text moved to another page or section"""
+    return sorted({
+        "|".join(str(d.metadata.get(f)) for f in ("chunk_hash", "source", "page", "chunk_index", "section", "heading"))
+        for d in documents if d.metadata.get("chunk_hash")
+    })
+
+
+def vet_answer(answer: str, sources: Sequence[Dict[str, Any]]) -> Optional[str]:
+    """Reason an answer must not be served, or None when it passes"""
+    if not answer or not answer.strip():
+        return "empty answer"
+    if not sources:
+        return "no supporting policy text retrieved"
+    lowered = answer.lower()
+    for marker in NON_ANSWER_MARKERS:
+        if marker in lowered:
+            return f"non-answer ({marker!r})"
+    return None
+
+
+class AnswerIndex:
+    """Answers to canonical policy questions, built at ingest time and matched by question embedding"""
+
+    def __init__(
+        self,
+        path: str = PRECOMPUTED_ANSWERS_PATH,
+        similarity_threshold: float = PRECOMPUTED_ANSWER_SIMILARITY_THRESHOLD,
+        min_margin: float = PRECOMPUTED_ANSWER_MIN_MARGIN,
+    ):
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.min_margin = min_margin
+        self.entries: Dict[str, PrecomputedAnswer] = {}
+        self.embedding_model: Optional[str] = None
+        # Fingerprint of the chunks the answers were last checked against
+        self.corpus: Optional[str] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._served: List[PrecomputedAnswer] = []
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def load(self) -> "AnswerIndex":
+        if not os.path.exists(self.path):
+            return self
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            with self._lock:
+                self.embedding_model = data.get("embedding_model")
+                self.corpus = data.get("corpus")
+                self.entries = {e["question"]: PrecomputedAnswer(**e) for e in data.get("entries", [])}
+                self._matrix = None
+            logger.info(f"Loaded {len(self.entries)} precomputed answers from {self.path}")
+        except Exception as e:
+            logger.error(f"Error reading precomputed answers {self.path}, starting fresh: {e}")
+            self.entries = {}
+        return self
+
+    def save(self) -> None:
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "version": 1,
+                        "embedding_model": self.embedding_model,
+                        "corpus": self.corpus,
+                        "entries": [asdict(e) for e in self.entries.values()],
+                    },
+                    f, indent=2,
+                )
+            os.replace(tmp_path, self.path)
+
+    def lookup(self, vector: Sequence[float]) -> Optional[PrecomputedAnswer]:
+        """The vetted answer whose question is most similar to the query
+
+        None unless the similarity clears the threshold and beats the next closest question by the
+        margin, so a query between two canonical questions goes through normal retrieval.
+        """
+        with self._lock:
+            if self._matrix is None:
+                self._served = [e for e in self.entries.values() if e.vetted]
+                self._matrix = np.stack([_unit(e.vector) for e in self._served]) if self._served else np.zeros((0, 0))
+            matrix, served = self._matrix, self._served
+        vector = _unit(vector)
+        if not served or matrix.shape[1] != len(vector):
+            return None
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        if len(served) > 1 and scores[best] - np.partition(scores, -2)[-2] < self.min_margin:
+            return None
+        return served[best]
+
+    def stale_questions(
+        self, questions: Sequence[str], live_chunk_hashes: Set[str], embedding_model: Optional[str] = None
+    ) -> List[str]:
+        """Questions with no answer yet or whose answer depends on a chunk that changed"""
+        if embedding_model is not None and embedding_model != self.embedding_model:
+            return list(questions)
+        return [
+            q for q in questions
+            if q not in self.entries or not self.entries[q].is_current(live_chunk_hashes)
+        ]
+
+    def changed_questions(
+        self, questions: Sequence[str], retrieve: Optional[Callable[[str], Set[str]]]
+    ) -> List[str]:
+        """Answered questions to rebuild after the corpus changed
+
+        Rejected answers are retried, and an answer is rebuilt when retrieval for its question now
+        returns different chunk keys, e.g. a new document covering it or a cited chunk that moved.
+        """
+        changed = []
+        for question in questions:
+            entry = self.entries.get(question)
+            if entry is None:
+                continue
+            if not entry.vetted:
+                changed.append(question)
+                continue
+            if retrieve is None:
+                continue
+            try:
+                retrieved = set(retrieve(question))
+            except Exception as e:
+                logger.error(f"Error re-checking retrieval for {question!r}: {e}")
+                retrieved = None
+            if retrieved != set(entry.chunk_keys):
+                changed.append(question)
+        return changed
+
+    def prune(
+        self,
+        live_chunk_hashes: Set[str],
+        embedding_model: Optional[str] = None,
+        questions: Sequence[str] = CANONICAL_POLICY_QUESTIONS,
+        force: bool = False,
+        retrieve: Optional[Callable[[str], Set[str]]] = None,
+        corpus: Optional[str] = None,
+    ) -> List[str]:
+        """Drop answers that may no longer be served and return the questions to (re)build
+
+        retrieve maps a question to the chunk keys retrieval returns for it now; it is only called
+        when the corpus fingerprint (by default one over the live chunk hashes) has changed since
+        the last prune.
+        """
+        questions = list(dict.fromkeys(questions))
+        corpus = corpus or corpus_fingerprint(live_chunk_hashes)
+        stale = list(questions) if force else self.stale_questions(questions, live_chunk_hashes, embedding_model)
+        if not force and corpus != self.corpus:
+            # Retrieval runs outside the lock so lookups are not held up by it
+            stale += self.changed_questions([q for q in questions if q not in stale], retrieve)
+        with self._lock:
+            removed = set(self.entries) - set(questions)
+            for question in removed:
+                del self.entries[question]
+            if not force:
+                # Answers built from changed chunks (or with another embedding model) stop being served now
+                for question in stale:
+                    self.entries.pop(question, None)
+            if embedding_model is not None:
+                self.embedding_model = embedding_model
+            corpus_changed, self.corpus = corpus != self.corpus, corpus
+            self._matrix = None
+        if removed or corpus_changed or (stale and not force):
+            self.save()
+        return stale
+
+    def build(self, rag_manager, llm, questions: Sequence[str]) -> Dict[str, int]:
+        """Generate, vet and store answers to the given questions"""
+        stats = {"built": 0, "rejected": 0, "failed": 0}
+        for question in questions:
+            try:
+                entry = build_answer(rag_manager, llm, question)
+            except Exception as e:
+                logger.error(f"Error precomputing answer for {question!r}: {e}")
+                stats["failed"] += 1
+                with self._lock:
+                    # A stale answer is worse than none; the question is retried on the next refresh
+                    self.entries.pop(question, None)
+                    self._matrix = None
+                continue
+            if entry.vetted:
+                stats["built"] += 1
+            else:
+                stats["rejected"] += 1
+                logger.warning(f"Precomputed answer for {question!r} rejected: {entry.rejection}")
+            with self._lock:
+                self.entries[question] = entry
+                self._matrix = None
+        if questions:
+            self.save()
+        logger.info(f"Precomputed answers built: {stats}")
+        return stats
+
+
+def build_answer(rag_manager, llm, question: str) -> PrecomputedAnswer:
+    """Answer one canonical question through the normal retrieval and generation path"""
+    with metrics.span("precompute_answer") as span:
+        documents = rag_manager.retrieve(question)
+        prompt, packed = rag_manager.build_answer_prompt(question, documents)
+        response = llm_scheduler.invoke(llm, prompt, "precompute")
+        span["chunks"] = len(documents)
+    rejection = vet_answer(response.content, packed.sources)
+    return PrecomputedAnswer(
+        question=question,
+        answer=rag_manager.with_citations(response.content, packed),
+        vector=[float(x) for x in rag_manager.embedding_model.embed_query(question)],
+        chunk_hashes=document_chunk_hashes(documents),
+        chunk_keys=document_chunk_keys(documents),
+        sources=packed.sources,
+        vetted=rejection is None,
+        rejection=rejection,
+    )
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def nearest_questions(questions: Sequence[str], embedding_model) -> List[Tuple[str, str, float]]:
+    """(question, closest other question, similarity) under the given embedding model
+
+    A threshold below these similarities lets a query worded like one question pick up the
+    answer to its neighbour.
+    """
+    matrix = np.stack([_unit(v) for v in embedding_model.embed_documents(list(questions))])
+    scores = matrix @ matrix.T
+    np.fill_diagonal(scores, -np.inf)
+    return [(q, questions[int(np.argmax(row))], float(np.max(row))) for q, row in zip(questions, scores)]
+
+
+def describe(index: AnswerIndex) -> List[Tuple[str, str, str]]:
+    """(status, question, answer) rows for review"""
+    return [
+        ("vetted" if e.vetted else f"rejected: {e.rejection}", e.question, e.answer)
+        for e in index.entries.values()
+    ]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build and review the precomputed policy answers")
+    parser.add_argument("--rebuild", action="store_true", help="Regenerate every answer, not only stale ones")
+    parser.add_argument("--list", action="store_true", help="Print the stored answers without building")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="Print how similar each canonical question is to its closest neighbour")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.calibrate:
+        from rag.embeddings import get_embedding_model
+
+        print(f"threshold {PRECOMPUTED_ANSWER_SIMILARITY_THRESHOLD}, margin {PRECOMPUTED_ANSWER_MIN_MARGIN}")
+        rows = nearest_questions(list(dict.fromkeys(CANONICAL_POLICY_QUESTIONS)), get_embedding_model())
+        for question, neighbour, score in sorted(rows, key=lambda r: r[2], reverse=True):
+            print(f"{score:.3f}  {question}  ~  {neighbour}")
+    elif args.list:
+        for status, question, answer in describe(AnswerIndex().load()):
+            print(f"[{status}] {question}\n{answer}\n")
+    else:
+        from rag.rag_engine import rag_engine
+
+        print(rag_engine.get_manager().refresh_answer_index(force=args.rebuild))
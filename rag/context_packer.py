@@ -0,0 +1,152 @@
+import math
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+# Gemini and BERT-style tokenizers average roughly four characters per token on English prose
+CHARS_PER_TOKEN = 4
+# Shortest suffix/prefix match treated as splitter overlap rather than coincidence
+MIN_OVERLAP_CHARS = 20
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+@dataclass
+class Passage:
+    """Consecutive chunks of one page and section merged into a single span of text"""
+
+    source: Optional[str]
+    page: Optional[int]
+    text: str
+    rank: int
+    chunk_indexes: List[int] = field(default_factory=list)
+    chunk_count: int = 1
+    heading: Optional[str] = None
+
+    def render(self) -> str:
+        if self.source is None:
+            return self.text
+        label = f"{self.source}, page {self.page}" + (f", {self.heading}" if self.heading else "")
+        return f"[{label}]\n{self.text}"
+
+
+@dataclass
+class PackedContext:
+    context: str
+    sources: List[Dict[str, Any]]
+    context_tokens: int
+    chunks_retrieved: int
+    chunks_packed: int
+
+
+def merge_overlapping(left: str, right: str, max_overlap: int) -> Optional[str]:
+    """Join two chunks if the end of left repeats at the start of right; None when they do not overlap"""
+    if right in left:
+        return left
+    longest = min(len(left), len(right), max_overlap)
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return None
+
+
+def _dedupe(documents: List["Document"]) -> List["Document"]:
+    """Drop repeated chunks and chunks wholly contained in a better-ranked one"""
+    kept: List["Document"] = []
+    seen = set()
+    for doc in documents:
+        key = doc.metadata.get("chunk_hash") or doc.page_content
+        if key in seen:
+            continue
+        seen.add(key)
+        if any(doc.page_content in other.page_content for other in kept):
+            continue
+        kept.append(doc)
+    return kept
+
+
+def _page_passages(docs: List[Tuple[int, "Document"]], max_overlap: int) -> List[Passage]:
+    """Merge chunks of one page in reading order, joining neighbours and splitter overlap"""
+    ordered = sorted(docs, key=lambda item: (item[1].metadata.get("chunk_index", item[0]), item[0]))
+    passages: List[Passage] = []
+    for rank, doc in ordered:
+        index = doc.metadata.get("chunk_index")
+        if passages and passages[-1].heading == doc.metadata.get("heading"):
+            last = passages[-1]
+            merged = merge_overlapping(last.text, doc.page_content, max_overlap)
+            adjacent = index is not None and last.chunk_indexes and index == last.chunk_indexes[-1] + 1
+            if merged is None and adjacent:
+                merged = f"{last.text} {doc.page_content}"
+            if merged is not None:
+                last.text = merged
+                last.rank = min(last.rank, rank)
+                last.chunk_count += 1
+                if index is not None:
+                    last.chunk_indexes.append(index)
+                continue
+        passages.append(Passage(
+            source=doc.metadata.get("source"),
+            page=doc.metadata.get("page"),
+            text=doc.page_content,
+            rank=rank,
+            chunk_indexes=[index] if index is not None else [],
+            heading=doc.metadata.get("heading"),
+        ))
+    return passages
+
+
+def format_citations(sources: List[Dict[str, Any]]) -> str:
+    """One line naming the file, page and section of each source"""
+    labels = [
+        f"{s['source']}, page {s['page']}" + (f" ({s['section']})" if s.get("section") else "")
+        for s in sources
+    ]
+    return ("Source: " if len(labels) == 1 else "Sources: ") + "; ".join(labels)
+
+
+def pack_context(documents: List["Document"], token_budget: int, max_overlap: int = 200) -> PackedContext:
+    """Deduplicate, merge same-page neighbours and keep the best-ranked passages within token_budget"""
+    unique = _dedupe(documents)
+
+    pages: Dict[Tuple[Any, Any], List[Tuple[int, "Document"]]] = {}
+    for rank, doc in enumerate(unique):
+        pages.setdefault((doc.metadata.get("source"), doc.metadata.get("page")), []).append((rank, doc))
+    passages = sorted(
+        (p for page_docs in pages.values() for p in _page_passages(page_docs, max_overlap)),
+        key=lambda p: p.rank,
+    )
+
+    blocks: List[str] = []
+    used = 0
+    packed: List[Passage] = []
+    for passage in passages:
+        block = passage.render()
+        cost = estimate_tokens(block)
+        if used + cost > token_budget:
+            if blocks:
+                continue
+            # Never send an empty context because the single best passage is long
+            block = block[:token_budget * CHARS_PER_TOKEN]
+            cost = estimate_tokens(block)
+        blocks.append(block)
+        packed.append(passage)
+        used += cost
+
+    sources: List[Dict[str, Any]] = []
+    for passage in packed:
+        source = {"source": passage.source, "page": passage.page, "section": passage.heading}
+        if passage.source is not None and source not in sources:
+            sources.append(source)
+
+    context = "\n\n".join(blocks)
+    return PackedContext(
+        context=context,
+        sources=sources,
+        context_tokens=estimate_tokens(context),
+        chunks_retrieved=len(documents),
+        chunks_packed=sum(p.chunk_count for p in packed),
+    )
@@ -0,0 +1,203 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILENAME = "vectors.bin"
+SLOT_KEYS_FILENAME = "slot_keys.bin"
+INDEX_FILENAME = "index.json"
+# Persist the key index after this many new entries even without an explicit save
+SAVE_EVERY = 256
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha1(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCacheStore:
+    """Fixed-capacity, memory-mapped vector store with LRU slot reuse and a JSON key index"""
+
+    def __init__(self, cache_dir: str, model_name: str, dim: int, max_entries: int):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.dim = dim
+        self.max_entries = max_entries
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free_slots: List[int] = []
+        self._lock = threading.RLock()
+        self._unsaved = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._slot_keys: Optional[np.memmap] = None
+        self._vectors = self._open()
+
+    @property
+    def vectors_path(self) -> str:
+        return os.path.join(self.cache_dir, VECTORS_FILENAME)
+
+    @property
+    def slot_keys_path(self) -> str:
+        return os.path.join(self.cache_dir, SLOT_KEYS_FILENAME)
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.cache_dir, INDEX_FILENAME)
+
+    def _open(self) -> np.memmap:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        index = None
+        paths = (self.index_path, self.vectors_path, self.slot_keys_path)
+        if all(os.path.exists(p) for p in paths):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+            except Exception as e:
+                logger.error(f"Error reading embedding cache index, starting fresh: {e}")
+
+        compatible = (
+            index is not None
+            and index.get("model") == self.model_name
+            and index.get("dim") == self.dim
+            and index.get("max_entries") == self.max_entries
+        )
+        if compatible:
+            self._slots = OrderedDict((key, slot) for key, slot in index["entries"])
+            used = set(self._slots.values())
+            self._free_slots = [s for s in range(self.max_entries - 1, -1, -1) if s not in used]
+            logger.info(f"Loaded {len(self._slots)} cached embeddings from {self.cache_dir}")
+            self._slot_keys = np.memmap(self.slot_keys_path, dtype="S40", mode="r+", shape=(self.max_entries,))
+            return np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(self.max_entries, self.dim))
+
+        self._slots = OrderedDict()
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+        vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="w+", shape=(self.max_entries, self.dim))
+        self._slot_keys = np.memmap(self.slot_keys_path, dtype="S40", mode="w+", shape=(self.max_entries,))
+        self._write_index()
+        return vectors
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        with self._lock:
+            found = []
+            for key in keys:
+                slot = self._slots.get(key)
+                # A slot reused after the index was last saved holds another key's vector
+                if slot is not None and self._slot_keys[slot] != key.encode():
+                    del self._slots[key]
+                    self._free_slots.append(slot)
+                    slot = None
+                if slot is None:
+                    self.misses += 1
+                    found.append(None)
+                else:
+                    self._slots.move_to_end(key)
+                    self.hits += 1
+                    found.append(np.array(self._vectors[slot]))
+            return found
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]) -> None:
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                slot = self._slots.get(key)
+                if slot is None:
+                    if self._free_slots:
+                        slot = self._free_slots.pop()
+                    else:
+                        _, slot = self._slots.popitem(last=False)
+                        self.evictions += 1
+                    self._slots[key] = slot
+                    self._unsaved += 1
+                self._slots.move_to_end(key)
+                self._vectors[slot] = np.asarray(vector, dtype=np.float32)
+                self._slot_keys[slot] = key.encode()
+            if self._unsaved >= SAVE_EVERY:
+                self.save()
+
+    def save(self) -> None:
+        """Flush vectors, then the key index, so the index never points at unwritten rows"""
+        with self._lock:
+            self._vectors.flush()
+            self._slot_keys.flush()
+            self._write_index()
+            self._unsaved = 0
+
+    def _write_index(self) -> None:
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "model": self.model_name,
+                    "dim": self.dim,
+                    "max_entries": self.max_entries,
+                    "entries": list(self._slots.items()),
+                },
+                f,
+            )
+        os.replace(tmp_path, self.index_path)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._slots),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only runs the underlying model for texts it has not seen"""
+
+    def __init__(self, model: Embeddings, model_name: str, cache_dir: str, max_entries: int, dim: int):
+        self.model = model
+        self.model_name = model_name
+        self.store = EmbeddingCacheStore(cache_dir, model_name, dim, max_entries)
+        # Keeps embedding_dimension() and other callers of .client working
+        self.client = getattr(model, "client", None)
+        atexit.register(self.store.save)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [cache_key(self.model_name, t) for t in texts]
+        cached = self.store.get_many(keys)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            computed = self.model.embed_documents([texts[i] for i in missing])
+            self.store.put_many([keys[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                cached[i] = vector
+            if len(missing) > 1:
+                self.store.save()
+        return [_as_list(vector) for vector in cached]
+
+    def embed_query(self, text: str) -> List[float]:
+        # Sentence-transformer models embed queries and documents identically,
+        # so both share one cache entry per text
+        key = cache_key(self.model_name, text)
+        cached = self.store.get_many([key])[0]
+        if cached is not None:
+            return _as_list(cached)
+        vector = self.model.embed_query(text)
+        self.store.put_many([key], [vector])
+        return vector
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
+
+
+def _as_list(vector) -> List[float]:
+    return vector.tolist() if isinstance(vector, np.ndarray) else list(vector)
@@ -0,0 +1,75 @@
+import logging
+import threading
+
+from config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_MODEL,
+    STUB_EMBEDDING_DIM,
+    STUB_EMBEDDING_LATENCY,
+)
+
+logger = logging.getLogger(__name__)
+
+_embedding_model = None
+_embedding_lock = threading.Lock()
+
+
+def get_embedding_model():
+    """Return the process-wide embedding model, loading it on first use
+
+    Ingestion, retrieval, the router and the answer caches all share this
+    instance, and with it the on-disk embedding cache.
+    """
+    global _embedding_model
+    if _embedding_model is not None:
+        return _embedding_model
+
+    with _embedding_lock:
+        if _embedding_model is None:
+            model = _load_model()
+            if EMBEDDING_CACHE_ENABLED:
+                from rag.embedding_cache import CachedEmbeddings
+
+                model = CachedEmbeddings(
+                    model,
+                    model_name=embedding_model_name(),
+                    cache_dir=EMBEDDING_CACHE_DIR,
+                    max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+                    dim=embedding_dimension(model),
+                )
+            _embedding_model = model
+        return _embedding_model
+
+
+def embedding_model_name() -> str:
+    """Name cached vectors are keyed by, so stub and real embeddings never mix"""
+    if EMBEDDING_BACKEND == "stub":
+        return f"stub-hashing-{STUB_EMBEDDING_DIM}"
+    return EMBEDDING_MODEL
+
+
+def _load_model():
+    if EMBEDDING_BACKEND == "stub":
+        from rag.stub_embeddings import HashingEmbeddings
+
+        logger.info(f"Using offline hashing embeddings (dim={STUB_EMBEDDING_DIM})")
+        return HashingEmbeddings(dim=STUB_EMBEDDING_DIM, latency=STUB_EMBEDDING_LATENCY)
+    if EMBEDDING_BACKEND != "huggingface":
+        raise ValueError(f"Unknown embedding backend: {EMBEDDING_BACKEND}")
+
+    from langchain.embeddings import HuggingFaceEmbeddings
+
+    model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    logger.info(f"Loaded embedding model {EMBEDDING_MODEL}")
+    return model
+
+
+def embedding_dimension(embedding_model) -> int:
+    """Vector size produced by an embedding model"""
+    client = getattr(embedding_model, "client", None)
+    if client is not None and hasattr(client, "get_sentence_embedding_dimension"):
+        return client.get_sentence_embedding_dimension()
+    return len(embedding_model.embed_query("dimension probe"))
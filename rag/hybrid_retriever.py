@@ -0,0 +1,57 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+
+from rag.lexical_index import BM25Index
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int, rrf_k: int = 60) -> List[Document]:
+    """Merge ranked lists by summing 1 / (rrf_k + rank) per chunk"""
+    scores: Dict[str, float] = {}
+    by_id: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            doc_id = doc.metadata.get("_id") or doc.page_content
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+            by_id.setdefault(doc_id, doc)
+    ordered = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [by_id[doc_id] for doc_id in ordered]
+
+
+class HybridRetriever(BaseRetriever):
+    """Dense vector search and BM25 over the same chunks, fused with reciprocal-rank fusion"""
+
+    vectorstore: VectorStore
+    lexical_index: Any
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+    # Metadata field -> accepted values, applied to both searches
+    where: Optional[Dict[str, Sequence[Any]]] = None
+    # The same condition in the vector store's own filter format
+    vector_filter: Any = None
+
+    @property
+    def _search_kwargs(self) -> Dict[str, Any]:
+        return {"filter": self.vector_filter} if self.vector_filter is not None else {}
+
+    def _lexical_documents(self, query: str) -> List[Document]:
+        index: BM25Index = self.lexical_index
+        docs = []
+        for doc_id, _ in index.search(query, k=self.fetch_k, where=self.where):
+            payload = index.docs[doc_id]
+            docs.append(Document(page_content=payload["page_content"], metadata={**payload["metadata"], "_id": doc_id}))
+        return docs
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        dense = self.vectorstore.similarity_search(query, k=self.fetch_k, **self._search_kwargs)
+        return reciprocal_rank_fusion([dense, self._lexical_documents(query)], k=self.k, rrf_k=self.rrf_k)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        dense = await self.vectorstore.asimilarity_search(query, k=self.fetch_k, **self._search_kwargs)
+        return reciprocal_rank_fusion([dense, self._lexical_documents(query)], k=self.k, rrf_k=self.rrf_k)
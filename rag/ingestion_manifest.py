@@ -0,0 +1,100 @@
+import hashlib
+import json
+import logging
+import os
+import uuid
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Fixed namespace so the same chunk always maps to the same point ID
+POINT_ID_NAMESPACE = uuid.UUID("6f1c3b7e-2d4a-4f0e-9a51-3c8e2b7d9f10")
+
+
+def hash_file(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_point_id(filename: str, chunk_hash: str) -> str:
+    """Deterministic Qdrant point ID for a chunk of a given file"""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{filename}:{chunk_hash}"))
+
+
+class IngestionManifest:
+    """Per-file and per-chunk content hashes of what is currently in the vector store"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, Dict] = {}
+        self.chunking_version: Optional[int] = None
+        self.load()
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            self.clear()
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.files = data.get("files", {})
+            self.chunking_version = data.get("chunking_version")
+        except Exception as e:
+            logger.error(f"Error reading ingestion manifest {self.path}, starting fresh: {e}")
+            self.clear()
+
+    def save(self) -> None:
+        """Write atomically so a crash mid-sync never leaves a half-written manifest"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": 1, "chunking_version": self.chunking_version, "files": self.files},
+                f, indent=2, sort_keys=True
+            )
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        self.files = {}
+        self.chunking_version = None
+
+    def file_hash(self, filename: str) -> Optional[str]:
+        entry = self.files.get(filename)
+        return entry["file_hash"] if entry else None
+
+    def chunks(self, filename: str) -> Dict[str, str]:
+        """Map of chunk hash to point ID for a file"""
+        entry = self.files.get(filename)
+        return dict(entry["chunks"]) if entry else {}
+
+    def chunk_positions(self, filename: str) -> Dict[str, Dict]:
+        """Map of chunk hash to the page, position and section last written to its payload"""
+        entry = self.files.get(filename)
+        return dict(entry.get("positions", {})) if entry else {}
+
+    def fingerprint(self) -> str:
+        """Changes whenever a chunk is added, removed or moves to another page, position or section"""
+        state = {
+            filename: {"chunks": sorted(entry["chunks"]), "positions": entry.get("positions", {})}
+            for filename, entry in self.files.items()
+        }
+        return hashlib.sha256(json.dumps(state, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def chunk_hashes(self) -> Set[str]:
+        """Hashes of every chunk currently ingested, across files"""
+        return {chunk_hash for entry in self.files.values() for chunk_hash in entry["chunks"]}
+
+    def set_file(
+        self, filename: str, file_hash: str, chunks: Dict[str, str], positions: Optional[Dict[str, Dict]] = None
+    ) -> None:
+        self.files[filename] = {"file_hash": file_hash, "chunks": chunks, "positions": positions or {}}
+
+    def remove_file(self, filename: str) -> None:
+        self.files.pop(filename, None)
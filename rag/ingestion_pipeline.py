@@ -0,0 +1,287 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from config import (
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    INGEST_EMBED_BATCH_SIZE,
+    INGEST_MAX_PENDING_BATCHES,
+    INGEST_MAX_WORKERS,
+    INGEST_UPSERT_BATCH_SIZE,
+)
+from rag.ingestion_manifest import IngestionManifest, chunk_point_id, hash_file, hash_text
+from rag.policy_sections import GENERAL_SECTION, split_sections
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever chunk boundaries change so unchanged files get re-chunked once
+CHUNKING_VERSION = 4
+
+
+def parse_pdf_pages(file_path: str) -> List[Tuple[int, str]]:
+    """Extract (page number, text) pairs; runs inside worker processes"""
+    import fitz  # PyMuPDF
+
+    pages = []
+    with fitz.open(file_path) as pdf:
+        for page_num, page in enumerate(pdf, start=1):
+            text = page.get_text()
+            if text.strip():
+                pages.append((page_num, text))
+    return pages
+
+
+@dataclass
+class PendingChunk:
+    filename: str
+    page: int
+    text: str
+    chunk_hash: str
+    point_id: str
+    # Position within the page, so retrieval can stitch neighbouring chunks back together
+    chunk_index: int = 0
+    section: str = GENERAL_SECTION
+    heading: Optional[str] = None
+
+    @property
+    def position(self) -> Dict[str, Any]:
+        """Payload fields that change when unchanged text moves within its file"""
+        return {"page": self.page, "chunk_index": self.chunk_index, "section": self.section, "heading": self.heading}
+
+    def payload(self) -> Dict[str, Any]:
+        return {
+            "page_content": self.text,
+            "metadata": {
+                "source": self.filename,
+                "page": self.page,
+                "chunk_index": self.chunk_index,
+                "chunk_hash": self.chunk_hash,
+                "section": self.section,
+                "heading": self.heading,
+            },
+        }
+
+
+@dataclass
+class IngestionProgress:
+    files_total: int = 0
+    files_parsed: int = 0
+    chunks_embedded: int = 0
+    chunks_upserted: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+
+def log_progress(progress: IngestionProgress) -> None:
+    logger.info(
+        f"Ingestion: {progress.files_parsed}/{progress.files_total} files parsed, "
+        f"{progress.chunks_embedded} chunks embedded, {progress.chunks_upserted} upserted "
+        f"({progress.elapsed:.1f}s)"
+    )
+
+
+class IngestionPipeline:
+    """Parse PDFs in a process pool, chunk page by page, embed in batches and upsert with backpressure"""
+
+    def __init__(
+        self,
+        embedding_model,
+        backend,
+        manifest: IngestionManifest,
+        lexical_index=None,
+        progress_callback: Optional[Callable[[IngestionProgress], None]] = log_progress,
+    ):
+        self.embedding_model = embedding_model
+        self.backend = backend
+        self.manifest = manifest
+        self.lexical_index = lexical_index
+        self.progress_callback = progress_callback
+        self.max_workers = INGEST_MAX_WORKERS or os.cpu_count() or 1
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP
+        )
+
+    def run(self, folder_path: str, pdf_files: List[str]) -> Dict[str, int]:
+        """Sync the given PDFs of a folder into the collection and update the manifest"""
+        stats = {
+            "files_unchanged": 0, "files_changed": 0, "files_removed": 0,
+            "chunks_added": 0, "chunks_moved": 0, "chunks_deleted": 0,
+        }
+        progress = IngestionProgress()
+
+        rechunk_all = self.manifest.chunking_version != CHUNKING_VERSION
+        stale_point_ids: List[str] = []
+        for filename in set(self.manifest.files) - set(pdf_files):
+            logger.info(f"Removing chunks of deleted file: {filename}")
+            stale_point_ids.extend(self.manifest.chunks(filename).values())
+            self.manifest.remove_file(filename)
+            stats["files_removed"] += 1
+
+        changed_files = {}
+        for filename in pdf_files:
+            file_hash = hash_file(os.path.join(folder_path, filename))
+            if not rechunk_all and file_hash == self.manifest.file_hash(filename):
+                stats["files_unchanged"] += 1
+            else:
+                changed_files[filename] = file_hash
+        progress.files_total = len(changed_files)
+
+        # Bounded hand-off to the writer thread; a full queue blocks embedding
+        upsert_queue: "queue.Queue[Optional[Tuple[List, List, List]]]" = queue.Queue(maxsize=INGEST_MAX_PENDING_BATCHES)
+        writer_errors: List[Exception] = []
+        writer = threading.Thread(
+            target=self._write_batches, args=(upsert_queue, progress, writer_errors), name="ingest-writer", daemon=True
+        )
+        writer.start()
+
+        new_manifest_entries = {}
+        batch: List[PendingChunk] = []
+        # Known text at a new page, position or section: only its payload is rewritten
+        moved: List[PendingChunk] = []
+        try:
+            for filename, pages in self._parse_files(folder_path, list(changed_files)):
+                progress.files_parsed += 1
+                known_chunks = self.manifest.chunks(filename)
+                known_positions = self.manifest.chunk_positions(filename)
+                current_chunks: Dict[str, str] = {}
+                current_positions: Dict[str, Dict[str, Any]] = {}
+                for chunk in self._chunk_pages(filename, pages):
+                    if chunk.chunk_hash in current_chunks:
+                        continue
+                    current_chunks[chunk.chunk_hash] = chunk.point_id
+                    current_positions[chunk.chunk_hash] = chunk.position
+                    if chunk.chunk_hash in known_chunks and not rechunk_all:
+                        if known_positions.get(chunk.chunk_hash) != chunk.position:
+                            moved.append(chunk)
+                        continue
+                    batch.append(chunk)
+                    if len(batch) >= INGEST_EMBED_BATCH_SIZE:
+                        self._embed_and_enqueue(batch, upsert_queue, progress, writer_errors)
+                        stats["chunks_added"] += len(batch)
+                        batch = []
+
+                stale_point_ids.extend(
+                    point_id for chunk_hash, point_id in known_chunks.items() if chunk_hash not in current_chunks
+                )
+                new_manifest_entries[filename] = (current_chunks, current_positions)
+                stats["files_changed"] += 1
+                self._report(progress)
+
+            if batch:
+                self._embed_and_enqueue(batch, upsert_queue, progress, writer_errors)
+                stats["chunks_added"] += len(batch)
+        finally:
+            upsert_queue.put(None)
+            writer.join()
+
+        if writer_errors:
+            raise writer_errors[0]
+
+        for start in range(0, len(moved), INGEST_UPSERT_BATCH_SIZE):
+            moved_batch = moved[start:start + INGEST_UPSERT_BATCH_SIZE]
+            self.backend.set_payload([c.point_id for c in moved_batch], [c.payload() for c in moved_batch])
+        stats["chunks_moved"] = len(moved)
+        if self.lexical_index is not None:
+            for chunk in moved:
+                self.lexical_index.add(chunk.point_id, chunk.text, chunk.payload()["metadata"])
+
+        # Delete only after replacements are written so answers never lose their context
+        for start in range(0, len(stale_point_ids), INGEST_UPSERT_BATCH_SIZE):
+            self.backend.delete(stale_point_ids[start:start + INGEST_UPSERT_BATCH_SIZE])
+        stats["chunks_deleted"] = len(stale_point_ids)
+        self.backend.flush()
+        if self.lexical_index is not None:
+            self.lexical_index.remove(stale_point_ids)
+            self.lexical_index.save()
+
+        for filename, (chunks, positions) in new_manifest_entries.items():
+            self.manifest.set_file(filename, changed_files[filename], chunks, positions)
+        self.manifest.chunking_version = CHUNKING_VERSION
+        self.manifest.save()
+
+        self._report(progress)
+        return stats
+
+    def _parse_files(self, folder_path: str, filenames: List[str]) -> Iterator[Tuple[str, List[Tuple[int, str]]]]:
+        """Yield parsed files in order, keeping at most a few files in flight"""
+        paths = [os.path.join(folder_path, f) for f in filenames]
+        if len(paths) <= 1 or self.max_workers == 1:
+            for filename, path in zip(filenames, paths):
+                logger.info(f"Reading: {path}")
+                yield filename, parse_pdf_pages(path)
+            return
+
+        max_in_flight = self.max_workers * 2
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = []
+            for filename, path in zip(filenames, paths):
+                in_flight.append((filename, executor.submit(parse_pdf_pages, path)))
+                if len(in_flight) >= max_in_flight:
+                    done_name, future = in_flight.pop(0)
+                    yield done_name, future.result()
+            for done_name, future in in_flight:
+                yield done_name, future.result()
+
+    def _chunk_pages(self, filename: str, pages: List[Tuple[int, str]]) -> Iterator[PendingChunk]:
+        """Split each section of each page, so no chunk straddles a heading"""
+        page_chunks: Dict[int, int] = {}
+        for part in split_sections(pages):
+            for text in self.text_splitter.split_text(part.text):
+                chunk_index = page_chunks.get(part.page, 0)
+                page_chunks[part.page] = chunk_index + 1
+                chunk_hash = hash_text(text)
+                yield PendingChunk(
+                    filename=filename,
+                    page=part.page,
+                    text=text,
+                    chunk_hash=chunk_hash,
+                    point_id=chunk_point_id(filename, chunk_hash),
+                    chunk_index=chunk_index,
+                    section=part.section,
+                    heading=part.heading,
+                )
+
+    def _embed_and_enqueue(self, batch, upsert_queue, progress, writer_errors) -> None:
+        if writer_errors:
+            raise writer_errors[0]
+        vectors = self.embedding_model.embed_documents([c.text for c in batch])
+        progress.chunks_embedded += len(batch)
+        payloads = [chunk.payload() for chunk in batch]
+        ids = [chunk.point_id for chunk in batch]
+        if self.lexical_index is not None:
+            for point_id, payload in zip(ids, payloads):
+                self.lexical_index.add(point_id, payload["page_content"], payload["metadata"])
+        for start in range(0, len(batch), INGEST_UPSERT_BATCH_SIZE):
+            end = start + INGEST_UPSERT_BATCH_SIZE
+            upsert_queue.put((ids[start:end], vectors[start:end], payloads[start:end]))
+
+    def _write_batches(self, upsert_queue, progress, writer_errors) -> None:
+        while True:
+            batch = upsert_queue.get()
+            if batch is None:
+                return
+            if writer_errors:
+                continue
+            try:
+                ids, vectors, payloads = batch
+                self.backend.upsert(ids, vectors, payloads)
+                progress.chunks_upserted += len(ids)
+            except Exception as e:
+                logger.error(f"Error upserting ingestion batch: {e}")
+                writer_errors.append(e)
+
+    def _report(self, progress: IngestionProgress) -> None:
+        if self.progress_callback:
+            self.progress_callback(progress)
@@ -0,0 +1,129 @@
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Keeps hyphenated terms such as "30-day" or "ABC-123" together
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i if in is it its me my of on or our "
+    "the this to we what when where which will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms without stopwords; hyphenated terms also contribute their parts"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if "-" in token:
+            tokens.extend(part for part in token.split("-") if part not in STOPWORDS)
+        if token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+def metadata_matches(metadata: Dict[str, Any], where: Dict[str, Sequence[Any]]) -> bool:
+    """True when every field in where holds one of its accepted values"""
+    return all(metadata.get(field_name) in values for field_name, values in where.items())
+
+
+class BM25Index:
+    """Incrementally updatable BM25 inverted index over chunk texts, persisted as JSON"""
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def load(self) -> "BM25Index":
+        if not os.path.exists(self.path):
+            return self
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            with self._lock:
+                self.postings = data["postings"]
+                self.doc_lengths = data["doc_lengths"]
+                self.docs = data["docs"]
+                self._total_length = sum(self.doc_lengths.values())
+            logger.info(f"Loaded lexical index with {len(self)} chunks from {self.path}")
+        except Exception as e:
+            logger.error(f"Error reading lexical index {self.path}, starting fresh: {e}")
+            self.clear()
+        return self
+
+    def save(self) -> None:
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"postings": self.postings, "doc_lengths": self.doc_lengths, "docs": self.docs}, f)
+            os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.postings, self.doc_lengths, self.docs = {}, {}, {}
+            self._total_length = 0
+
+    def add(self, doc_id: str, text: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock:
+            if doc_id in self.doc_lengths:
+                self.remove([doc_id])
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+            length = sum(counts.values())
+            self.doc_lengths[doc_id] = length
+            self._total_length += length
+            self.docs[doc_id] = {"page_content": text, "metadata": metadata or {}}
+
+    def remove(self, doc_ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in doc_ids:
+                doc = self.docs.pop(doc_id, None)
+                length = self.doc_lengths.pop(doc_id, None)
+                if doc is None:
+                    continue
+                self._total_length -= length
+                for term in set(tokenize(doc["page_content"])):
+                    term_postings = self.postings.get(term)
+                    if term_postings is not None:
+                        term_postings.pop(doc_id, None)
+                        if not term_postings:
+                            del self.postings[term]
+
+    def search(self, query: str, k: int = 5, where: Optional[Dict[str, Sequence[Any]]] = None) -> List[Tuple[str, float]]:
+        """Top-k (doc id, BM25 score) pairs, optionally only among chunks whose metadata matches where"""
+        with self._lock:
+            n_docs = len(self.doc_lengths)
+            if not n_docs:
+                return []
+            avg_length = self._total_length / n_docs
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                term_postings = self.postings.get(term)
+                if not term_postings:
+                    continue
+                df = len(term_postings)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for doc_id, tf in term_postings.items():
+                    if where and not metadata_matches(self.docs[doc_id]["metadata"], where):
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
@@ -0,0 +1,83 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from config import POLICY_SECTIONS, SECTION_HEADING_MAX_CHARS
+
+GENERAL_SECTION = "general"
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+BULLET_CHARS = "●•▪◦‣○■□-–—*·"
+# PDF extraction leaves zero-width spaces and BOMs around bullets and headings
+INVISIBLE_CHARS = dict.fromkeys(map(ord, "\u200b\u200c\u200d\ufeff"))
+
+
+@dataclass
+class SectionText:
+    """Text of one page that falls under one heading"""
+
+    page: int
+    heading: Optional[str]
+    section: str
+    text: str
+
+
+def topics_in(text: str, sections: Dict[str, Sequence[str]] = POLICY_SECTIONS) -> List[str]:
+    """Topics, in taxonomy order, with a stem that starts one of the words of text"""
+    words = WORD_PATTERN.findall(text.lower())
+    return [
+        topic for topic, stems in sections.items()
+        if any(word.startswith(stem) for stem in stems for word in words)
+    ]
+
+
+def section_for_heading(heading: str) -> str:
+    topics = topics_in(heading)
+    return topics[0] if topics else GENERAL_SECTION
+
+
+def query_sections(query: str) -> List[str]:
+    """Sections a policy question should be searched in; empty means search everything"""
+    return topics_in(query)
+
+
+def clean_heading(line: str) -> str:
+    """Heading text without leading emoji or symbols"""
+    line = line.translate(INVISIBLE_CHARS).strip()
+    return re.sub(r"^[^\w]+", "", line).strip()
+
+
+def is_heading(line: str) -> bool:
+    line = line.translate(INVISIBLE_CHARS).strip()
+    if not line or len(line) > SECTION_HEADING_MAX_CHARS or line[-1] in ".,:;!?" or line[0] in BULLET_CHARS:
+        return False
+    words = clean_heading(line).split()
+    if not words or not any(c.isalpha() for c in words[0]):
+        return False
+    # An emoji or other symbol in front marks a heading in the knowledge-base PDFs
+    if not line[0].isalnum():
+        return True
+    return len(words) <= 8 and all(w[0].isupper() or not w[0].isalpha() for w in words)
+
+
+def split_sections(pages: List[Tuple[int, str]]) -> Iterator[SectionText]:
+    """Split page texts at section headings; a section carries over page breaks until the next heading"""
+    heading: Optional[str] = None
+    for page_num, page_text in pages:
+        lines: List[str] = []
+        for line in page_text.splitlines():
+            if is_heading(line):
+                if "".join(lines).strip():
+                    yield _section_text(page_num, heading, lines)
+                heading, lines = clean_heading(line), []
+            lines.append(line)
+        if "".join(lines).strip():
+            yield _section_text(page_num, heading, lines)
+
+
+def _section_text(page: int, heading: Optional[str], lines: List[str]) -> SectionText:
+    return SectionText(
+        page=page,
+        heading=heading,
+        section=section_for_heading(heading) if heading else GENERAL_SECTION,
+        text="\n".join(lines).strip(),
+    )
@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    from rag.rag_manager import RAGManager
+
+logger = logging.getLogger(__name__)
+
+
+class RAGEngine:
+    """Process-wide, lazily built owner of the shared RAGManager"""
+
+    def __init__(self):
+        self._manager: Optional["RAGManager"] = None
+        self._lock = threading.Lock()
+        self._status = "cold"
+        self._error: Optional[str] = None
+        self._init_seconds: Optional[float] = None
+        self._warm_up_thread: Optional[threading.Thread] = None
+
+    def get_manager(self) -> "RAGManager":
+        """Return the shared RAGManager, building it on first use"""
+        manager = self._manager
+        if manager is not None:
+            return manager
+
+        with self._lock:
+            if self._manager is None:
+                self._status = "initializing"
+                start = time.perf_counter()
+                try:
+                    # Imported here: PyMuPDF, LangChain and the vector store client load on first use, not at app import
+                    from rag.rag_manager import RAGManager
+
+                    self._manager = RAGManager()
+                except Exception as e:
+                    self._status = "failed"
+                    self._error = str(e)
+                    logger.error(f"Error building shared RAG engine: {e}")
+                    raise
+                self._init_seconds = time.perf_counter() - start
+                self._status = "ready"
+                self._error = None
+                logger.info(f"Shared RAG engine ready in {self._init_seconds:.2f}s")
+            return self._manager
+
+    def warm_up(self, background: bool = False) -> None:
+        """Build the engine and run one embedding so the first question pays no cold-start cost"""
+        if background:
+            with self._lock:
+                if self._warm_up_thread is not None and self._warm_up_thread.is_alive():
+                    return
+                if self._manager is not None:
+                    return
+                self._warm_up_thread = threading.Thread(
+                    target=self._warm_up_quietly, name="rag-warm-up", daemon=True
+                )
+                self._warm_up_thread.start()
+            return
+
+        manager = self.get_manager()
+        manager.embedding_model.embed_query("warm up")
+
+    def _warm_up_quietly(self) -> None:
+        try:
+            self.warm_up(background=False)
+        except Exception as e:
+            logger.error(f"Background RAG warm-up failed: {e}")
+
+    def is_ready(self) -> bool:
+        """True once the shared engine has been built"""
+        return self._manager is not None
+
+    def health(self) -> Dict[str, Any]:
+        """Report readiness plus a live check against the vector store"""
+        report = {
+            "status": self._status,
+            "ready": self.is_ready(),
+            "error": self._error,
+            "init_seconds": self._init_seconds,
+            "vector_store_reachable": False,
+            "indexed_chunks": None,
+        }
+        manager = self._manager
+        if manager is None:
+            return report
+
+        if hasattr(manager.embedding_model, "stats"):
+            report["embedding_cache"] = manager.embedding_model.stats()
+        if manager.answer_index is not None:
+            report["precomputed_answers"] = sum(e.vetted for e in manager.answer_index.entries.values())
+
+        try:
+            report["indexed_chunks"] = manager.backend.count()
+            report["vector_store_reachable"] = True
+        except Exception as e:
+            report["status"] = "degraded"
+            report["error"] = str(e)
+        return report
+
+    def reset(self) -> None:
+        """Drop the shared engine so the next call rebuilds it"""
+        with self._lock:
+            self._manager = None
+            self._status = "cold"
+            self._error = None
+            self._init_seconds = None
+
+
+rag_engine = RAGEngine()
@@ -1,40 +1,63 @@
 import logging
+import threading
 import warnings
-
-import fitz  # PyMuPDF
 import os
-from typing import List
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import Qdrant
-from langchain.embeddings import HuggingFaceEmbeddings
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 from langchain.docstore.document import Document
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams
-from langchain.chains import RetrievalQA
 
 from config import *
+from rag.answer_index import AnswerIndex, document_chunk_keys
+from rag.embeddings import embedding_dimension, embedding_model_name, get_embedding_model
+from rag.semantic_cache import policy_answer_cache
+from rag.ingestion_manifest import IngestionManifest
+from rag.ingestion_pipeline import IngestionPipeline
+from rag.vector_backends import create_vector_backend
+from rag.lexical_index import BM25Index
+from rag.hybrid_retriever import HybridRetriever
+from rag.context_packer import PackedContext, estimate_tokens, format_citations, pack_context
+from rag.policy_sections import query_sections
+from helper.llm_registry import llm_registry
+from helper.llm_scheduler import llm_scheduler
+from helper.metrics import metrics
 
 # Suppress warnings
 warnings.filterwarnings("ignore")
 logger = logging.getLogger(__name__)
 
+# The RetrievalQA "stuff" prompt, kept so answers read as they did before context packing
+STUFF_PROMPT_TEMPLATE = """Use the following pieces of context to answer the question at the end. If you don't know the answer, just say that you don't know, don't try to make up an answer.
+
+{context}
+
+Question: {question}
+Helpful Answer:"""
+
 class RAGManager:
     def __init__(self):
         self.embedding_model = None
         self.vectorstore = None
+        self.backend = None
         self.qdrant_client = None
+        self.async_qdrant_client = None
+        self.manifest = None
+        self.lexical_index = None
+        self.answer_index = None
+        self._answer_build_lock = threading.Lock()
         self.initialize_rag()
     
     def initialize_rag(self):
         """Initialize RAG components"""
         try:
-            # Initialize embedding model
-            self.embedding_model = HuggingFaceEmbeddings(
-                model_name=EMBEDDING_MODEL
-            )
+            # Reuse the process-wide embedding model
+            self.embedding_model = get_embedding_model()
             
-            # Initialize Qdrant client
-            self.qdrant_client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+            # Initialize the configured vector backend
+            self.backend = create_vector_backend(self.embedding_model)
+            self.qdrant_client = getattr(self.backend, "client", None)
+            self.async_qdrant_client = getattr(self.backend, "async_client", None)
+            self.manifest = IngestionManifest(self.backend.manifest_path)
+            self.lexical_index = BM25Index(self.backend.lexical_index_path).load()
+            self.answer_index = AnswerIndex(PRECOMPUTED_ANSWERS_PATH).load()
             
             # Setup vector store
             self.setup_vectorstore()
@@ -45,131 +68,244 @@ class RAGManager:
             logger.error(f"Error initializing RAG Manager: {e}")
             raise
     
-    def read_pdf(self, file_path: str) -> str:
-        """Read text from a PDF file"""
-        try:
-            pdf = fitz.open(file_path)
-            text = ""
-            
-            for page_num in range(len(pdf)):
-                page = pdf[page_num]
-                text += f"\\n--- Page {page_num + 1} ---\\n"
-                text += page.get_text()
-            
-            pdf.close()
-            return text
-            
-        except Exception as e:
-            logger.error(f"Error reading PDF {file_path}: {e}")
-            return ""
-    
-    def read_all_pdfs_in_folder(self, folder_path: str) -> List[str]:
-        """Read all PDFs in a folder"""
-        all_text = []
-        
-        try:
-            if not os.path.exists(folder_path):
-                logger.warning(f"Folder {folder_path} does not exist")
-                return all_text
-                
-            for filename in os.listdir(folder_path):
-                if filename.lower().endswith(".pdf"):
-                    file_path = os.path.join(folder_path, filename)
-                    logger.info(f"Reading: {file_path}")
-                    text = self.read_pdf(file_path)
-                    if text:
-                        all_text.append(text)
-            
-            return all_text
-            
-        except Exception as e:
-            logger.error(f"Error reading PDFs from folder {folder_path}: {e}")
+    def list_pdf_files(self, folder_path: str) -> List[str]:
+        """Sorted PDF filenames in a folder"""
+        if not os.path.exists(folder_path):
+            logger.warning(f"Folder {folder_path} does not exist")
             return []
-    
+        return sorted(f for f in os.listdir(folder_path) if f.lower().endswith(".pdf"))
+
     def setup_vectorstore(self):
-        """Setup or connect to existing vector store"""
+        """Setup or connect to existing vector store and sync it with the artefacts folder"""
         try:
-            # Check if collection exists
-            collections = [c.name for c in self.qdrant_client.get_collections().collections]
-            
-            if COLLECTION_NAME not in collections:
-                logger.info(f"Collection {COLLECTION_NAME} not found. Creating and ingesting documents...")
-                self.ingest_documents()
+            dim = embedding_dimension(self.embedding_model)
+            if self.backend.ensure_collection(dim):
+                logger.info(f"Created {self.backend.name} collection {COLLECTION_NAME}")
+                # Anything the manifest remembers is gone with the collection
+                self.manifest.clear()
+                self.lexical_index.clear()
+            elif not self.manifest.files and self.backend.count():
+                # Populated before manifests existed; its point IDs cannot be reconciled
+                logger.info(f"Collection {COLLECTION_NAME} has no ingestion manifest. Rebuilding it...")
+                self.backend.recreate(dim)
+                self.lexical_index.clear()
             else:
                 logger.info(f"Collection {COLLECTION_NAME} exists. Connecting...")
+                if not len(self.lexical_index) and self.backend.count():
+                    self.rebuild_lexical_index()
             
             # Initialize vector store
-            self.vectorstore = Qdrant(
-                client=self.qdrant_client,
-                collection_name=COLLECTION_NAME,
-                embeddings=self.embedding_model
-            )
+            self.vectorstore = self.backend.as_vectorstore()
+
+            self.ingest_documents()
             
         except Exception as e:
             logger.error(f"Error setting up vector store: {e}")
             raise
     
-    def ingest_documents(self):
-        """Ingest PDF documents into vector store"""
+    def ingest_documents(self) -> Dict[str, int]:
+        """Sync PDF documents into the vector store, embedding only new or changed chunks"""
         try:
-            # Read PDFs from artifacts folder
-            pdf_texts = self.read_all_pdfs_in_folder(ARTIFACTS_FOLDER)
-            
-            if not pdf_texts:
-                logger.warning("No PDFs found or read successfully")
-                return
-            
-            # Create documents
-            documents = [Document(page_content=text) for text in pdf_texts]
-            
-            # Split documents into chunks
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=CHUNK_SIZE,
-                chunk_overlap=CHUNK_OVERLAP
-            )
-            chunked_docs = text_splitter.split_documents(documents)
-            
-            # Create collection
-            self.qdrant_client.create_collection(
-                collection_name=COLLECTION_NAME,
-                vectors_config=VectorParams(
-                    size=self.embedding_model.client.get_sentence_embedding_dimension(),
-                    distance=Distance.COSINE
-                )
-            )
-            
-            # Create vector store and add documents
-            vectorstore = Qdrant(
-                client=self.qdrant_client,
-                collection_name=COLLECTION_NAME,
-                embeddings=self.embedding_model
+            pdf_files = self.list_pdf_files(ARTIFACTS_FOLDER)
+            if not pdf_files:
+                logger.warning("No PDFs found in artefacts folder")
+
+            pipeline = IngestionPipeline(
+                embedding_model=self.embedding_model,
+                backend=self.backend,
+                manifest=self.manifest,
+                lexical_index=self.lexical_index
             )
-            vectorstore.add_documents(chunked_docs)
+            stats = pipeline.run(ARTIFACTS_FOLDER, pdf_files)
+
+            # Drops cached answers built from (and citing pages of) a previous corpus, including
+            # answers persisted by an earlier process
+            policy_answer_cache.set_corpus(self.manifest.fingerprint())
             
-            logger.info(f"Successfully ingested {len(chunked_docs)} chunks into Qdrant collection '{COLLECTION_NAME}'")
+            logger.info(f"Synced {self.backend.name} collection '{COLLECTION_NAME}': {stats}")
+            if PRECOMPUTED_ANSWERS_ENABLED and PRECOMPUTED_ANSWERS_BUILD_ON_INGEST:
+                self.refresh_answer_index(background=True)
+            return stats
             
         except Exception as e:
             logger.error(f"Error ingesting documents: {e}")
             raise
     
-    def get_context_for_query(self, query: str, llm) -> str:
-        """Search for relevant documents"""
+    def refresh_answer_index(self, force: bool = False, background: bool = False) -> Dict[str, int]:
+        """Precompute answers to the canonical questions that are missing or out of date
+
+        After the corpus changes, each question is retrieved again and its answer rebuilt when the
+        chunks it would be built from differ; rejected answers are retried. Stale answers stop being
+        served before this returns; with background the new ones are generated in a thread, at the
+        LLM scheduler's lowest priority.
+        """
         try:
-            if not self.vectorstore:
-                logger.error("Vector store not initialized")
-                return []
-            
-            retriever = self.vectorstore.as_retriever(search_kwargs={"k": 5})
+            stale = self.answer_index.prune(
+                self.manifest.chunk_hashes(), embedding_model_name(), force=force,
+                retrieve=self.retrieved_chunk_keys, corpus=self.manifest.fingerprint(),
+            )
+        except Exception as e:
+            # Ingestion stands on its own; questions without an answer go through normal retrieval
+            logger.error(f"Error refreshing precomputed answers: {e}")
+            return {}
+        stats = {"reused": len(set(CANONICAL_POLICY_QUESTIONS)) - len(stale), "stale": len(stale)}
+        if not stale:
+            return stats
+        if background:
+            threading.Thread(
+                target=self._build_answers, args=(stale, force), name="precompute-answers", daemon=True
+            ).start()
+            return stats
+        return {**stats, **self._build_answers(stale, force)}
+
+    def retrieved_chunk_keys(self, question: str) -> Set[str]:
+        """Chunks, with their positions, a precomputed answer to the question would be built from today"""
+        return set(document_chunk_keys(self.retrieve(question)))
+
+    def _build_answers(self, questions: List[str], force: bool = False) -> Dict[str, int]:
+        # One build at a time; whatever an earlier build already answered is skipped
+        with self._answer_build_lock:
+            try:
+                if not force:
+                    questions = self.answer_index.stale_questions(questions, self.manifest.chunk_hashes())
+                return self.answer_index.build(self, llm_registry.get_llm(), questions)
+            except Exception as e:
+                logger.error(f"Error building precomputed answers: {e}")
+                return {}
 
-            rag_chain = RetrievalQA.from_chain_type(
-                llm=llm,
-                retriever=retriever,
-                return_source_documents=True
+    def rebuild_lexical_index(self):
+        """Rebuild the BM25 index from chunk payloads already in the vector store"""
+        logger.info("Rebuilding lexical index from vector store payloads...")
+        self.lexical_index.clear()
+        for point_id, payload in self.backend.iter_payloads():
+            self.lexical_index.add(point_id, payload["page_content"], payload.get("metadata"))
+        self.lexical_index.save()
+
+    def get_retriever(self, k: int = MAX_RETRIEVAL_DOCS, sections: Optional[List[str]] = None):
+        """Hybrid BM25 + vector retriever, or plain vector search when hybrid search is off
+
+        With sections, both searches only consider chunks tagged with one of those policy sections.
+        """
+        where = {"section": list(sections)} if sections else None
+        vector_filter = self.backend.search_filter(where) if where else None
+        if HYBRID_SEARCH_ENABLED:
+            return HybridRetriever(
+                vectorstore=self.vectorstore,
+                lexical_index=self.lexical_index,
+                k=k,
+                fetch_k=HYBRID_FETCH_K,
+                rrf_k=RRF_K,
+                where=where,
+                vector_filter=vector_filter
             )
-            print(query,"_"*50)
-            return rag_chain.invoke(query)
-            
+        search_kwargs = {"k": k}
+        if vector_filter is not None:
+            search_kwargs["filter"] = vector_filter
+        return self.vectorstore.as_retriever(search_kwargs=search_kwargs)
+
+    def sections_for(self, query: str, sections: Optional[List[str]] = None) -> List[str]:
+        """Policy sections to search; taken from the question's topic unless given"""
+        if sections is not None:
+            return sections
+        return query_sections(query) if SECTION_FILTER_ENABLED else []
+
+    def retrieve(self, query: str, k: int = MAX_RETRIEVAL_DOCS, sections: Optional[List[str]] = None) -> List[Document]:
+        if not self.vectorstore:
+            raise RuntimeError("Vector store not initialized")
+        sections = self.sections_for(query, sections)
+        with metrics.span("retrieval", backend=self.backend.name, hybrid=HYBRID_SEARCH_ENABLED,
+                          sections=sections) as span:
+            docs = self.get_retriever(k, sections).invoke(query)
+            if not docs and sections:
+                # The topic guess found nothing, e.g. a section missing from the corpus
+                docs = self.get_retriever(k).invoke(query)
+                span["unfiltered_fallback"] = True
+            span["documents"] = len(docs)
+        return docs
+
+    def build_answer_prompt(self, query: str, documents: List[Document]) -> Tuple[str, PackedContext]:
+        """Pack retrieved chunks into the token budget and render the answer prompt"""
+        packed = pack_context(documents, CONTEXT_TOKEN_BUDGET, max_overlap=CHUNK_OVERLAP * 2)
+        prompt = STUFF_PROMPT_TEMPLATE.format(context=packed.context, question=query)
+        return prompt, packed
+
+    def with_citations(self, answer: str, packed: PackedContext) -> str:
+        """Append the sources the answer was drawn from; answer unchanged when citations are off"""
+        if not POLICY_CITATIONS_ENABLED or not packed.sources:
+            return answer
+        return f"{answer.rstrip()}\n\n{format_citations(packed.sources[:POLICY_MAX_CITATIONS])}"
+
+    def _usage(self, prompt: str, packed: PackedContext, response=None) -> Dict[str, Any]:
+        """Estimated prompt size, plus the model's own token counts when it reports them"""
+        usage = {
+            "prompt_tokens": estimate_tokens(prompt),
+            "context_tokens": packed.context_tokens,
+            "chunks_retrieved": packed.chunks_retrieved,
+            "chunks_packed": packed.chunks_packed,
+        }
+        usage_metadata = getattr(response, "usage_metadata", None)
+        if usage_metadata:
+            usage["input_tokens"] = usage_metadata.get("input_tokens")
+            usage["output_tokens"] = usage_metadata.get("output_tokens")
+        metrics.record_tokens(
+            "generation.policy", usage.get("input_tokens") or usage["prompt_tokens"], usage.get("output_tokens")
+        )
+        logger.info(f"Policy answer usage: {usage}")
+        return usage
+
+    def answer_query(self, query: str, llm) -> Dict[str, Any]:
+        """Answer the query from packed policy context; {} when retrieval or generation fails"""
+        try:
+            docs = self.retrieve(query)
+            prompt, packed = self.build_answer_prompt(query, docs)
+            with metrics.span("generation.policy", prompt_tokens=estimate_tokens(prompt)):
+                response = llm_scheduler.invoke(llm, prompt, "generation.policy")
+            return {
+                "query": query,
+                "result": self.with_citations(response.content, packed),
+                "sources": packed.sources,
+                "usage": self._usage(prompt, packed, response),
+            }
+
         except Exception as e:
             logger.error(f"Error searching documents: {e}")
-            return []
-  
\ No newline at end of file
+            return {}
+
+    def stream_answer_for_query(self, query: str, llm) -> Iterator[str]:
+        """Retrieve context for the query and stream the answer as it is generated"""
+        docs = self.retrieve(query)
+        prompt, packed = self.build_answer_prompt(query, docs)
+        last_chunk = None
+        with metrics.span("generation.policy", prompt_tokens=estimate_tokens(prompt), streamed=True):
+            for chunk in llm_scheduler.stream(llm, prompt, "generation.policy"):
+                last_chunk = chunk
+                if chunk.content:
+                    yield chunk.content
+        citations = self.with_citations("", packed)
+        if citations:
+            yield citations
+        self._usage(prompt, packed, last_chunk)
+
+    async def aretrieve(
+        self, query: str, k: int = MAX_RETRIEVAL_DOCS, sections: Optional[List[str]] = None
+    ) -> List[Document]:
+        """Search the vector store without blocking the event loop"""
+        if not self.vectorstore:
+            raise RuntimeError("Vector store not initialized")
+        sections = self.sections_for(query, sections)
+        with metrics.span("retrieval", backend=self.backend.name, hybrid=HYBRID_SEARCH_ENABLED,
+                          sections=sections) as span:
+            docs = await self.get_retriever(k, sections).ainvoke(query)
+            if not docs and sections:
+                docs = await self.get_retriever(k).ainvoke(query)
+                span["unfiltered_fallback"] = True
+            span["documents"] = len(docs)
+        return docs
+
+    async def aanswer_from_documents(self, query: str, documents: List[Document], llm) -> str:
+        """Answer the query from already retrieved documents with a single async LLM call"""
+        prompt, packed = self.build_answer_prompt(query, documents)
+        with metrics.span("generation.policy", prompt_tokens=estimate_tokens(prompt)):
+            response = await llm_scheduler.ainvoke(llm, prompt, "generation.policy")
+        self._usage(prompt, packed, response)
+        return self.with_citations(response.content, packed)
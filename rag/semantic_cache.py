@@ -0,0 +1,259 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+import config
+from rag.embeddings import embedding_model_name
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+@dataclass
+class _CacheEntry:
+    query: str
+    vector: np.ndarray
+    answer: str
+    created_at: float
+
+
+class SemanticCache:
+    """Answer cache keyed by query embedding, with TTL, LRU eviction and optional SQLite backing
+
+    Persisted entries are tied to the embedding model that produced their vectors and to the
+    corpus they were answered from; the owner reports the corpus through set_corpus after each
+    ingest, so lookups themselves never touch the filesystem.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float,
+        max_entries: int,
+        ttl_seconds: float,
+        db_path: Optional[str] = None,
+        embedding_model: Optional[str] = None,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.embedding_model = embedding_model
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        # Fingerprint of the corpus the entries were answered from, None until known
+        self._corpus: Optional[str] = None
+        self._lock = threading.RLock()
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, query: str, vector: List[float]) -> Optional[str]:
+        """Return a cached answer for an identical or semantically close query"""
+        with self._lock:
+            self._ensure_loaded()
+            self._expire()
+
+            entry = self._entries.get(_key(query))
+            if entry is None and self._entries:
+                entry = self._nearest(_unit(vector))
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(_key(entry.query))
+            self.hits += 1
+            return entry.answer
+
+    def put(self, query: str, vector: List[float], answer: str) -> None:
+        with self._lock:
+            self._ensure_loaded()
+            key = _key(query)
+            entry = _CacheEntry(query=query, vector=_unit(vector), answer=answer, created_at=time.time())
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._matrix = None
+            self._persist(key, entry)
+
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._delete_persisted([evicted_key])
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        """Drop every entry, e.g. after the policy corpus was re-ingested"""
+        with self._lock:
+            self._reset()
+            self.invalidations += 1
+            logger.info("Semantic cache invalidated")
+
+    def set_corpus(self, corpus: str) -> None:
+        """Record the corpus answers now come from, dropping entries answered from another one"""
+        with self._lock:
+            self._ensure_loaded()
+            if corpus == self._corpus:
+                return
+            if self._entries:
+                logger.info("Policy corpus changed; dropping cached answers")
+                self._corpus = corpus
+                self.invalidate()
+            else:
+                self._corpus = corpus
+                self._reset()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _nearest(self, vector: np.ndarray) -> Optional[_CacheEntry]:
+        if self._matrix is None:
+            self._matrix_keys = list(self._entries.keys())
+            self._matrix = np.stack([self._entries[k].vector for k in self._matrix_keys])
+        scores = self._matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        return self._entries[self._matrix_keys[best]]
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        expired = [k for k, e in self._entries.items() if e.created_at < cutoff]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+            self._delete_persisted(expired)
+
+    def _reset(self) -> None:
+        self._entries.clear()
+        self._matrix = None
+        if self.db_path:
+            try:
+                with self._db() as conn:
+                    conn.execute("DELETE FROM entries")
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                        [("corpus_fingerprint", self._corpus), ("embedding_model", self.embedding_model)],
+                    )
+            except Exception as e:
+                logger.error(f"Error clearing persisted semantic cache: {e}")
+
+    def _ensure_loaded(self) -> None:
+        """Load persisted entries on first use"""
+        if not self._loaded:
+            self._loaded = True
+            self._load()
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        return conn
+
+    @contextmanager
+    def _db(self):
+        conn = self._connect()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _load(self) -> None:
+        if not self.db_path:
+            return
+        try:
+            with self._db() as conn:
+                meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+            if meta.get("embedding_model") != self.embedding_model:
+                # Vectors from another embedding model are not comparable with this one's
+                logger.info("Semantic cache was built with another embedding model; starting empty")
+                self._reset()
+                return
+            self._corpus = meta.get("corpus_fingerprint")
+            with self._db() as conn:
+                rows = conn.execute(
+                    "SELECT key, query, vector, answer, created_at FROM entries "
+                    "WHERE created_at >= ? ORDER BY created_at DESC LIMIT ?",
+                    (time.time() - self.ttl_seconds, self.max_entries),
+                ).fetchall()
+            for key, query, vector, answer, created_at in reversed(rows):
+                self._entries[key] = _CacheEntry(
+                    query=query,
+                    vector=np.frombuffer(vector, dtype=np.float32),
+                    answer=answer,
+                    created_at=created_at,
+                )
+            logger.info(f"Loaded {len(rows)} semantic cache entries from {self.db_path}")
+        except Exception as e:
+            logger.error(f"Error loading semantic cache: {e}")
+
+    def _persist(self, key: str, entry: _CacheEntry) -> None:
+        if not self.db_path:
+            return
+        try:
+            with self._db() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, query, vector, answer, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, entry.query, entry.vector.astype(np.float32).tobytes(), entry.answer, entry.created_at),
+                )
+        except Exception as e:
+            logger.error(f"Error persisting semantic cache entry: {e}")
+
+    def _delete_persisted(self, keys: List[str]) -> None:
+        if not self.db_path:
+            return
+        try:
+            with self._db() as conn:
+                conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in keys])
+        except Exception as e:
+            logger.error(f"Error deleting semantic cache entries: {e}")
+
+
+def _key(query: str) -> str:
+    return hashlib.sha1(normalize_query(query).encode()).hexdigest()
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+policy_answer_cache = SemanticCache(
+    similarity_threshold=config.SEMANTIC_CACHE_SIMILARITY_THRESHOLD,
+    max_entries=config.SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl_seconds=config.SEMANTIC_CACHE_TTL_SECONDS,
+    db_path=config.SEMANTIC_CACHE_DB_PATH,
+    embedding_model=embedding_model_name(),
+)
@@ -0,0 +1,282 @@
+import logging
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from config import (
+    COLLECTION_NAME,
+    INGESTION_MANIFEST_PATH,
+    LEXICAL_INDEX_PATH,
+    NUMPY_INDEX_DIR,
+    NUMPY_INDEX_DTYPE,
+    PAYLOAD_INDEX_FIELDS,
+    QDRANT_HOST,
+    QDRANT_PORT,
+    VECTOR_BACKEND,
+)
+from rag.vector_index import NumpyVectorIndex
+
+logger = logging.getLogger(__name__)
+
+# Fields the NumPy index keeps inverted row lists for
+NUMPY_INDEXED_FIELDS = tuple(f for f, kind in PAYLOAD_INDEX_FIELDS.items() if kind == "keyword")
+
+
+class NumpyVectorStore(VectorStore):
+    """LangChain vector store over a NumpyVectorIndex, so retrievers work unchanged"""
+
+    def __init__(self, index: NumpyVectorIndex, embedding: Embeddings):
+        self.index = index
+        self.embedding = embedding
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[Sequence[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if ids is None:
+            import uuid
+            ids = [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = self.embedding.embed_documents(texts)
+        self.index.upsert(
+            list(ids),
+            vectors,
+            [{"page_content": t, "metadata": m} for t, m in zip(texts, metadatas)],
+        )
+        self.index.save()
+        return list(ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if ids:
+            self.index.delete(ids)
+            self.index.save()
+        return True
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Sequence[Any]]] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return [
+            (
+                Document(
+                    page_content=payload["page_content"],
+                    metadata={**payload.get("metadata", {}), "_id": point_id},
+                ),
+                score,
+            )
+            for point_id, score, payload in self.index.search(embedding, k=k, where=filter)
+        ]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k=k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        index_dir: str = NUMPY_INDEX_DIR,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        dim = len(embedding.embed_query("dimension probe"))
+        index = NumpyVectorIndex(index_dir, dim=dim, dtype=NUMPY_INDEX_DTYPE, indexed_fields=NUMPY_INDEXED_FIELDS)
+        index.create()
+        store = cls(index, embedding)
+        store.add_texts(texts, metadatas=metadatas, **kwargs)
+        return store
+
+
+class QdrantBackend:
+    """Chunk storage in a Qdrant server collection"""
+
+    name = "qdrant"
+    manifest_path = INGESTION_MANIFEST_PATH
+    lexical_index_path = LEXICAL_INDEX_PATH
+
+    def __init__(self, embedding_model):
+        from qdrant_client import AsyncQdrantClient, QdrantClient
+
+        self.embedding_model = embedding_model
+        self.client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+        self.async_client = AsyncQdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+
+    def ensure_collection(self, dim: int) -> bool:
+        """Create the collection if missing; True when it was created"""
+        collections = [c.name for c in self.client.get_collections().collections]
+        if COLLECTION_NAME in collections:
+            self.ensure_payload_indexes()
+            return False
+        self.recreate(dim)
+        return True
+
+    def recreate(self, dim: int) -> None:
+        from qdrant_client.models import Distance, VectorParams
+
+        if self.client.collection_exists(COLLECTION_NAME):
+            self.client.delete_collection(COLLECTION_NAME)
+        self.client.create_collection(
+            collection_name=COLLECTION_NAME,
+            vectors_config=VectorParams(size=dim, distance=Distance.COSINE)
+        )
+        self.ensure_payload_indexes()
+
+    def ensure_payload_indexes(self) -> None:
+        """Index the filterable metadata fields so filtered searches skip non-matching points"""
+        from qdrant_client.models import PayloadSchemaType
+
+        existing = self.client.get_collection(COLLECTION_NAME).payload_schema or {}
+        for field_name, kind in PAYLOAD_INDEX_FIELDS.items():
+            key = f"metadata.{field_name}"
+            if key not in existing:
+                self.client.create_payload_index(
+                    collection_name=COLLECTION_NAME,
+                    field_name=key,
+                    field_schema=PayloadSchemaType(kind),
+                )
+                logger.info(f"Created {kind} payload index on {key}")
+
+    def search_filter(self, where: Dict[str, Sequence[Any]]):
+        """Qdrant filter requiring one of the given values for every metadata field"""
+        from qdrant_client.models import FieldCondition, Filter, MatchAny
+
+        return Filter(must=[
+            FieldCondition(key=f"metadata.{field_name}", match=MatchAny(any=list(values)))
+            for field_name, values in where.items()
+        ])
+
+    def count(self) -> int:
+        return self.client.count(COLLECTION_NAME).count
+
+    def upsert(self, ids: List[str], vectors: List[List[float]], payloads: List[Dict[str, Any]]) -> None:
+        from qdrant_client.models import PointStruct
+
+        self.client.upsert(
+            collection_name=COLLECTION_NAME,
+            points=[
+                PointStruct(id=point_id, vector=list(vector), payload=payload)
+                for point_id, vector, payload in zip(ids, vectors, payloads)
+            ],
+        )
+
+    def set_payload(self, ids: List[str], payloads: List[Dict[str, Any]]) -> None:
+        """Replace the payloads of existing points, keeping their vectors"""
+        from qdrant_client.models import OverwritePayloadOperation, SetPayload
+
+        self.client.batch_update_points(
+            collection_name=COLLECTION_NAME,
+            update_operations=[
+                OverwritePayloadOperation(overwrite_payload=SetPayload(payload=payload, points=[point_id]))
+                for point_id, payload in zip(ids, payloads)
+            ],
+        )
+
+    def delete(self, ids: List[str]) -> None:
+        from qdrant_client.models import PointIdsList
+
+        self.client.delete(collection_name=COLLECTION_NAME, points_selector=PointIdsList(points=ids))
+
+    def flush(self) -> None:
+        pass
+
+    def iter_payloads(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=COLLECTION_NAME, limit=256, offset=offset, with_payload=True, with_vectors=False
+            )
+            for point in points:
+                yield str(point.id), point.payload
+            if offset is None:
+                return
+
+    def as_vectorstore(self) -> VectorStore:
+        from langchain_community.vectorstores import Qdrant
+
+        return Qdrant(
+            client=self.client,
+            collection_name=COLLECTION_NAME,
+            embeddings=self.embedding_model,
+            async_client=self.async_client
+        )
+
+
+class NumpyBackend:
+    """Chunk storage in an in-process, memory-mapped NumpyVectorIndex"""
+
+    name = "numpy"
+    manifest_path = os.path.join(NUMPY_INDEX_DIR, "ingestion_manifest.json")
+    lexical_index_path = os.path.join(NUMPY_INDEX_DIR, "lexical_index.json")
+
+    def __init__(self, embedding_model):
+        self.embedding_model = embedding_model
+        self.index: Optional[NumpyVectorIndex] = None
+
+    def ensure_collection(self, dim: int) -> bool:
+        self.index = NumpyVectorIndex(NUMPY_INDEX_DIR, dim=dim, dtype=NUMPY_INDEX_DTYPE, indexed_fields=NUMPY_INDEXED_FIELDS)
+        if self.index.exists():
+            try:
+                self.index.load()
+                return False
+            except ValueError as e:
+                logger.warning(f"{e}; rebuilding")
+        self.index.create()
+        return True
+
+    def recreate(self, dim: int) -> None:
+        self.index = NumpyVectorIndex(NUMPY_INDEX_DIR, dim=dim, dtype=NUMPY_INDEX_DTYPE, indexed_fields=NUMPY_INDEXED_FIELDS)
+        self.index.create()
+
+    def search_filter(self, where: Dict[str, Sequence[Any]]) -> Dict[str, Sequence[Any]]:
+        """NumpyVectorStore takes the field -> accepted values mapping as is"""
+        return where
+
+    def count(self) -> int:
+        return self.index.count()
+
+    def upsert(self, ids: List[str], vectors: List[List[float]], payloads: List[Dict[str, Any]]) -> None:
+        self.index.upsert(ids, vectors, payloads)
+
+    def set_payload(self, ids: List[str], payloads: List[Dict[str, Any]]) -> None:
+        self.index.set_payload(ids, payloads)
+
+    def delete(self, ids: List[str]) -> None:
+        self.index.delete(ids)
+
+    def flush(self) -> None:
+        self.index.compact()
+        self.index.save()
+
+    def iter_payloads(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        return self.index.iter_payloads()
+
+    def as_vectorstore(self) -> VectorStore:
+        return NumpyVectorStore(self.index, self.embedding_model)
+
+
+def create_vector_backend(embedding_model, backend: str = VECTOR_BACKEND):
+    """Build the vector backend selected by config.VECTOR_BACKEND"""
+    if backend == "qdrant":
+        return QdrantBackend(embedding_model)
+    if backend == "numpy":
+        return NumpyBackend(embedding_model)
+    raise ValueError(f"Unknown vector backend: {backend}")
@@ -0,0 +1,307 @@
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILENAME = "vectors.bin"
+PAYLOADS_FILENAME = "payloads.json"
+SEARCH_BLOCK_ROWS = 65536
+# Filtered rows are scored run by run when runs average at least this many rows, else gathered
+MIN_RUN_ROWS = 16
+
+
+class NumpyVectorIndex:
+    """In-process cosine index over a memory-mapped float32/float16 matrix with a JSON payload sidecar
+
+    Metadata fields in indexed_fields get inverted row lists, so filtered searches score only
+    the matching rows instead of the whole matrix.
+    """
+
+    def __init__(
+        self,
+        index_dir: str,
+        dim: int,
+        dtype: str = "float32",
+        initial_capacity: int = 1024,
+        indexed_fields: Sequence[str] = (),
+    ):
+        self.index_dir = index_dir
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.indexed_fields = tuple(indexed_fields)
+        # field -> value -> rows holding that value in their payload metadata
+        self._field_rows: Dict[str, Dict[Any, Set[int]]] = {f: {} for f in self.indexed_fields}
+        # Sorted row arrays of (field, value) pairs, rebuilt on the next search after a change
+        self._row_arrays: Dict[Tuple[str, Any], np.ndarray] = {}
+        self._lock = threading.RLock()
+        self._ids: List[Optional[str]] = []
+        self._payloads: List[Optional[Dict[str, Any]]] = []
+        self._id_to_row: Dict[str, int] = {}
+        # One flag per matrix row, allocated and grown together with the matrix
+        self._alive = np.zeros(0, dtype=bool)
+        self._vectors: Optional[np.memmap] = None
+        self._capacity = 0
+        self._initial_capacity = initial_capacity
+
+    @property
+    def vectors_path(self) -> str:
+        return os.path.join(self.index_dir, VECTORS_FILENAME)
+
+    @property
+    def payloads_path(self) -> str:
+        return os.path.join(self.index_dir, PAYLOADS_FILENAME)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.payloads_path) and os.path.exists(self.vectors_path)
+
+    def create(self) -> None:
+        """Start an empty index, discarding anything on disk"""
+        with self._lock:
+            os.makedirs(self.index_dir, exist_ok=True)
+            self._ids, self._payloads, self._id_to_row = [], [], {}
+            self._alive = np.zeros(0, dtype=bool)
+            self._reindex_fields()
+            self._open_matrix(self._initial_capacity, copy_rows=0, fresh=True)
+            self.save()
+
+    def load(self) -> None:
+        with self._lock:
+            with open(self.payloads_path, "r", encoding="utf-8") as f:
+                sidecar = json.load(f)
+            if sidecar["dim"] != self.dim or sidecar["dtype"] != self.dtype.name:
+                raise ValueError(
+                    f"Vector index at {self.index_dir} is {sidecar['dtype']}[{sidecar['dim']}], "
+                    f"expected {self.dtype.name}[{self.dim}]"
+                )
+            self._ids = sidecar["ids"]
+            self._payloads = sidecar["payloads"]
+            self._capacity = sidecar["capacity"]
+            self._alive = np.zeros(self._capacity, dtype=bool)
+            self._alive[:len(self._ids)] = [i is not None for i in self._ids]
+            self._id_to_row = {point_id: row for row, point_id in enumerate(self._ids) if point_id is not None}
+            self._reindex_fields()
+            self._vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode="r+", shape=(self._capacity, self.dim))
+            logger.info(f"Loaded vector index with {len(self._id_to_row)} vectors from {self.index_dir}")
+
+    def save(self) -> None:
+        """Flush vectors and atomically rewrite the payload sidecar"""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            sidecar = {
+                "dim": self.dim,
+                "dtype": self.dtype.name,
+                "capacity": self._capacity,
+                "ids": self._ids,
+                "payloads": self._payloads,
+            }
+            tmp_path = f"{self.payloads_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(sidecar, f)
+            os.replace(tmp_path, self.payloads_path)
+
+    def count(self) -> int:
+        return len(self._id_to_row)
+
+    def iter_payloads(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            items = [(point_id, self._payloads[row]) for point_id, row in self._id_to_row.items()]
+        return iter(items)
+
+    def upsert(self, ids: Sequence[str], vectors: Sequence[Sequence[float]], payloads: Sequence[Dict[str, Any]]) -> None:
+        """Insert new points or overwrite existing ones in place"""
+        matrix = _unit_rows(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            rows = []
+            for point_id, payload in zip(ids, payloads):
+                row = self._id_to_row.get(point_id)
+                if row is None:
+                    row = self._append_row()
+                    self._id_to_row[point_id] = row
+                    self._ids[row] = point_id
+                else:
+                    self._unindex_row(row)
+                self._payloads[row] = payload
+                self._index_row(row)
+                self._alive[row] = True
+                rows.append(row)
+            self._vectors[rows] = matrix.astype(self.dtype)
+
+    def set_payload(self, ids: Sequence[str], payloads: Sequence[Dict[str, Any]]) -> None:
+        """Replace the payloads of existing points, keeping their vectors; unknown IDs are ignored"""
+        with self._lock:
+            for point_id, payload in zip(ids, payloads):
+                row = self._id_to_row.get(point_id)
+                if row is None:
+                    continue
+                self._unindex_row(row)
+                self._payloads[row] = payload
+                self._index_row(row)
+
+    def delete(self, ids: Iterable[str]) -> None:
+        """Tombstone points; their rows are reclaimed by compact()"""
+        with self._lock:
+            for point_id in ids:
+                row = self._id_to_row.pop(point_id, None)
+                if row is not None:
+                    self._unindex_row(row)
+                    self._ids[row] = None
+                    self._payloads[row] = None
+                    self._alive[row] = False
+
+    def compact(self) -> None:
+        """Rewrite the matrix without tombstoned rows"""
+        with self._lock:
+            live_rows = np.flatnonzero(self._alive)
+            if len(live_rows) == len(self._ids):
+                return
+            vectors = np.array(self._vectors[live_rows])
+            ids = [self._ids[r] for r in live_rows]
+            payloads = [self._payloads[r] for r in live_rows]
+            self._vectors = None
+            self._open_matrix(max(len(ids), self._initial_capacity), copy_rows=0, fresh=True)
+            self._vectors[:len(ids)] = vectors
+            self._ids, self._payloads = ids, payloads
+            self._alive[:len(ids)] = True
+            self._id_to_row = {point_id: row for row, point_id in enumerate(ids)}
+            self._reindex_fields()
+            self.save()
+
+    def search(
+        self, vector: Sequence[float], k: int = 4, where: Optional[Dict[str, Sequence[Any]]] = None
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """Top-k points by cosine similarity as (id, score, payload)
+
+        where maps metadata fields to accepted values; a point must match one value of every field.
+        """
+        query = _unit_rows(np.asarray(vector, dtype=np.float32)[None, :])[0]
+        with self._lock:
+            used = len(self._ids)
+            if not self._id_to_row:
+                return []
+            if where:
+                return self._search_rows(query, self._matching_rows(where), k)
+            scores = np.empty(used, dtype=np.float32)
+            for start in range(0, used, SEARCH_BLOCK_ROWS):
+                block = np.asarray(self._vectors[start:min(start + SEARCH_BLOCK_ROWS, used)], dtype=np.float32)
+                scores[start:start + len(block)] = block @ query
+            scores[~self._alive[:used]] = -np.inf
+
+            k = min(k, len(self._id_to_row))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._ids[row], float(scores[row]), self._payloads[row]) for row in top]
+
+    def _value_rows(self, field_name: str, value: Any) -> np.ndarray:
+        key = (field_name, value)
+        rows = self._row_arrays.get(key)
+        if rows is None:
+            rows = np.fromiter(sorted(self._field_rows[field_name].get(value, ())), dtype=np.int64)
+            self._row_arrays[key] = rows
+        return rows
+
+    def _matching_rows(self, where: Dict[str, Sequence[Any]]) -> np.ndarray:
+        """Sorted live rows matching every field of where"""
+        rows: Optional[np.ndarray] = None
+        for field_name, values in where.items():
+            if field_name in self._field_rows:
+                matched = np.unique(np.concatenate(
+                    [self._value_rows(field_name, v) for v in values] or [np.zeros(0, dtype=np.int64)]
+                ))
+            else:
+                # Not indexed: fall back to checking every live payload
+                matched = np.fromiter(sorted(
+                    row for row in self._id_to_row.values()
+                    if _field_value(self._payloads[row], field_name) in values
+                ), dtype=np.int64)
+            rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+        return rows
+
+    def _search_rows(self, query: np.ndarray, rows: np.ndarray, k: int) -> List[Tuple[str, float, Dict[str, Any]]]:
+        if not len(rows):
+            return []
+        scores = np.empty(len(rows), dtype=np.float32)
+        run_starts = np.concatenate(([0], np.flatnonzero(np.diff(rows) != 1) + 1))
+        if len(run_starts) * MIN_RUN_ROWS <= len(rows):
+            # Chunks of a section are ingested together, so matches come in long runs scored in place
+            run_ends = np.append(run_starts[1:], len(rows))
+            for start, end in zip(run_starts, run_ends):
+                first = rows[start]
+                for offset in range(0, end - start, SEARCH_BLOCK_ROWS):
+                    stop = min(end - start, offset + SEARCH_BLOCK_ROWS)
+                    block = np.asarray(self._vectors[first + offset:first + stop], dtype=np.float32)
+                    scores[start + offset:start + stop] = block @ query
+        else:
+            for start in range(0, len(rows), SEARCH_BLOCK_ROWS):
+                block_rows = rows[start:start + SEARCH_BLOCK_ROWS]
+                scores[start:start + len(block_rows)] = np.asarray(self._vectors[block_rows], dtype=np.float32) @ query
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._ids[rows[i]], float(scores[i]), self._payloads[rows[i]]) for i in top]
+
+    def _index_row(self, row: int) -> None:
+        for field_name, by_value in self._field_rows.items():
+            value = _field_value(self._payloads[row], field_name)
+            if value is not None:
+                by_value.setdefault(value, set()).add(row)
+                self._row_arrays.pop((field_name, value), None)
+
+    def _unindex_row(self, row: int) -> None:
+        for field_name, by_value in self._field_rows.items():
+            value = _field_value(self._payloads[row], field_name)
+            rows = by_value.get(value)
+            if rows is not None:
+                self._row_arrays.pop((field_name, value), None)
+                rows.discard(row)
+                if not rows:
+                    del by_value[value]
+
+    def _reindex_fields(self) -> None:
+        self._field_rows = {f: {} for f in self.indexed_fields}
+        self._row_arrays = {}
+        for row in self._id_to_row.values():
+            self._index_row(row)
+
+    def _append_row(self) -> int:
+        row = len(self._ids)
+        if row >= self._capacity:
+            self._open_matrix(max(self._capacity * 2, self._initial_capacity), copy_rows=row)
+        self._ids.append(None)
+        self._payloads.append(None)
+        return row
+
+    def _open_matrix(self, capacity: int, copy_rows: int, fresh: bool = False) -> None:
+        """(Re)allocate the memory-mapped matrix, keeping the first copy_rows rows"""
+        old = None if fresh else self._vectors
+        tmp_path = f"{self.vectors_path}.tmp"
+        grown = np.memmap(tmp_path, dtype=self.dtype, mode="w+", shape=(capacity, self.dim))
+        if old is not None and copy_rows:
+            grown[:copy_rows] = old[:copy_rows]
+        grown.flush()
+        del grown, old
+        self._vectors = None
+        os.replace(tmp_path, self.vectors_path)
+        self._capacity = capacity
+        self._vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:copy_rows] = self._alive[:copy_rows]
+        self._alive = alive
+
+
+def _field_value(payload: Optional[Dict[str, Any]], field_name: str) -> Any:
+    """A metadata field of a chunk payload, the layout LangChain vector stores use"""
+    if not payload:
+        return None
+    return (payload.get("metadata") or {}).get(field_name)
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
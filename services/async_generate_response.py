@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Union
+
+from helper.helpers import (
+    initialize_llm,
+    agenerate_llm_response,
+    alookup_orders,
+    aget_product_status,
+    apolicy_related_answers,
+    agenerate_chitchat_response,
+    NOT_FETCHED
+)
+from helper.llm_registry import llm_registry
+from helper.llm_scheduler import llm_scheduler
+from helper.metrics import metrics
+from rag.rag_engine import rag_engine
+from rag.semantic_cache import normalize_query
+from services.generate_response import (
+    IntentRouter,
+    RouteDecision,
+    TurnInfo,
+    ORDER_ID_PATTERN,
+    PLANNER_TOOLS,
+    REPLY_SEPARATOR,
+    UNRESOLVED_QUERY_MESSAGE,
+    as_conversation_state,
+    build_rewrite_prompt,
+    coalescing_key,
+    log_route,
+    order_ids_from_args
+)
+from helper.order_responses import normalize_order_ids
+from helper.single_flight import AsyncSingleFlight
+from services.conversation_state import ConversationState
+import config
+
+logger = logging.getLogger(__name__)
+
+async_tool_flight = AsyncSingleFlight("async_tool")
+
+
+class AsyncGenerateResponseService:
+    """Async pipeline that starts retrieval and order lookup while the route is still being decided"""
+
+    def __init__(self):
+        self.router = IntentRouter(planner=None)
+
+    async def arewrite_query_with_context(self, current_query: str, conversation: ConversationState) -> str:
+        """Async variant of GenerateResponseService.rewrite_query_with_context"""
+        if not conversation.has_context:
+            return current_query
+        try:
+            rewritten_query = await agenerate_llm_response(
+                initialize_llm(), build_rewrite_prompt(current_query, conversation), stage="rewrite"
+            )
+            logger.info(f"rewritten_query: {rewritten_query}")
+            return rewritten_query.strip()
+        except Exception as e:
+            logger.error(f"Error rewriting query: {e}")
+            return current_query
+
+    async def aroute(self, query: str) -> RouteDecision:
+        """Local tiers first (off the event loop), then the planner via ainvoke"""
+        with metrics.span("route") as span:
+            decision = await asyncio.to_thread(self.router.route_locally, query)
+            if decision is None:
+                planner_llm = llm_registry.get_planner(PLANNER_TOOLS)
+                try:
+                    with metrics.span("planner"):
+                        decision = self.router.decision_from_planner(
+                            await llm_scheduler.ainvoke(planner_llm, query, "planner")
+                        )
+                except Exception as e:
+                    logger.error(f"Error in planner router tier: {e}")
+                    decision = RouteDecision(tool_name=None, tier="llm")
+            span.update(tier=decision.tier, tool=decision.tool_name)
+        log_route(decision)
+        return decision
+
+    async def agenerate_response(
+        self,
+        user_query: str,
+        conversation: Union[ConversationState, List[Dict], None] = None,
+        turn: Optional[TurnInfo] = None,
+    ) -> str:
+        conversation = as_conversation_state(user_query, conversation)
+        # Per call: concurrent turns on one service must not see each other's route
+        turn = turn if turn is not None else TurnInfo()
+        start = time.perf_counter()
+        with metrics.span("turn", mode="async") as span:
+            reply = await self._agenerate_response(user_query, conversation, turn)
+            span.update(tier=turn.route.tier if turn.route else None, tools=turn.tool_names)
+        turn.total = time.perf_counter() - start
+        conversation.record_turn(user_query, reply, turn.tool_names)
+        return reply
+
+    async def _agenerate_response(self, user_query: str, conversation: ConversationState, turn: TurnInfo) -> str:
+        decision = self.router.match_order_id(user_query)
+        if decision is not None:
+            turn.route = decision
+            log_route(decision)
+            with metrics.span("tool.get_product_status"):
+                return await self._coalesce(decision, lambda: aget_product_status(decision.args["order_ids"]))
+
+        if conversation.has_context:
+            rewritten_query = await self.arewrite_query_with_context(user_query, conversation)
+        else:
+            rewritten_query = user_query
+
+        # Speculative work overlapping the routing decision
+        speculative: Dict[str, asyncio.Task] = {
+            "documents": asyncio.create_task(self._aretrieve(rewritten_query)),
+        }
+        order_ids = normalize_order_ids(ORDER_ID_PATTERN.findall(rewritten_query.upper()))
+        if order_ids:
+            speculative["orders"] = asyncio.create_task(alookup_orders(order_ids))
+
+        try:
+            decision = turn.route = await self.aroute(rewritten_query)
+            # Independent tool calls from one turn run concurrently and merge into one reply
+            replies = await asyncio.gather(
+                *(self._arun_tool(call, rewritten_query, order_ids, speculative) for call in decision.calls)
+            )
+            return REPLY_SEPARATOR.join(replies)
+        finally:
+            await _cancel_pending(speculative.values())
+
+    async def _arun_tool(
+        self,
+        decision: RouteDecision,
+        rewritten_query: str,
+        order_ids: List[str],
+        speculative: Dict[str, asyncio.Task],
+    ) -> str:
+        with metrics.span(f"tool.{decision.tool_name}"):
+            return await self._coalesce(
+                decision, lambda: self._arun_tool_call(decision, rewritten_query, order_ids, speculative)
+            )
+
+    async def _coalesce(self, decision: RouteDecision, run) -> str:
+        if not config.SINGLE_FLIGHT_ENABLED:
+            return await run()
+        return await async_tool_flight.do(coalescing_key(decision), run)
+
+    async def _arun_tool_call(
+        self,
+        decision: RouteDecision,
+        rewritten_query: str,
+        order_ids: List[str],
+        speculative: Dict[str, asyncio.Task],
+    ) -> str:
+        param = decision.args
+        if decision.tool_name == "get_product_status":
+            requested_ids = order_ids_from_args(param)
+            orders = NOT_FETCHED
+            if "orders" in speculative and set(requested_ids) <= set(order_ids):
+                try:
+                    orders = await speculative.pop("orders")
+                except Exception as e:
+                    # aget_product_status looks the orders up again
+                    logger.error(f"Error in speculative order lookup: {e}")
+                    orders = NOT_FETCHED
+            return await aget_product_status(requested_ids, orders=orders)
+
+        if decision.tool_name == "policy_related_answers":
+            query = param.get("query") or rewritten_query
+            documents = None
+            if normalize_query(query) == normalize_query(rewritten_query) and "documents" in speculative:
+                documents = await speculative.pop("documents")
+            return await apolicy_related_answers(query, documents=documents)
+
+        if decision.tool_name == "generate_chitchat_response":
+            return await agenerate_chitchat_response(param.get("query"))
+
+        return UNRESOLVED_QUERY_MESSAGE
+
+    async def _aretrieve(self, query: str) -> Optional[List]:
+        try:
+            rag_manager = await asyncio.to_thread(rag_engine.get_manager)
+            return await rag_manager.aretrieve(query)
+        except Exception as e:
+            logger.error(f"Error in speculative retrieval: {e}")
+            return None
+
+
+async def _cancel_pending(tasks) -> None:
+    """Cancel speculative work the chosen route did not consume"""
+    pending = [task for task in tasks if not task.done()]
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
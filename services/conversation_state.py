@@ -0,0 +1,110 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+import config
+from helper.order_responses import ORDER_ID_PATTERN, normalize_order_ids
+
+# Readable names for the topic a routed tool implies
+ROUTE_TOPICS = {
+    "get_product_status": "order status",
+    "policy_related_answers": "store policies",
+    "generate_chitchat_response": "general conversation",
+}
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+@dataclass
+class ConversationState:
+    """Bounded per-session memory: recent messages, a rolling summary of older turns and extracted entities"""
+
+    recent_messages: Deque[Dict[str, str]] = field(
+        default_factory=lambda: deque(maxlen=config.MAX_CONVERSATION_HISTORY)
+    )
+    summary_lines: Deque[str] = field(default_factory=lambda: deque(maxlen=config.CONVERSATION_SUMMARY_MAX_LINES))
+    active_order_ids: List[str] = field(default_factory=list)
+    topic: Optional[str] = None
+    turn_count: int = 0
+
+    @classmethod
+    def from_messages(cls, messages: List[Dict[str, str]]) -> "ConversationState":
+        """Replay a raw transcript, e.g. one kept by an older client"""
+        state = cls()
+        for message in messages:
+            state.add_message(message["role"], message["content"])
+        return state
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "recent_messages": list(self.recent_messages),
+            "summary_lines": list(self.summary_lines),
+            "active_order_ids": list(self.active_order_ids),
+            "topic": self.topic,
+            "turn_count": self.turn_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ConversationState":
+        state = cls()
+        # Re-applying the configured maxlen trims state saved under larger limits
+        state.recent_messages.extend(data.get("recent_messages", []))
+        state.summary_lines.extend(data.get("summary_lines", []))
+        state.active_order_ids = list(data.get("active_order_ids", []))[-config.CONVERSATION_MAX_ORDER_IDS:]
+        state.topic = data.get("topic")
+        state.turn_count = data.get("turn_count", 0)
+        return state
+
+    @property
+    def has_context(self) -> bool:
+        return bool(self.recent_messages or self.summary_lines)
+
+    def add_message(self, role: str, content: str) -> None:
+        if len(self.recent_messages) == self.recent_messages.maxlen:
+            self._summarize(self.recent_messages[0])
+        # Each message is clipped on the way in, so the window's size is bounded too
+        self.recent_messages.append({"role": role, "content": _clip(content, config.CONVERSATION_MESSAGE_MAX_CHARS)})
+        self._extract_order_ids(content)
+        if role == "user":
+            self.turn_count += 1
+
+    def record_turn(self, user_query: str, reply: str, tool_names: List[Optional[str]]) -> None:
+        self.add_message("user", user_query)
+        self.add_message("assistant", reply)
+        topics = [ROUTE_TOPICS[name] for name in tool_names if name in ROUTE_TOPICS]
+        if topics:
+            self.topic = topics[0]
+
+    def rewrite_context(self) -> str:
+        """Fixed-size context for the rewrite prompt; grows with neither turn count nor answer length"""
+        sections = []
+        if self.summary_lines:
+            sections.append("Earlier in the conversation:\n" + "\n".join(f"- {line}" for line in self.summary_lines))
+        facts = []
+        if self.active_order_ids:
+            facts.append(f"Order IDs mentioned: {', '.join(self.active_order_ids)}")
+        if self.topic:
+            facts.append(f"Current topic: {self.topic}")
+        if facts:
+            sections.append("\n".join(facts))
+        recent = list(self.recent_messages)[-config.REWRITE_CONTEXT_MESSAGES:]
+        if recent:
+            sections.append("\n".join(
+                f"{'User' if m['role'] == 'user' else 'Assistant'}: {m['content']}" for m in recent
+            ))
+        return "\n\n".join(sections)
+
+    def _summarize(self, message: Dict[str, str]) -> None:
+        """Fold a message leaving the window into one short summary line; assistant replies are dropped"""
+        if message["role"] == "user":
+            self.summary_lines.append(f"User asked: {_clip(message['content'], config.CONVERSATION_SUMMARY_LINE_CHARS)}")
+
+    def _extract_order_ids(self, text: str) -> None:
+        found = normalize_order_ids(ORDER_ID_PATTERN.findall(text.upper()))
+        if found:
+            # Most recently mentioned last, capped so a long session cannot grow the list
+            kept = [order_id for order_id in self.active_order_ids if order_id not in found] + found
+            self.active_order_ids = kept[-config.CONVERSATION_MAX_ORDER_IDS:]
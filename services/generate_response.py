@@ -1,33 +1,242 @@
-from typing import List, Dict
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, List, Dict, Optional, Union
+
+import numpy as np
+
 from helper.helpers import (
     initialize_llm, 
     generate_llm_response,
     get_product_status,
     policy_related_answers,
-    generate_chitchat_response
+    generate_chitchat_response,
+    stream_product_status,
+    stream_policy_answer,
+    stream_chitchat_response
 )
+from helper.llm_registry import llm_registry
+from helper.llm_scheduler import llm_scheduler
+from helper.metrics import metrics
+from helper.order_responses import ORDER_ID_HINT, ORDER_ID_PATTERN, normalize_order_ids
+from helper.single_flight import SingleFlight
 from langchain_core.messages import ToolMessage
+from rag.embeddings import get_embedding_model
+from rag.semantic_cache import normalize_query
+from services.conversation_state import ConversationState
+import config
 
-class GenerateResponseService:
-    def __init__(self):
-        pass
-        
-    def rewrite_query_with_context(self, current_query: str, conversation_history: List[Dict]) -> str:
-        """Rewrite the current query with conversation context"""
-        print("Rewriting query with context...")
-        if not conversation_history:
-            return current_query
-            
-        context_messages = []
-        for msg in conversation_history[-6:]: 
-            if msg["role"] == "user":
-                context_messages.append(f"User: {msg['content']}")
-            else:
-                context_messages.append(f"Assistant: {msg['content']}")
-                
-        context = "\n".join(context_messages)
-        
-        rewrite_prompt = f"""
+logger = logging.getLogger(__name__)
+
+UNRESOLVED_QUERY_MESSAGE = f"Could not determine the appropriate response. Please try rephrasing your query. And if you are trying to ask about order status please {ORDER_ID_HINT}"
+
+PLANNER_TOOLS = [
+    get_product_status,
+    policy_related_answers,
+    generate_chitchat_response
+]
+
+# Joins the replies of several tool calls answered in one turn
+REPLY_SEPARATOR = "\n\n"
+
+# Labelled example utterances the embedding tier builds its centroids from
+ROUTE_EXAMPLES = {
+    "get_product_status": [
+        "Where is my order?",
+        "What is the status of my order?",
+        "Has my package shipped yet?",
+        "Can you track my order for me?",
+        "When will my order arrive?",
+        "Is my order delivered?",
+    ],
+    "policy_related_answers": [
+        "How do I return an item?",
+        "What is your refund policy?",
+        "Can I exchange a product for a different size?",
+        "Which payment methods do you accept?",
+        "Do you offer cash on delivery?",
+        "How long does shipping take?",
+        "Do you ship internationally?",
+        "How do I cancel my order?",
+        "When will I get my refund?",
+        "Is there a restocking fee for returns?",
+    ],
+    "generate_chitchat_response": [
+        "Hi there!",
+        "Hello, how are you?",
+        "Thanks for your help",
+        "Good morning",
+        "Who are you?",
+        "What can you do?",
+        "Bye, have a nice day",
+        "Tell me a joke",
+    ],
+}
+
+
+@dataclass
+class RouteDecision:
+    """Tool chosen for a query, with the tier that decided and its confidence"""
+    tool_name: Optional[str]
+    args: Dict[str, Any] = field(default_factory=dict)
+    confidence: float = 0.0
+    tier: str = "none"
+    tool_call_id: Optional[str] = None
+    # Further tool calls the planner made in the same turn, answered alongside this one
+    followups: List["RouteDecision"] = field(default_factory=list)
+
+    @property
+    def calls(self) -> List["RouteDecision"]:
+        return [self, *self.followups]
+
+
+@dataclass
+class TurnInfo:
+    """Route and timings of one turn, filled in for the caller that passed it
+
+    Kept per call rather than on the service, which concurrent turns share.
+    """
+    route: Optional[RouteDecision] = None
+    time_to_first_token: Optional[float] = None
+    total: Optional[float] = None
+
+    @property
+    def tool_names(self) -> List[Optional[str]]:
+        return [c.tool_name for c in self.route.calls] if self.route else []
+
+    @property
+    def timings(self) -> Dict[str, Optional[float]]:
+        return {"time_to_first_token": self.time_to_first_token, "total": self.total}
+
+
+class IntentRouter:
+    """Tiered router: order-ID matcher, then embedding centroids, then the LLM planner"""
+
+    _centroids: Optional[Dict[str, np.ndarray]] = None
+    _centroid_lock = threading.Lock()
+
+    def __init__(self, planner: Callable[[str], Any]):
+        self.planner = planner
+
+    def match_order_id(self, query: str) -> Optional[RouteDecision]:
+        """Deterministic tier: any ABC-123 style ID means an order status question"""
+        order_ids = normalize_order_ids(ORDER_ID_PATTERN.findall(query.upper()))
+        if not order_ids:
+            return None
+        return RouteDecision(
+            tool_name="get_product_status",
+            args={"order_ids": order_ids},
+            confidence=1.0,
+            tier="order_id",
+        )
+
+    def classify_by_embedding(self, query: str) -> Optional[RouteDecision]:
+        """Nearest-centroid tier; returns None when the match is not confident"""
+        centroids = self._get_centroids()
+        if not centroids:
+            return None
+
+        vector = _normalize(np.asarray(get_embedding_model().embed_query(query), dtype=np.float32))
+        scores = sorted(
+            ((float(vector @ centroid), label) for label, centroid in centroids.items()),
+            reverse=True,
+        )
+        (best_score, best_label), (second_score, _) = scores[0], scores[1]
+        logger.debug(f"embedding route scores: {scores}")
+
+        # Order status without an ID is left to the planner, which can ask for one
+        if best_label == "get_product_status":
+            return None
+        if best_score < config.ROUTER_MIN_SIMILARITY or best_score - second_score < config.ROUTER_MIN_MARGIN:
+            return None
+        return RouteDecision(
+            tool_name=best_label,
+            args={"query": query},
+            confidence=best_score,
+            tier="embedding",
+        )
+
+    def route_with_planner(self, query: str) -> RouteDecision:
+        """LLM tier, only reached when the local tiers are not confident"""
+        try:
+            return self.decision_from_planner(self.planner(query))
+        except Exception as e:
+            # e.g. out of LLM quota: answer with the unresolved message rather than failing the turn
+            logger.error(f"Error in planner router tier: {e}")
+            return RouteDecision(tool_name=None, tier="llm")
+
+    def decision_from_planner(self, evaluate_tool) -> RouteDecision:
+        if not evaluate_tool.tool_calls:
+            return RouteDecision(tool_name=None, tier="llm")
+        logger.info(f"evaluate_tool: {evaluate_tool.tool_calls}")
+        decisions: List[RouteDecision] = []
+        order_decision: Optional[RouteDecision] = None
+        for tool in evaluate_tool.tool_calls:
+            decision = RouteDecision(
+                tool_name=tool.get("name"),
+                args=tool.get("args") or {},
+                confidence=1.0,
+                tier="llm",
+                tool_call_id=tool.get("id"),
+            )
+            if decision.tool_name == "get_product_status":
+                # Several order calls collapse into one set-based lookup
+                order_ids = order_ids_from_args(decision.args)
+                if order_decision is not None:
+                    order_decision.args["order_ids"] = normalize_order_ids(order_decision.args["order_ids"] + order_ids)
+                    continue
+                decision.args = {"order_ids": order_ids}
+                order_decision = decision
+            if any(d.tool_name == decision.tool_name and d.args == decision.args for d in decisions):
+                continue
+            decisions.append(decision)
+        first, *rest = decisions
+        first.followups = rest
+        return first
+
+    def route_locally(self, query: str) -> Optional[RouteDecision]:
+        """Run the order-ID and embedding tiers; None means the planner has to decide"""
+        decision = self.match_order_id(query)
+        if decision is None and config.ROUTER_EMBEDDING_TIER_ENABLED:
+            try:
+                decision = self.classify_by_embedding(query)
+            except Exception as e:
+                logger.error(f"Error in embedding router tier: {e}")
+        return decision
+
+    def route(self, query: str) -> RouteDecision:
+        with metrics.span("route") as span:
+            decision = self.route_locally(query)
+            if decision is None:
+                with metrics.span("planner"):
+                    decision = self.route_with_planner(query)
+            span.update(tier=decision.tier, tool=decision.tool_name)
+        log_route(decision)
+        return decision
+
+    @classmethod
+    def _get_centroids(cls) -> Dict[str, np.ndarray]:
+        if cls._centroids is not None:
+            return cls._centroids
+
+        with cls._centroid_lock:
+            if cls._centroids is None:
+                embedding_model = get_embedding_model()
+                centroids = {}
+                for label, examples in ROUTE_EXAMPLES.items():
+                    vectors = np.asarray(embedding_model.embed_documents(examples), dtype=np.float32)
+                    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+                    centroids[label] = _normalize(vectors.mean(axis=0))
+                cls._centroids = centroids
+            return cls._centroids
+
+
+def build_rewrite_prompt(current_query: str, conversation: ConversationState) -> str:
+    context = conversation.rewrite_context()
+    
+    return f"""
         Given the conversation history and the current user query, rewrite the query to include all necessary context.
         Make sure the rewritten query is self-contained and clear.
         
@@ -38,58 +247,201 @@ class GenerateResponseService:
         
         Rewritten Query (be concise and include context and avoid unnecessary pleasantries or information just revelant question):
         """
+
+
+def as_conversation_state(
+    user_query: str, conversation: Union[ConversationState, List[Dict], None]
+) -> ConversationState:
+    """Accept a ConversationState, or a raw message list whose last entry may be the current query"""
+    if isinstance(conversation, ConversationState):
+        return conversation
+    messages = list(conversation or [])
+    if messages and messages[-1]["role"] == "user" and messages[-1]["content"] == user_query:
+        messages = messages[:-1]
+    return ConversationState.from_messages(messages)
+
+
+def log_route(decision: RouteDecision) -> None:
+    for call in decision.calls:
+        metrics.record_route(call.tier, call.tool_name)
+    logger.info(f"route: tier={decision.tier} tool={decision.tool_name} confidence={decision.confidence:.3f}")
+
+
+def order_ids_from_args(args: Dict[str, Any]) -> List[str]:
+    """Order IDs from tool-call args, accepting the older single order_id form too"""
+    return normalize_order_ids(args.get("order_ids") or args.get("order_id"))
+
+
+def coalescing_key(decision: "RouteDecision") -> tuple:
+    """Tool calls with equal keys produce the same reply, whichever session asked"""
+    if decision.tool_name == "get_product_status":
+        return decision.tool_name, tuple(order_ids_from_args(decision.args))
+    return decision.tool_name, normalize_query(str(decision.args.get("query") or "")).rstrip("?.! ")
+
+
+# Shared by every service instance in the process, so identical calls from different sessions coalesce
+tool_flight = SingleFlight("tool")
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class GenerateResponseService:
+    def __init__(self):
+        self.router = IntentRouter(planner=self.evaluate_tool_usage)
+        
+    def rewrite_query_with_context(self, current_query: str, conversation: ConversationState) -> str:
+        """Rewrite the current query with conversation context"""
+        logger.info("Rewriting query with context...")
+        if not conversation.has_context:
+            return current_query
+            
+        rewrite_prompt = build_rewrite_prompt(current_query, conversation)
         
         try:
-            print(f"rewrite_prompt: {rewrite_prompt}")
+            logger.debug(f"rewrite_prompt: {rewrite_prompt}")
             llm = initialize_llm()
-            rewritten_query = generate_llm_response(llm, rewrite_prompt)
-            print(f"rewritten_query: {rewritten_query}")
+            rewritten_query = generate_llm_response(llm, rewrite_prompt, stage="rewrite")
+            logger.info(f"rewritten_query: {rewritten_query}")
             return rewritten_query.strip()
         except Exception as e:
-            print(f"Error rewriting query: {e}")
+            logger.error(f"Error rewriting query: {e}")
             return current_query
     
 
     def evaluate_tool_usage(self, rewritten_query: str) -> bool:
-        llm = initialize_llm()
-        planner_llm = llm.bind_tools([
-            get_product_status,
-            policy_related_answers,
-            generate_chitchat_response
-        ])
-        eval_tool = planner_llm.invoke(rewritten_query)
+        planner_llm = llm_registry.get_planner(PLANNER_TOOLS)
+        eval_tool = llm_scheduler.invoke(planner_llm, rewritten_query, "planner")
         return eval_tool
 
 
-    def generate_response(self, user_query: str, conversation_history: List[Dict]) -> str:
-        print("conversation_history",conversation_history)
-        if len(conversation_history) > 1:
-            rewritten_query = self.rewrite_query_with_context(user_query, conversation_history)
+    def route_query(self, user_query: str, conversation: ConversationState) -> RouteDecision:
+        """Pick the tool for this turn, rewriting the query with context only when needed"""
+        # An explicit order ID is self-contained, so it needs neither rewrite nor planner
+        decision = self.router.match_order_id(user_query)
+        if decision is None:
+            if conversation.has_context:
+                rewritten_query = self.rewrite_query_with_context(user_query, conversation)
+            else:
+                rewritten_query = user_query
+            decision = self.router.route(rewritten_query)
         else:
-            rewritten_query = user_query
-        print(f"rewritten_query: {rewritten_query}")
-        evaluate_tool = self.evaluate_tool_usage(rewritten_query)
-        if evaluate_tool.tool_calls:
-            tool = evaluate_tool.tool_calls[0]
-            param = tool.get("args")
-            tool_name = tool.get("name")
-            print(f"evaluate_tool: {tool}")
-            
-            if tool_name == "get_product_status":
-                return ToolMessage(
-                    content=get_product_status(param.get("order_id")),
-                    tool_call_id=tool["id"],
+            log_route(decision)
+        return decision
+
+    def run_tool(self, decision: RouteDecision) -> str:
+        """Answer a single tool call"""
+        with metrics.span(f"tool.{decision.tool_name}"):
+            if not config.SINGLE_FLIGHT_ENABLED:
+                return self._run_tool(decision)
+            return tool_flight.do(coalescing_key(decision), lambda: self._run_tool(decision))
+
+    def _run_tool(self, decision: RouteDecision) -> str:
+        tool_call_id = decision.tool_call_id or f"route_{decision.tier}"
+        param = decision.args
+        if decision.tool_name == "get_product_status":
+            return ToolMessage(
+                content=get_product_status.invoke({"order_ids": order_ids_from_args(param)}),
+                tool_call_id=tool_call_id,
+            ).content
+        elif decision.tool_name == "policy_related_answers":
+            return ToolMessage(
+                    content=policy_related_answers.invoke({"query": param.get("query")}),
+                    tool_call_id=tool_call_id,
+                ).content
+        elif decision.tool_name == "generate_chitchat_response":
+            return ToolMessage(
+                    content=generate_chitchat_response.invoke({"query": param.get("query")}),
+                    tool_call_id=tool_call_id,
                 ).content
-            elif tool_name == "policy_related_answers":
-                return ToolMessage(
-                        content=policy_related_answers(param.get("query")),
-                        tool_call_id=tool["id"],
-                    ).content
-            elif tool.get("name") == "generate_chitchat_response":
-                return ToolMessage(
-                        content=generate_chitchat_response(param.get("query")),
-                        tool_call_id=tool["id"],
-                    ).content
     
         
-        return "Could not determine the appropriate response. Please try rephrasing your query. And if you are trying to ask about order status please provide a valid order ID like ABC-123, XYZ-456 etc."
\ No newline at end of file
+        return UNRESOLVED_QUERY_MESSAGE
+
+    def generate_response(
+        self,
+        user_query: str,
+        conversation: Union[ConversationState, List[Dict], None] = None,
+        turn: Optional[TurnInfo] = None,
+    ) -> str:
+        conversation = as_conversation_state(user_query, conversation)
+        turn = turn if turn is not None else TurnInfo()
+        start = time.perf_counter()
+        with metrics.span("turn") as span:
+            decision = turn.route = self.route_query(user_query, conversation)
+            calls = decision.calls
+            span.update(tier=decision.tier, tools=[c.tool_name for c in calls])
+            if len(calls) == 1:
+                reply = self.run_tool(decision)
+            else:
+                # Independent tool calls from one turn run concurrently and merge into one reply
+                with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+                    reply = REPLY_SEPARATOR.join(executor.map(self.run_tool, calls))
+        turn.total = time.perf_counter() - start
+        conversation.record_turn(user_query, reply, [c.tool_name for c in calls])
+        return reply
+
+    def stream_tool(self, decision: RouteDecision) -> Iterator[str]:
+        if not config.SINGLE_FLIGHT_ENABLED:
+            return self._stream_tool(decision)
+        return tool_flight.stream(coalescing_key(decision), lambda: self._stream_tool(decision))
+
+    def _stream_tool(self, decision: RouteDecision) -> Iterator[str]:
+        param = decision.args
+        if decision.tool_name == "get_product_status":
+            return stream_product_status(order_ids_from_args(param))
+        elif decision.tool_name == "policy_related_answers":
+            return stream_policy_answer(param.get("query"))
+        elif decision.tool_name == "generate_chitchat_response":
+            return stream_chitchat_response(param.get("query"))
+        return iter([UNRESOLVED_QUERY_MESSAGE])
+
+    def stream_response(
+        self,
+        user_query: str,
+        conversation: Union[ConversationState, List[Dict], None] = None,
+        turn: Optional[TurnInfo] = None,
+    ) -> Iterator[str]:
+        """Streaming variant of generate_response; records time to first token and total time in turn"""
+        start = time.perf_counter()
+        turn = turn if turn is not None else TurnInfo()
+        conversation = as_conversation_state(user_query, conversation)
+        reply = []
+
+        with metrics.span("turn", streamed=True) as span:
+            decision = turn.route = self.route_query(user_query, conversation)
+            span.update(tier=decision.tier, tools=[c.tool_name for c in decision.calls])
+            executor = None
+            followups = []
+            if decision.followups:
+                # Answer the other tool calls while the first one streams
+                executor = ThreadPoolExecutor(max_workers=len(decision.followups))
+                followups = [executor.submit(self.run_tool, d) for d in decision.followups]
+
+            try:
+                with metrics.span(f"tool.{decision.tool_name}", streamed=True):
+                    for token in self._chain_replies(self.stream_tool(decision), followups):
+                        if turn.time_to_first_token is None:
+                            turn.time_to_first_token = time.perf_counter() - start
+                            metrics.observe(
+                                "shopez_time_to_first_token_seconds", turn.time_to_first_token,
+                                "Time from user message to first streamed token",
+                            )
+                        reply.append(token)
+                        yield token
+            finally:
+                if executor is not None:
+                    executor.shutdown(wait=False, cancel_futures=True)
+
+            turn.total = time.perf_counter() - start
+            span.update(turn.timings)
+        conversation.record_turn(user_query, "".join(reply), [c.tool_name for c in decision.calls])
+
+    @staticmethod
+    def _chain_replies(tokens: Iterator[str], followups) -> Iterator[str]:
+        yield from tokens
+        for future in followups:
+            yield REPLY_SEPARATOR
+            yield future.result()
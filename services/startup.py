@@ -0,0 +1,239 @@
+"""Startup timing, deferred prewarming and the import-time budget check
+
+    python -m services.startup [--budget SECONDS] [--modules ...] [--json]
+
+Each entry module is imported in a fresh interpreter; the command exits non-zero when one
+fails to import, takes longer than the budget (STARTUP_BUDGET_SECONDS by default) or pulls in
+a heavy module that should only load on first use.
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import config
+from helper.metrics import log_event, metrics
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# What the app and API import before serving
+ENTRY_MODULES = ("services.generate_response", "services.async_generate_response", "api.server", "app")
+# Loaded by the routes that need them, never at import
+HEAVY_MODULES = (
+    "fitz", "sentence_transformers", "torch", "transformers", "qdrant_client",
+    "langchain_community", "langchain_text_splitters", "langchain_huggingface",
+    "langchain_google_genai", "langsmith",
+)
+PREWARM_MODES = ("background", "blocking", "off")
+# Dependencies a deployment may leave out (e.g. streamlit in an API-only image); an entry module
+# that fails only because one of these is not installed is skipped rather than failed
+OPTIONAL_DEPENDENCIES = ("streamlit",)
+
+_module_loaded_at = time.time()
+_phases: Dict[str, float] = {}
+_prewarm: Dict[str, Any] = {"status": "idle", "steps": {}}
+_prewarm_lock = threading.Lock()
+
+
+def process_age() -> float:
+    """Seconds since this process started, interpreter start-up included where the OS reports it"""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may contain spaces; fields after it are fixed
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.time() - _module_loaded_at
+
+
+def mark(phase: str) -> float:
+    """Record how long after process start a startup phase was reached; the first mark of a phase wins"""
+    if phase in _phases:
+        return _phases[phase]
+    seconds = round(process_age(), 3)
+    _phases[phase] = seconds
+    metrics.set_gauge("shopez_startup_seconds", seconds, "Seconds from process start to each startup phase",
+                      phase=phase)
+    log_event("startup", phase=phase, seconds=seconds)
+    logger.info(f"Startup phase {phase} reached after {seconds:.3f}s")
+    return seconds
+
+
+def loaded_heavy_modules() -> List[str]:
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def startup_report() -> Dict[str, Any]:
+    """Phases reached so far, prewarm progress and which heavy modules are loaded"""
+    with _prewarm_lock:
+        prewarm_state = {"status": _prewarm["status"], "steps": dict(_prewarm["steps"])}
+    ready = _phases.get("ready")
+    return {
+        "phases": dict(_phases),
+        "budget_seconds": config.STARTUP_BUDGET_SECONDS,
+        "within_budget": None if ready is None else ready <= config.STARTUP_BUDGET_SECONDS,
+        "prewarm": prewarm_state,
+        "heavy_modules_loaded": loaded_heavy_modules(),
+    }
+
+
+def _prewarm_steps() -> List[Tuple[str, Callable[[], Any]]]:
+    # Imported here so that importing this module stays cheap
+    from db.structured_database_manager import get_database_manager
+    from helper.llm_registry import llm_registry
+    from rag.rag_engine import rag_engine
+    from services.generate_response import PLANNER_TOOLS, IntentRouter
+
+    steps = [("rag_engine", rag_engine.warm_up)]
+    if config.ROUTER_EMBEDDING_TIER_ENABLED:
+        steps.append(("router_centroids", IntentRouter._get_centroids))
+    steps.append(("planner", lambda: llm_registry.get_planner(PLANNER_TOOLS)))
+    steps.append(("orders_db", get_database_manager))
+    return steps
+
+
+def _run_prewarm() -> None:
+    start = time.perf_counter()
+    for name, step in _prewarm_steps():
+        step_start = time.perf_counter()
+        try:
+            step()
+            outcome = {"status": "ok"}
+        except Exception as e:
+            # A failed step is retried by the first request that needs it
+            logger.error(f"Prewarm step {name} failed: {e}")
+            outcome = {"status": "failed", "error": str(e)}
+        outcome["seconds"] = round(time.perf_counter() - step_start, 3)
+        with _prewarm_lock:
+            _prewarm["steps"][name] = outcome
+        log_event("prewarm", step=name, **outcome)
+
+    with _prewarm_lock:
+        _prewarm["status"] = "done"
+        _prewarm["seconds"] = round(time.perf_counter() - start, 3)
+    mark("prewarmed")
+
+
+def prewarm(mode: Optional[str] = None) -> None:
+    """Load the RAG engine, router centroids, planner client and order database ahead of the first request
+
+    "background" returns at once and warms in a daemon thread, "blocking" warms before
+    returning and "off" leaves everything to first use. Safe to call more than once.
+    """
+    mode = mode or config.STARTUP_PREWARM
+    if mode not in PREWARM_MODES:
+        raise ValueError(f"Unknown prewarm mode {mode!r}; expected one of {PREWARM_MODES}")
+    if mode == "off":
+        return
+    with _prewarm_lock:
+        if _prewarm["status"] != "idle":
+            return
+        _prewarm["status"] = "running"
+    if mode == "blocking":
+        _run_prewarm()
+    else:
+        threading.Thread(target=_run_prewarm, name="startup-prewarm", daemon=True).start()
+
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+try:
+    import {module}
+    error = missing = None
+except BaseException as e:
+    error = f"{{type(e).__name__}}: {{e}}"
+    missing = e.name if isinstance(e, ModuleNotFoundError) else None
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "error": error, "missing": missing, "modules": sorted(sys.modules)}}))
+"""
+
+
+def _slowest_imports(importtime_log: str, limit: int) -> List[Dict[str, Any]]:
+    """Direct imports of the probed module with the largest cumulative time, from -X importtime output"""
+    entries = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        # Two spaces of indent per nesting level; the probed module itself sits at level 0
+        if name.startswith("   ") and not name.startswith("     ") and cumulative.strip().isdigit():
+            entries.append({"module": name.strip(), "seconds": int(cumulative) / 1e6})
+    return sorted(entries, key=lambda e: e["seconds"], reverse=True)[:limit]
+
+
+def measure_import(module: str, top: int = 5) -> Dict[str, Any]:
+    """Import time of one module in a fresh interpreter, with the heavy modules it dragged in"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])))
+    wall_start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_PROBE.format(module=module)],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - wall_start
+    try:
+        probe = json.loads(proc.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        return {"module": module, "error": (proc.stderr.strip().splitlines() or ["no output"])[-1], "missing": None}
+    return {
+        "module": module,
+        "import_seconds": round(probe["seconds"], 3),
+        "process_seconds": round(wall, 3),
+        "error": probe["error"],
+        "missing": probe["missing"],
+        "heavy_modules": [name for name in HEAVY_MODULES if name in probe["modules"]],
+        "slowest_imports": _slowest_imports(proc.stderr, top),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=list(ENTRY_MODULES))
+    parser.add_argument("--budget", type=float, default=config.STARTUP_BUDGET_SECONDS)
+    parser.add_argument("--top", type=int, default=5, help="Slowest direct imports to list per module")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    results = [measure_import(module, args.top) for module in args.modules]
+    failures = []
+    for result in results:
+        if result.get("error"):
+            missing = (result.get("missing") or "").split(".")[0]
+            # Only a missing optional dependency is excused; any other import error fails the check
+            result["status"] = "skipped" if missing in OPTIONAL_DEPENDENCIES else "error"
+        elif result["import_seconds"] > args.budget:
+            result["status"] = "over_budget"
+        elif result["heavy_modules"]:
+            result["status"] = "heavy_import"
+        else:
+            result["status"] = "ok"
+        if result["status"] in ("error", "over_budget", "heavy_import"):
+            failures.append(result["module"])
+
+    if args.json:
+        print(json.dumps({"budget_seconds": args.budget, "modules": results}, indent=2))
+    else:
+        print(f"Import budget {args.budget:.2f}s")
+        for result in results:
+            if result["status"] in ("skipped", "error"):
+                print(f"  {result['module']:<36} {result['status']} ({result['error']})")
+                continue
+            print(f"  {result['module']:<36} {result['import_seconds']:6.3f}s  "
+                  f"(process {result['process_seconds']:.3f}s)  {result['status']}")
+            if result["heavy_modules"]:
+                print(f"      heavy modules loaded: {', '.join(result['heavy_modules'])}")
+            for entry in result["slowest_imports"]:
+                print(f"      {entry['seconds']:6.3f}s  {entry['module']}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
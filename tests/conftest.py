@@ -0,0 +1,6 @@
+import os
+
+# Offline backends for everything imported by the tests; set before config is first imported
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("EMBEDDING_BACKEND", "stub")
+os.environ.setdefault("VECTOR_BACKEND", "numpy")
@@ -0,0 +1,117 @@
+import pytest
+
+from rag.answer_index import AnswerIndex, PrecomputedAnswer, vet_answer
+
+QUESTIONS = ["How do I return an item?", "Do you ship internationally?", "Can I pay with UPI?"]
+SOURCES = [{"source": "policy.pdf", "page": 1, "section": "returns"}]
+
+
+def answer(question, vector, chunk_hashes=("h1",), chunk_keys=("h1|policy.pdf|1",), vetted=True):
+    return PrecomputedAnswer(
+        question=question,
+        answer=f"Answer to {question}",
+        vector=list(vector),
+        chunk_hashes=list(chunk_hashes),
+        chunk_keys=list(chunk_keys),
+        sources=SOURCES,
+        vetted=vetted,
+        rejection=None if vetted else "non-answer ('don't know')",
+    )
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = AnswerIndex(str(tmp_path / "answers.json"), similarity_threshold=0.9, min_margin=0.05)
+    index.embedding_model = "stub"
+    index.entries = {
+        QUESTIONS[0]: answer(QUESTIONS[0], [1, 0, 0], ("h1",), ("h1|policy.pdf|1",)),
+        QUESTIONS[1]: answer(QUESTIONS[1], [0, 1, 0], ("h2",), ("h2|policy.pdf|2",)),
+    }
+    return index
+
+
+@pytest.mark.parametrize("vector, expected", [
+    ([1, 0, 0], QUESTIONS[0]),
+    ([2, 0.1, 0], QUESTIONS[0]),
+    ([0, 1, 0.2], QUESTIONS[1]),
+    ([1, 0.7, 0], None),
+    ([0, 0, 1], None),
+    ([1, 0, 0, 0], None),
+])
+def test_lookup_needs_the_threshold(index, vector, expected):
+    match = index.lookup(vector)
+    assert (match.question if match else None) == expected
+
+
+def test_lookup_needs_the_margin_over_the_runner_up(index):
+    index.entries[QUESTIONS[2]] = answer(QUESTIONS[2], [1, 0.1, 0])
+    index.similarity_threshold = 0.5
+    assert index.lookup([1, 0.05, 0]) is None
+    index.min_margin = 0.0
+    assert index.lookup([1, 0.05, 0]) is not None
+
+
+def test_lookup_skips_rejected_answers(index):
+    index.entries[QUESTIONS[0]] = answer(QUESTIONS[0], [1, 0, 0], vetted=False)
+    index._matrix = None
+    assert index.lookup([1, 0, 0]) is None
+    assert index.lookup([0, 1, 0]).question == QUESTIONS[1]
+
+
+def test_prune_drops_answers_built_from_changed_chunks(index):
+    stale = index.prune({"h1", "h3"}, "stub", questions=QUESTIONS[:2])
+    assert stale == [QUESTIONS[1]]
+    assert set(index.entries) == {QUESTIONS[0]}
+    assert index.lookup([0, 1, 0]) is None
+    assert set(AnswerIndex(index.path).load().entries) == {QUESTIONS[0]}
+
+
+def test_prune_rebuilds_answers_whose_retrieved_chunks_changed(index):
+    retrieved = {QUESTIONS[0]: {"h1|policy.pdf|1"}, QUESTIONS[1]: {"h2|policy.pdf|3"}}
+    stale = index.prune({"h1", "h2"}, "stub", questions=QUESTIONS[:2], retrieve=retrieved.get, corpus="v2")
+    assert stale == [QUESTIONS[1]]
+    assert set(index.entries) == {QUESTIONS[0]}
+
+
+def test_prune_only_re_retrieves_when_the_corpus_changed(index):
+    calls = []
+
+    def retrieve(question):
+        calls.append(question)
+        return set(index.entries[question].chunk_keys)
+
+    assert index.prune({"h1", "h2"}, "stub", questions=QUESTIONS[:2], retrieve=retrieve, corpus="v1") == []
+    assert calls == QUESTIONS[:2]
+    assert index.prune({"h1", "h2"}, "stub", questions=QUESTIONS[:2], retrieve=retrieve, corpus="v1") == []
+    assert calls == QUESTIONS[:2]
+
+
+def test_prune_retries_rejected_answers_and_answers_new_questions(index):
+    index.entries[QUESTIONS[0]] = answer(QUESTIONS[0], [1, 0, 0], vetted=False)
+    stale = index.prune({"h1", "h2"}, "stub", questions=QUESTIONS, corpus="v2")
+    assert stale == [QUESTIONS[2], QUESTIONS[0]]
+    assert set(index.entries) == {QUESTIONS[1]}
+
+
+def test_prune_drops_every_answer_for_another_embedding_model(index):
+    assert index.prune({"h1", "h2"}, "other-model", questions=QUESTIONS[:2]) == QUESTIONS[:2]
+    assert index.entries == {}
+    assert index.embedding_model == "other-model"
+
+
+def test_prune_forgets_questions_that_are_no_longer_canonical(index):
+    assert index.prune({"h1", "h2"}, "stub", questions=QUESTIONS[:1]) == []
+    assert set(index.entries) == {QUESTIONS[0]}
+
+
+@pytest.mark.parametrize("text, sources, rejection", [
+    ("Items can be returned within 30 days.", SOURCES, None),
+    ("", SOURCES, "empty answer"),
+    ("   \n", SOURCES, "empty answer"),
+    ("Items can be returned within 30 days.", [], "no supporting policy text retrieved"),
+    ("I don't know.", SOURCES, "non-answer (\"don't know\")"),
+    ("I apologize, the context does not say.", SOURCES, "non-answer ('i apologize')"),
+    ("There is No Information about that.", SOURCES, "non-answer ('no information')"),
+])
+def test_vet_answer(text, sources, rejection):
+    assert vet_answer(text, sources) == rejection
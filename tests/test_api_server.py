@@ -0,0 +1,118 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from api.server import ChatAPI, ChatRequest
+from api.session_store import InMemorySessionStore
+
+
+class BlockingService:
+    """Stands in for GenerateResponseService; each call waits until `release` is set"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Semaphore(0)
+
+    def generate_response(self, user_query, conversation=None, turn=None):
+        self.started.release()
+        self.release.wait(5)
+        conversation.record_turn(user_query, "ok", [])
+        return "ok"
+
+    def stream_response(self, user_query, conversation=None, turn=None):
+        self.started.release()
+        self.release.wait(5)
+        yield "o"
+        yield "k"
+        conversation.record_turn(user_query, "ok", [])
+
+
+def make_api(service, worker_threads=1, max_queued=1, timeout=5.0):
+    return ChatAPI(service=service, store=InMemorySessionStore(), worker_threads=worker_threads,
+                   max_queued=max_queued, timeout=timeout)
+
+
+def wait_until(predicate, timeout=5.0):
+    for _ in range(int(timeout / 0.01)):
+        if predicate():
+            return True
+        threading.Event().wait(0.01)
+    return predicate()
+
+
+def test_chat_saves_the_session():
+    service = BlockingService()
+    service.release.set()
+    api = make_api(service)
+
+    reply = asyncio.run(api.chat(ChatRequest(message="hi", session_id="s1")))
+
+    assert reply.reply == "ok"
+    assert api.store.load("s1").turn_count == 1
+    assert api.in_flight == 0
+    api.close()
+
+
+def test_requests_beyond_capacity_get_503():
+    service = BlockingService()
+    api = make_api(service, worker_threads=1, max_queued=1)
+
+    async def scenario():
+        running = [asyncio.create_task(api.chat(ChatRequest(message=f"q{n}"))) for n in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as excinfo:
+            await api.chat(ChatRequest(message="one too many"))
+        service.release.set()
+        return excinfo.value.status_code, await asyncio.gather(*running)
+
+    status, replies = asyncio.run(scenario())
+
+    assert status == 503
+    assert [reply.reply for reply in replies] == ["ok", "ok"]
+    assert api.in_flight == 0
+    api.close()
+
+
+def test_timed_out_turn_holds_its_slot_until_the_worker_finishes():
+    service = BlockingService()
+    api = make_api(service, worker_threads=1, max_queued=0, timeout=0.05)
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(api.chat(ChatRequest(message="slow", session_id="s1")))
+
+    assert excinfo.value.status_code == 504
+    # The worker is still busy, so its slot is still taken and the timed-out turn is not saved
+    assert api.in_flight == 1
+    assert api.store.load("s1") is None
+    service.release.set()
+    assert wait_until(lambda: api.in_flight == 0)
+    api.close()
+
+
+def test_stream_yields_tokens_and_releases_its_reservation():
+    service = BlockingService()
+    service.release.set()
+    api = make_api(service)
+
+    async def collect():
+        slot = api.reserve("stream")
+        assert api.in_flight == 1
+        return [event async for event in api.stream(ChatRequest(message="hi", session_id="s1"), slot)]
+
+    events = asyncio.run(collect())
+
+    assert [event.split("\n")[0] for event in events] == ["event: token", "event: token", "event: done"]
+    assert api.store.load("s1").turn_count == 1
+    assert wait_until(lambda: api.in_flight == 0)
+    api.close()
+
+
+def test_unstarted_stream_reservation_is_released():
+    api = make_api(BlockingService())
+    slot = api.reserve("stream")
+    slot.release_unsubmitted()
+    slot.release_unsubmitted()
+    assert api.in_flight == 0
+    api.close()
@@ -0,0 +1,89 @@
+from langchain_core.documents import Document
+
+from rag.context_packer import (
+    CHARS_PER_TOKEN,
+    estimate_tokens,
+    format_citations,
+    merge_overlapping,
+    pack_context,
+)
+
+
+def chunk(text, page=1, chunk_index=None, source="policies.pdf", heading=None, chunk_hash=None):
+    metadata = {"source": source, "page": page, "heading": heading}
+    if chunk_index is not None:
+        metadata["chunk_index"] = chunk_index
+    if chunk_hash is not None:
+        metadata["chunk_hash"] = chunk_hash
+    return Document(page_content=text, metadata=metadata)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a" * (CHARS_PER_TOKEN * 3 + 1)) == 4
+
+
+def test_merge_overlapping_joins_splitter_overlap():
+    left = "Refunds are issued to the original payment method"
+    right = "to the original payment method within 7 days."
+    assert merge_overlapping(left, right, max_overlap=200) == left + " within 7 days."
+
+
+def test_merge_overlapping_ignores_short_coincidences():
+    assert merge_overlapping("ends with the", "the start", max_overlap=200) is None
+
+
+def test_duplicates_and_contained_chunks_are_dropped():
+    packed = pack_context([
+        chunk("Returns are accepted within 30 days.", chunk_hash="h1"),
+        chunk("Returns are accepted within 30 days.", chunk_hash="h1", page=2),
+        chunk("within 30 days", page=3),
+    ], token_budget=1000)
+    assert packed.chunks_retrieved == 3
+    assert packed.chunks_packed == 1
+    assert packed.sources == [{"source": "policies.pdf", "page": 1, "section": None}]
+
+
+def test_adjacent_chunks_of_a_page_merge_in_reading_order():
+    packed = pack_context([
+        chunk("Second part.", chunk_index=1),
+        chunk("First part.", chunk_index=0),
+    ], token_budget=1000)
+    assert packed.context == "[policies.pdf, page 1]\nFirst part. Second part."
+    assert packed.chunks_packed == 2
+
+
+def test_chunks_under_different_headings_stay_apart():
+    packed = pack_context([
+        chunk("Returns text.", chunk_index=0, heading="Return Policy"),
+        chunk("Shipping text.", chunk_index=1, heading="Shipping Policy"),
+    ], token_budget=1000)
+    assert packed.context.count("[policies.pdf, page 1") == 2
+    assert [s["section"] for s in packed.sources] == ["Return Policy", "Shipping Policy"]
+
+
+def test_budget_keeps_best_ranked_passages():
+    long_text = "x" * (CHARS_PER_TOKEN * 50)
+    packed = pack_context([
+        chunk("Best passage.", page=1),
+        chunk(long_text, page=2),
+        chunk("Third passage.", page=3),
+    ], token_budget=20)
+    assert "Best passage." in packed.context
+    assert long_text not in packed.context
+    assert "Third passage." in packed.context
+    assert packed.context_tokens <= 20
+
+
+def test_single_long_passage_is_truncated_rather_than_dropped():
+    packed = pack_context([chunk("y" * 1000)], token_budget=10)
+    assert packed.context
+    assert packed.context_tokens <= 10
+
+
+def test_format_citations():
+    assert format_citations([{"source": "a.pdf", "page": 2, "section": "Returns"}]) == "Source: a.pdf, page 2 (Returns)"
+    assert format_citations([
+        {"source": "a.pdf", "page": 1, "section": None},
+        {"source": "b.pdf", "page": 3, "section": "Shipping"},
+    ]) == "Sources: a.pdf, page 1; b.pdf, page 3 (Shipping)"
@@ -0,0 +1,70 @@
+import config
+from services.conversation_state import ConversationState
+
+
+def test_empty_state_has_no_context():
+    state = ConversationState()
+    assert not state.has_context
+    assert state.rewrite_context() == ""
+
+
+def test_record_turn_tracks_messages_topic_and_order_ids():
+    state = ConversationState()
+    state.record_turn("Where is order abc-123?", "It has shipped.", ["get_product_status"])
+    assert state.turn_count == 1
+    assert [m["role"] for m in state.recent_messages] == ["user", "assistant"]
+    assert state.active_order_ids == ["ABC-123"]
+    assert state.topic == "order status"
+    context = state.rewrite_context()
+    assert "Order IDs mentioned: ABC-123" in context
+    assert "User: Where is order abc-123?" in context
+
+
+def test_window_is_bounded_and_old_user_messages_are_summarized():
+    state = ConversationState()
+    turns = config.MAX_CONVERSATION_HISTORY
+    for n in range(turns):
+        state.record_turn(f"question {n}", "answer " * 200, [])
+    assert len(state.recent_messages) == config.MAX_CONVERSATION_HISTORY
+    assert list(state.summary_lines)[0] == "User asked: question 0"
+    # Assistant replies leaving the window are dropped, not summarized
+    assert all(line.startswith("User asked:") for line in state.summary_lines)
+    assert len(state.summary_lines) <= config.CONVERSATION_SUMMARY_MAX_LINES
+    assert all(len(m["content"]) <= config.CONVERSATION_MESSAGE_MAX_CHARS for m in state.recent_messages)
+
+
+def test_rewrite_context_size_does_not_grow_with_turns():
+    state = ConversationState()
+    sizes = []
+    for n in range(60):
+        state.record_turn(f"question number {n:03d}", "reply " * 100, ["policy_related_answers"])
+        sizes.append(len(state.rewrite_context()))
+    assert max(sizes[30:]) == min(sizes[30:])
+
+
+def test_order_ids_are_capped_and_most_recent_last():
+    state = ConversationState()
+    for n in range(config.CONVERSATION_MAX_ORDER_IDS + 2):
+        state.add_message("user", f"ABC-{100 + n}")
+    state.add_message("user", "ABC-103 again")
+    assert len(state.active_order_ids) == config.CONVERSATION_MAX_ORDER_IDS
+    assert state.active_order_ids[-1] == "ABC-103"
+    assert "ABC-100" not in state.active_order_ids
+
+
+def test_dict_round_trip():
+    state = ConversationState()
+    for n in range(config.MAX_CONVERSATION_HISTORY):
+        state.record_turn(f"Order XYZ-{n:03d}?", "ok", ["get_product_status"])
+    restored = ConversationState.from_dict(state.to_dict())
+    assert restored.to_dict() == state.to_dict()
+    assert restored.recent_messages.maxlen == config.MAX_CONVERSATION_HISTORY
+
+
+def test_from_messages_replays_a_transcript():
+    state = ConversationState.from_messages([
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+    ])
+    assert state.turn_count == 1
+    assert state.has_context
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from langchain_core.documents import Document
+
+from rag.hybrid_retriever import HybridRetriever, reciprocal_rank_fusion
+from rag.lexical_index import BM25Index
+from rag.stub_embeddings import HashingEmbeddings
+from rag.vector_backends import NumpyVectorStore
+from rag.vector_index import NumpyVectorIndex
+
+CHUNKS = {
+    "returns": ("Items can be returned within 30 days of delivery for a full refund.", "returns"),
+    "cod": ("Cash on delivery (COD) is available for orders under $500.", "payments"),
+    "cards": ("We accept all major credit cards and PayPal.", "payments"),
+    "shipping": ("Standard shipping takes 5-7 business days.", "shipping"),
+}
+
+
+def doc(doc_id):
+    return Document(page_content=doc_id, metadata={"_id": doc_id})
+
+
+def test_rrf_rewards_documents_ranked_by_both_lists():
+    fused = reciprocal_rank_fusion([[doc("a"), doc("b"), doc("c")], [doc("c"), doc("b"), doc("d")]], k=4)
+    assert {d.metadata["_id"] for d in fused[:2]} == {"b", "c"}
+    assert {d.metadata["_id"] for d in fused} == {"a", "b", "c", "d"}
+
+
+def test_rrf_truncates_to_k_and_deduplicates():
+    fused = reciprocal_rank_fusion([[doc("a"), doc("b")], [doc("a"), doc("b")]], k=1)
+    assert [d.metadata["_id"] for d in fused] == ["a"]
+
+
+def test_rrf_falls_back_to_page_content_without_ids():
+    fused = reciprocal_rank_fusion([[Document(page_content="x")], [Document(page_content="x")]], k=5)
+    assert len(fused) == 1
+
+
+@pytest.fixture
+def retriever_parts(tmp_path):
+    embeddings = HashingEmbeddings(dim=64)
+    index = NumpyVectorIndex(str(tmp_path / "vectors"), dim=64, indexed_fields=("section",))
+    index.create()
+    store = NumpyVectorStore(index, embeddings)
+    lexical = BM25Index(str(tmp_path / "lexical.json"))
+    ids = list(CHUNKS)
+    texts = [CHUNKS[i][0] for i in ids]
+    metadatas = [{"section": CHUNKS[i][1]} for i in ids]
+    store.add_texts(texts, metadatas, ids=ids)
+    for doc_id, text, metadata in zip(ids, texts, metadatas):
+        lexical.add(doc_id, text, metadata)
+    return store, lexical
+
+
+def test_bm25_matches_exact_terms(retriever_parts):
+    _, lexical = retriever_parts
+    assert lexical.search("COD", k=1)[0][0] == "cod"
+    assert lexical.search("zebra", k=3) == []
+
+
+def test_hybrid_retrieval_finds_exact_term_matches(retriever_parts):
+    store, lexical = retriever_parts
+    retriever = HybridRetriever(vectorstore=store, lexical_index=lexical, k=2, fetch_k=4)
+    docs = retriever.invoke("Is COD available?")
+    assert docs[0].metadata["_id"] == "cod"
+    assert len(docs) == 2
+
+
+def test_where_filter_applies_to_both_searches(retriever_parts):
+    store, lexical = retriever_parts
+    where = {"section": ["payments"]}
+    retriever = HybridRetriever(
+        vectorstore=store, lexical_index=lexical, k=4, fetch_k=4, where=where, vector_filter=where
+    )
+    docs = retriever.invoke("refund within 30 days")
+    assert docs
+    assert {d.metadata["section"] for d in docs} == {"payments"}
+
+
+def test_async_retrieval_matches_sync(retriever_parts):
+    store, lexical = retriever_parts
+    retriever = HybridRetriever(vectorstore=store, lexical_index=lexical, k=3, fetch_k=4)
+    sync_ids = [d.metadata["_id"] for d in retriever.invoke("credit cards")]
+    async_ids = [d.metadata["_id"] for d in asyncio.run(retriever.ainvoke("credit cards"))]
+    assert sync_ids == async_ids
@@ -0,0 +1,126 @@
+import uuid
+
+import fitz
+import pytest
+
+from rag.ingestion_manifest import IngestionManifest, chunk_point_id, hash_text
+from rag.ingestion_pipeline import CHUNKING_VERSION, IngestionPipeline
+from rag.stub_embeddings import HashingEmbeddings
+from rag.vector_backends import NumpyBackend
+
+REFUNDS = "Refunds reach the original payment method within seven days of pickup."
+EXCHANGES = "Exchanges are free for a different size of the same product."
+SHIPPING = "Orders ship within two business days from our warehouse."
+CARDS = "We accept every major credit and debit card at checkout."
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    def __init__(self):
+        super().__init__(dim=64)
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+def write_pdf(path, pages):
+    with fitz.open() as pdf:
+        for text in pages:
+            pdf.new_page().insert_text((72, 72), text)
+        pdf.save(str(path))
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    monkeypatch.setattr("rag.vector_backends.NUMPY_INDEX_DIR", str(tmp_path / "index"))
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    embeddings = CountingEmbeddings()
+    backend = NumpyBackend(embeddings)
+    backend.ensure_collection(dim=64)
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    pipeline = IngestionPipeline(embeddings, backend, manifest, progress_callback=None)
+    pipeline.max_workers = 1
+
+    def sync():
+        embeddings.embedded = 0
+        files = sorted(p.name for p in docs.glob("*.pdf"))
+        return pipeline.run(str(docs), files)
+
+    return docs, embeddings, backend, manifest, sync
+
+
+def stored(backend):
+    return {point_id: payload for point_id, payload in backend.iter_payloads()}
+
+
+def test_first_sync_embeds_every_chunk_under_a_uuid5_point_id(corpus):
+    docs, embeddings, backend, manifest, sync = corpus
+    write_pdf(docs / "returns.pdf", [REFUNDS, EXCHANGES])
+    write_pdf(docs / "shipping.pdf", [SHIPPING])
+
+    stats = sync()
+
+    assert (stats["files_changed"], stats["chunks_added"], embeddings.embedded) == (2, 3, 3)
+    assert backend.count() == 3
+    assert set(manifest.files) == {"returns.pdf", "shipping.pdf"}
+    assert manifest.chunking_version == CHUNKING_VERSION
+    for point_id, payload in stored(backend).items():
+        metadata = payload["metadata"]
+        assert uuid.UUID(point_id).version == 5
+        assert point_id == chunk_point_id(metadata["source"], hash_text(payload["page_content"]))
+        assert manifest.chunks(metadata["source"])[metadata["chunk_hash"]] == point_id
+
+
+def test_unchanged_files_are_not_embedded_again(corpus):
+    docs, embeddings, backend, manifest, sync = corpus
+    write_pdf(docs / "returns.pdf", [REFUNDS, EXCHANGES])
+    sync()
+    before = stored(backend)
+
+    stats = sync()
+
+    assert (stats["files_unchanged"], stats["chunks_added"], embeddings.embedded) == (1, 0, 0)
+    assert stored(backend) == before
+
+
+def test_moved_chunks_get_their_payload_rewritten_without_embedding(corpus):
+    docs, embeddings, backend, manifest, sync = corpus
+    write_pdf(docs / "returns.pdf", [REFUNDS, EXCHANGES])
+    sync()
+    ids_before = set(stored(backend))
+    fingerprint = manifest.fingerprint()
+
+    write_pdf(docs / "returns.pdf", [CARDS, REFUNDS, EXCHANGES])
+    stats = sync()
+
+    assert (stats["chunks_added"], stats["chunks_moved"], stats["chunks_deleted"]) == (1, 2, 0)
+    assert embeddings.embedded == 1
+    pages = {p["page_content"]: p["metadata"]["page"] for p in stored(backend).values()}
+    assert pages == {CARDS: 1, REFUNDS: 2, EXCHANGES: 3}
+    assert ids_before < set(stored(backend))
+    positions = manifest.chunk_positions("returns.pdf")
+    assert positions[hash_text(REFUNDS)]["page"] == 2
+    assert manifest.fingerprint() != fingerprint
+
+
+def test_edited_and_removed_files_delete_their_points(corpus):
+    docs, embeddings, backend, manifest, sync = corpus
+    write_pdf(docs / "returns.pdf", [REFUNDS, EXCHANGES])
+    write_pdf(docs / "shipping.pdf", [SHIPPING])
+    sync()
+
+    write_pdf(docs / "returns.pdf", [REFUNDS])
+    stats = sync()
+    assert (stats["files_changed"], stats["files_unchanged"], stats["chunks_deleted"]) == (1, 1, 1)
+    assert embeddings.embedded == 0
+    assert backend.count() == 2
+    assert set(manifest.chunks("returns.pdf")) == {hash_text(REFUNDS)}
+
+    (docs / "shipping.pdf").unlink()
+    stats = sync()
+    assert (stats["files_removed"], stats["chunks_deleted"]) == (1, 1)
+    assert [p["page_content"] for p in stored(backend).values()] == [REFUNDS]
+    assert set(manifest.files) == {"returns.pdf"}
+    assert IngestionManifest(manifest.path).files == manifest.files
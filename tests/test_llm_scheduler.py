@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import config
+from helper.llm_scheduler import (
+    LLMDeadlineExceeded,
+    LLMScheduler,
+    TokenBucket,
+    is_retryable,
+    stage_priority,
+)
+
+
+class FakeLLM:
+    """Fails with the queued errors first, then answers"""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return f"reply to {prompt}"
+
+    async def ainvoke(self, prompt):
+        return self.invoke(prompt)
+
+    def stream(self, prompt):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        yield "a"
+        yield "b"
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(config, "LLM_SCHEDULER_ENABLED", True)
+    monkeypatch.setattr(config, "LLM_RETRY_BASE_DELAY", 0.001)
+    monkeypatch.setattr(config, "LLM_RETRY_MAX_DELAY", 0.001)
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(per_minute=60, burst_seconds=2)
+    now = bucket.updated
+    assert bucket.capacity == 2
+    assert bucket.wait_time(2, now) == 0
+    bucket.take(2)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 1) == pytest.approx(0.0)
+
+
+def test_token_bucket_caps_oversized_requests_at_capacity():
+    bucket = TokenBucket(per_minute=60, burst_seconds=1)
+    now = bucket.updated
+    assert bucket.wait_time(1000, now) == 0
+    bucket.take(1000)
+    assert bucket.level == 0
+
+
+def test_is_retryable():
+    assert is_retryable(RuntimeError("429 Resource exhausted"))
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(ValueError("bad request"))
+    assert not is_retryable(LLMDeadlineExceeded())
+
+
+def test_stage_priority_uses_group_and_defaults_to_lowest():
+    assert stage_priority("generation.policy") == config.LLM_STAGE_PRIORITIES["generation"]
+    assert stage_priority("unknown") == max(config.LLM_STAGE_PRIORITIES.values())
+
+
+def test_invoke_retries_transient_errors():
+    llm = FakeLLM([RuntimeError("503 unavailable"), RuntimeError("rate limit")])
+    scheduler = LLMScheduler(requests_per_minute=6000, tokens_per_minute=10 ** 9)
+    assert scheduler.invoke(llm, "hi", "generation") == "reply to hi"
+    assert llm.calls == 3
+
+
+def test_invoke_raises_permanent_errors_without_retry():
+    llm = FakeLLM([ValueError("invalid argument")])
+    scheduler = LLMScheduler(requests_per_minute=6000, tokens_per_minute=10 ** 9)
+    with pytest.raises(ValueError):
+        scheduler.invoke(llm, "hi", "generation")
+    assert llm.calls == 1
+
+
+def test_stream_retries_only_before_first_chunk():
+    llm = FakeLLM([RuntimeError("429")])
+    scheduler = LLMScheduler(requests_per_minute=6000, tokens_per_minute=10 ** 9)
+    assert list(scheduler.stream(llm, "hi", "generation")) == ["a", "b"]
+    assert llm.calls == 2
+
+
+def test_acquire_times_out_when_quota_is_exhausted():
+    scheduler = LLMScheduler(requests_per_minute=60, tokens_per_minute=10 ** 9, burst_seconds=1)
+    scheduler.acquire("generation", 1, time.monotonic() + 1)
+    with pytest.raises(LLMDeadlineExceeded):
+        scheduler.acquire("generation", 1, time.monotonic() + 0.05)
+    # The expired waiter left the queue
+    assert scheduler._queue == []
+
+
+def test_higher_priority_waiters_are_admitted_first():
+    scheduler = LLMScheduler(requests_per_minute=600, tokens_per_minute=10 ** 9, burst_seconds=0.1)
+    scheduler.acquire("generation", 1, time.monotonic() + 1)  # drain the single-request bucket
+    admitted = []
+
+    def call(stage):
+        scheduler.acquire(stage, 1, time.monotonic() + 5)
+        admitted.append(stage)
+
+    threads = [threading.Thread(target=call, args=(stage,)) for stage in ("rewrite", "planner", "generation")]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)  # queue them in this order
+    for thread in threads:
+        thread.join()
+    assert admitted == ["generation", "planner", "rewrite"]
+
+
+def test_ainvoke_retries_transient_errors():
+    llm = FakeLLM([ConnectionError("reset")])
+    scheduler = LLMScheduler(requests_per_minute=6000, tokens_per_minute=10 ** 9)
+    assert asyncio.run(scheduler.ainvoke(llm, "hi", "planner")) == "reply to hi"
+    assert llm.calls == 2
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from helper import helpers
+from helper.order_responses import (
+    MISSING_ORDER_ID_MESSAGE,
+    format_date,
+    normalize_order_ids,
+    order_not_found_message,
+    render_order_status,
+    render_orders_reply,
+)
+
+
+def order(order_id="ABC-123", status="shipped", tracking_number="TRK1", estimated_delivery="2025-08-29"):
+    return {
+        "order_id": order_id,
+        "product_name": "Wireless Headphones",
+        "status": status,
+        "tracking_number": tracking_number,
+        "estimated_delivery": estimated_delivery,
+    }
+
+
+@pytest.mark.parametrize("row, expected", [
+    (
+        order(status="processing", tracking_number=None),
+        "Your order ABC-123 (Wireless Headphones) is being processed and will ship soon. "
+        "Estimated delivery is August 29, 2025.",
+    ),
+    (
+        order(status="shipped"),
+        "Good news! Your order ABC-123 (Wireless Headphones) has shipped. "
+        "Your tracking number is TRK1. Estimated delivery is August 29, 2025.",
+    ),
+    (
+        order(status="Shipped", tracking_number=None, estimated_delivery=None),
+        "Good news! Your order ABC-123 (Wireless Headphones) has shipped.",
+    ),
+    (
+        order(status="delivered"),
+        "Your order ABC-123 (Wireless Headphones) has been delivered. Your tracking number is TRK1. "
+        "It was scheduled to arrive on August 29, 2025. We hope you enjoy it!",
+    ),
+    (
+        order(status="cancelled", tracking_number=None, estimated_delivery=None),
+        "Your order ABC-123 (Wireless Headphones) has been cancelled. "
+        "If you didn't request this, please contact our support team.",
+    ),
+    (
+        order(status="on_hold", tracking_number="TRK1", estimated_delivery="soon"),
+        "The current status of your order ABC-123 (Wireless Headphones) is: on_hold.",
+    ),
+    (
+        {"order_id": "ABC-123", "status": None, "product_name": None},
+        "The current status of your order ABC-123 (your item) is: unknown.",
+    ),
+])
+def test_render_order_status(row, expected):
+    assert render_order_status(row) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2025-09-04", "September 4, 2025"),
+    ("next week", "next week"),
+    (None, None),
+    ("", None),
+])
+def test_format_date(value, expected):
+    assert format_date(value) == expected
+
+
+@pytest.mark.parametrize("order_ids, found, expected", [
+    (["ABC-123"], ["ABC-123"], [render_order_status(order())]),
+    (["NOP-000"], [], [order_not_found_message("NOP-000")]),
+    ([], [], [MISSING_ORDER_ID_MESSAGE]),
+    (
+        ["XYZ-456", "NOP-000", "ABC-123"],
+        ["ABC-123", "XYZ-456"],
+        [
+            render_order_status(order("XYZ-456")),
+            order_not_found_message("NOP-000"),
+            render_order_status(order("ABC-123")),
+        ],
+    ),
+])
+def test_render_orders_reply_keeps_the_requested_order(order_ids, found, expected):
+    orders = {order_id: order(order_id) for order_id in found}
+    assert render_orders_reply(order_ids, orders) == "\n\n".join(expected)
+
+
+@pytest.mark.parametrize("order_ids, expected", [
+    ("abc-123", ["ABC-123"]),
+    (" ABC-123 ", ["ABC-123"]),
+    (["xyz-456", "ABC-123"], ["XYZ-456", "ABC-123"]),
+    (["abc-123", "ABC-123", "xyz-456", "Abc-123"], ["ABC-123", "XYZ-456"]),
+    (("DEF-789", "", "  ", "DEF-789"), ["DEF-789"]),
+    ([], []),
+    (None, []),
+    ("", []),
+])
+def test_normalize_order_ids(order_ids, expected):
+    assert normalize_order_ids(order_ids) == expected
+
+
+@pytest.mark.parametrize("llm_phrasing", [False, True])
+@pytest.mark.parametrize("order_ids", [[], None, "", ["  "]])
+def test_order_status_without_an_order_id_asks_for_one(monkeypatch, order_ids, llm_phrasing):
+    def lookup_orders(order_ids):
+        raise AssertionError("no lookup without an order ID")
+
+    monkeypatch.setattr(helpers, "lookup_orders", lookup_orders)
+    monkeypatch.setattr(helpers.config, "ORDER_STATUS_LLM_PHRASING", llm_phrasing)
+    assert helpers.get_product_status.func(order_ids) == MISSING_ORDER_ID_MESSAGE
+    assert list(helpers.stream_product_status(order_ids)) == [MISSING_ORDER_ID_MESSAGE]
+    assert asyncio.run(helpers.aget_product_status(order_ids)) == MISSING_ORDER_ID_MESSAGE
+    assert "ABC-123" in MISSING_ORDER_ID_MESSAGE
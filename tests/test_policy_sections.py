@@ -0,0 +1,138 @@
+import pytest
+
+from config import POLICY_SECTIONS, SECTION_HEADING_MAX_CHARS
+from rag.lexical_index import BM25Index
+from rag.policy_sections import (
+    GENERAL_SECTION,
+    clean_heading,
+    is_heading,
+    query_sections,
+    section_for_heading,
+    split_sections,
+)
+from rag.rag_manager import RAGManager
+from rag.stub_embeddings import HashingEmbeddings
+from rag.vector_backends import NumpyBackend
+
+PAGES = [
+    (1, "Welcome to our store policies.\n\U0001f501 Returns & Exchanges\nItems can be returned within 30 days."),
+    (2, "Refunds are issued within 7 days.\n\u200b\U0001f4de Contact Us\nEmail us at any time."),
+    (3, "Cash On Delivery\nCOD is available for orders under $500.\nAbout Our Company\nWe were founded in 2015."),
+]
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("\U0001f69a Shipping Policy", True),
+    ("\u200b\U0001f501 Returns & Exchanges", True),
+    ("Returns And Refunds", True),
+    ("Payment Options (2025)", True),
+    ("Returns and refunds", False),
+    ("Items can be returned within 30 days.", False),
+    ("Refund Policy:", False),
+    ("• Free Returns", False),
+    ("- Free Returns", False),
+    ("2025", False),
+    ("\U0001f4e6 2025", False),
+    ("   ", False),
+    ("One Two Three Four Five Six Seven Eight", True),
+    ("One Two Three Four Five Six Seven Eight Nine", False),
+])
+def test_is_heading(line, expected):
+    assert is_heading(line) is expected
+
+
+def test_headings_are_capped_at_the_configured_length():
+    heading = "Shipping " + "X" * (SECTION_HEADING_MAX_CHARS - len("Shipping "))
+    assert len(heading) == SECTION_HEADING_MAX_CHARS
+    assert is_heading(heading)
+    assert not is_heading(heading + "X")
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("\U0001f501 Returns & Exchanges", "Returns & Exchanges"),
+    ("\u200b\U0001f4de  Contact Us ", "Contact Us"),
+    ("Shipping Policy", "Shipping Policy"),
+])
+def test_clean_heading_strips_leading_symbols(line, expected):
+    assert clean_heading(line) == expected
+
+
+@pytest.mark.parametrize("topic", list(POLICY_SECTIONS))
+def test_every_configured_stem_maps_a_heading_to_its_topic(topic):
+    for stem in POLICY_SECTIONS[topic]:
+        assert section_for_heading(f"About {stem.title()}ing") == topic
+
+
+@pytest.mark.parametrize("heading, expected", [
+    ("Returns & Exchanges", "returns"),
+    ("Refunds For Cancelled Orders", "returns"),
+    ("Order Cancellation", "cancellation"),
+    ("Cash On Delivery", "shipping"),
+    ("Accepted Cards", "payments"),
+    ("Invoices", "billing"),
+    ("Contact Us", "support"),
+    ("About Our Company", GENERAL_SECTION),
+    ("Overview", GENERAL_SECTION),
+])
+def test_section_for_heading_uses_the_first_matching_topic(heading, expected):
+    assert section_for_heading(heading) == expected
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("How do I cancel my order and get a refund?", ["returns", "cancellation"]),
+    ("Do you take UPI payments?", ["payments"]),
+    ("Do you deliver internationally?", ["shipping"]),
+    ("What are your support hours?", ["support"]),
+    ("Hello there", []),
+    ("", []),
+])
+def test_query_sections(query, expected):
+    assert query_sections(query) == expected
+
+
+def test_split_sections_carries_headings_across_pages():
+    parts = [(p.page, p.heading, p.section, p.text) for p in split_sections(PAGES)]
+    assert parts == [
+        (1, None, GENERAL_SECTION, "Welcome to our store policies."),
+        (1, "Returns & Exchanges", "returns",
+         "\U0001f501 Returns & Exchanges\nItems can be returned within 30 days."),
+        (2, "Returns & Exchanges", "returns", "Refunds are issued within 7 days."),
+        (2, "Contact Us", "support", "\u200b\U0001f4de Contact Us\nEmail us at any time."),
+        (3, "Cash On Delivery", "shipping", "Cash On Delivery\nCOD is available for orders under $500."),
+        (3, "About Our Company", GENERAL_SECTION, "About Our Company\nWe were founded in 2015."),
+    ]
+
+
+@pytest.fixture
+def rag_manager(tmp_path, monkeypatch):
+    monkeypatch.setattr("rag.vector_backends.NUMPY_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(RAGManager, "initialize_rag", lambda self: None)
+    manager = RAGManager()
+    manager.embedding_model = HashingEmbeddings(dim=64)
+    manager.backend = NumpyBackend(manager.embedding_model)
+    manager.backend.ensure_collection(dim=64)
+    manager.vectorstore = manager.backend.as_vectorstore()
+    manager.lexical_index = BM25Index(str(tmp_path / "lexical.json"))
+
+    parts = list(split_sections(PAGES))
+    ids = [f"chunk-{n}" for n in range(len(parts))]
+    texts = [part.text for part in parts]
+    metadatas = [{"section": part.section, "page": part.page} for part in parts]
+    manager.vectorstore.add_texts(texts, metadatas, ids=ids)
+    for point_id, text, metadata in zip(ids, texts, metadatas):
+        manager.lexical_index.add(point_id, text, metadata)
+    return manager
+
+
+def test_retrieval_is_limited_to_the_query_sections(rag_manager):
+    docs = rag_manager.retrieve("How long do refunds take?")
+    assert docs
+    assert {doc.metadata["section"] for doc in docs} == {"returns"}
+
+
+def test_retrieval_falls_back_to_every_section_when_the_filter_finds_nothing(rag_manager):
+    assert rag_manager.sections_for("Can I pay with a wallet?") == ["payments"]
+    docs = rag_manager.retrieve("Can I pay with a wallet?")
+    unfiltered = rag_manager.retrieve("Can I pay with a wallet?", sections=[])
+    assert docs
+    assert [doc.page_content for doc in docs] == [doc.page_content for doc in unfiltered]
@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+import config
+from rag.semantic_cache import SemanticCache
+from rag.stub_embeddings import HashingEmbeddings
+
+embeddings = HashingEmbeddings(dim=256)
+
+
+def make_cache(db_path=None, embedding_model="stub", **overrides):
+    settings = {
+        "similarity_threshold": config.SEMANTIC_CACHE_SIMILARITY_THRESHOLD,
+        "max_entries": config.SEMANTIC_CACHE_MAX_ENTRIES,
+        "ttl_seconds": config.SEMANTIC_CACHE_TTL_SECONDS,
+        **overrides,
+    }
+    return SemanticCache(db_path=db_path, embedding_model=embedding_model, **settings)
+
+
+def put(cache, query, answer):
+    cache.put(query, embeddings.embed_query(query), answer)
+
+
+def get(cache, query):
+    return cache.get(query, embeddings.embed_query(query))
+
+
+def test_exact_and_close_queries_hit():
+    cache = make_cache(similarity_threshold=0.8)
+    put(cache, "What is the return policy for shoes?", "30 days.")
+    assert get(cache, "what is the  RETURN policy for shoes?") == "30 days."
+    assert get(cache, "What is the return policy for shoes") == "30 days."
+    assert get(cache, "Do you ship to Canada?") is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    cache = make_cache(ttl_seconds=60)
+    put(cache, "How do refunds work?", "To the original payment method.")
+    later = time.time() + 61
+    monkeypatch.setattr("rag.semantic_cache.time.time", lambda: later)
+    assert get(cache, "How do refunds work?") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted_at_max_entries():
+    cache = make_cache()
+    limit = config.SEMANTIC_CACHE_MAX_ENTRIES
+    for n in range(limit):
+        put(cache, f"question {n}", f"answer {n}")
+    assert get(cache, "question 0") == "answer 0"
+    put(cache, "one more question", "answer")
+    assert cache.stats()["entries"] == limit
+    assert cache.evictions == 1
+    assert get(cache, "question 0") == "answer 0"
+    assert get(cache, "question 1") is None
+
+
+def test_set_corpus_drops_answers_from_another_corpus():
+    cache = make_cache()
+    cache.set_corpus("corpus-1")
+    put(cache, "Is COD available?", "Yes.")
+    cache.set_corpus("corpus-1")
+    assert get(cache, "Is COD available?") == "Yes."
+    cache.set_corpus("corpus-2")
+    assert get(cache, "Is COD available?") is None
+    assert cache.invalidations == 1
+
+
+def test_sqlite_entries_survive_a_new_instance(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    first = make_cache(db_path)
+    first.set_corpus("corpus-1")
+    put(first, "How long is shipping?", "5-7 business days.")
+
+    second = make_cache(db_path)
+    assert get(second, "How long is shipping?") == "5-7 business days."
+    second.set_corpus("corpus-1")
+    assert get(second, "How long is shipping?") == "5-7 business days."
+
+    second.set_corpus("corpus-2")
+    assert get(make_cache(db_path), "How long is shipping?") is None
+
+
+@pytest.mark.parametrize("other_model", ["another-model", None])
+def test_sqlite_cache_from_another_embedding_model_starts_empty(tmp_path, other_model):
+    db_path = str(tmp_path / "cache.db")
+    put(make_cache(db_path), "How long is shipping?", "5-7 business days.")
+    assert get(make_cache(db_path, embedding_model=other_model), "How long is shipping?") is None
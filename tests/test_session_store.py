@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from api.session_store import InMemorySessionStore, SessionStore, SQLiteSessionStore, create_session_store
+from services.conversation_state import ConversationState
+
+
+def state_with_turn(query="Where is ABC-123?"):
+    state = ConversationState()
+    state.record_turn(query, "Shipped.", ["get_product_status"])
+    return state
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemorySessionStore(max_sessions=100, ttl_seconds=60)
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl_seconds=60)
+
+
+def test_save_load_delete(store):
+    assert store.load("s1") is None
+    store.save("s1", state_with_turn())
+    loaded = store.load("s1")
+    assert loaded.active_order_ids == ["ABC-123"]
+    assert loaded.turn_count == 1
+    assert len(store) == 1
+    assert store.delete("s1")
+    assert not store.delete("s1")
+    assert store.load("s1") is None
+
+
+def test_sessions_are_independent(store):
+    store.save("a", state_with_turn("Where is ABC-111?"))
+    store.save("b", state_with_turn("Where is XYZ-222?"))
+    assert store.load("a").active_order_ids == ["ABC-111"]
+    assert store.load("b").active_order_ids == ["XYZ-222"]
+
+
+def test_expired_sessions_are_not_loaded(tmp_path, monkeypatch):
+    for store in (InMemorySessionStore(ttl_seconds=10), SQLiteSessionStore(str(tmp_path / "s.db"), ttl_seconds=10)):
+        store.save("old", state_with_turn())
+        later = time.time() + 11
+        monkeypatch.setattr("api.session_store.time.time", lambda: later)
+        assert store.load("old") is None
+        monkeypatch.undo()
+
+
+def test_in_memory_store_evicts_least_recently_used():
+    store = InMemorySessionStore(max_sessions=2, ttl_seconds=60)
+    store.save("a", ConversationState())
+    store.save("b", ConversationState())
+    store.load("a")
+    store.save("c", ConversationState())
+    assert store.load("b") is None
+    assert store.load("a") is not None
+    assert len(store) == 2
+
+
+def test_sqlite_store_is_shared_between_instances_and_threads(tmp_path):
+    path = str(tmp_path / "shared.db")
+    writer = SQLiteSessionStore(path)
+    reader = SQLiteSessionStore(path)
+    threads = [threading.Thread(target=writer.save, args=(f"s{n}", state_with_turn())) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(reader) == 8
+    assert reader.load("s3").active_order_ids == ["ABC-123"]
+
+
+def test_create_session_store_rejects_unknown_kinds():
+    assert isinstance(create_session_store("memory"), InMemorySessionStore)
+    with pytest.raises(ValueError):
+        create_session_store("redis")
+
+
+def test_session_store_requires_every_method():
+    class LoadOnlyStore(SessionStore):
+        def load(self, session_id):
+            return None
+
+    with pytest.raises(TypeError):
+        SessionStore()
+    with pytest.raises(TypeError):
+        LoadOnlyStore()
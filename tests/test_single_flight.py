@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from helper.single_flight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = []
+    started = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        leader = executor.submit(flight.do, "key", slow)
+        started.wait()
+        followers = [executor.submit(flight.do, "key", slow) for _ in range(4)]
+        results = [leader.result()] + [f.result() for f in followers]
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.in_flight() == 0
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight("test")
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+
+
+def test_sequential_calls_run_again():
+    flight = SingleFlight("test")
+    calls = []
+    flight.do("key", lambda: calls.append(1))
+    flight.do("key", lambda: calls.append(1))
+    assert len(calls) == 2
+
+
+def test_followers_receive_the_leaders_exception():
+    flight = SingleFlight("test")
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.05)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flight.do, "key", failing)
+        started.wait()
+        follower = executor.submit(flight.do, "key", lambda: "never")
+        with pytest.raises(ValueError):
+            leader.result()
+        with pytest.raises(ValueError):
+            follower.result()
+
+
+def test_stream_followers_get_the_full_text():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    started = threading.Event()
+
+    def tokens():
+        started.set()
+        release.wait()
+        yield "hel"
+        yield "lo"
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(lambda: list(flight.stream("key", tokens)))
+        started.wait()
+        follower = executor.submit(lambda: list(flight.stream("key", tokens)))
+        time.sleep(0.02)
+        release.set()
+        assert leader.result() == ["hel", "lo"]
+        assert follower.result() == ["hello"]
+
+
+def test_stream_follower_recomputes_when_leader_stops_early():
+    flight = SingleFlight("test")
+    leader_stream = flight.stream("key", lambda: iter(["a", "b"]))
+    assert next(leader_stream) == "a"
+    follower_result = []
+    follower = threading.Thread(target=lambda: follower_result.extend(flight.stream("key", lambda: iter(["c"]))))
+    follower.start()
+    time.sleep(0.02)
+    leader_stream.close()
+    follower.join(timeout=1)
+    assert follower_result == ["c"]
+
+
+def test_async_calls_share_one_execution():
+    flight = AsyncSingleFlight("test")
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", slow) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["result"] * 5
+    assert len(calls) == 1
+
+
+def test_async_follower_cancellation_does_not_cancel_the_leader():
+    flight = AsyncSingleFlight("test")
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        leader = asyncio.create_task(flight.do("key", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("key", slow))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        return await leader
+
+    assert asyncio.run(main()) == "result"
@@ -0,0 +1,85 @@
+import csv
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from db.structured_database_manager import ORDER_COLUMNS, DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager(recreate=True, db_path=str(tmp_path / "orders.db"), pool_size=2)
+    yield manager
+    manager.close()
+
+
+def write_csv(path, rows, columns=ORDER_COLUMNS):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(rows)
+
+
+@pytest.mark.parametrize("order_ids, found", [
+    (["ABC-123", "DEF-789"], {"ABC-123", "DEF-789"}),
+    (["NOP-000", "QQQ-111"], set()),
+    (["ABC-123", "NOP-000", "MNO-678"], {"ABC-123", "MNO-678"}),
+    ([], set()),
+])
+def test_get_orders_returns_only_found_orders(db, order_ids, found):
+    orders = db.get_orders(order_ids)
+    assert set(orders) == found
+    for order_id, order in orders.items():
+        assert order == db.get_order(order_id)
+
+
+def test_get_orders_splits_long_id_lists(db, monkeypatch):
+    monkeypatch.setattr("db.structured_database_manager.ORDER_LOOKUP_CHUNK_SIZE", 2)
+    order_ids = ["ABC-123", "NOP-000", "XYZ-456", "DEF-789", "STU-234"]
+    assert set(db.get_orders(order_ids)) == {"ABC-123", "XYZ-456", "DEF-789", "STU-234"}
+
+
+def test_get_orders_handles_more_ids_than_sqlite_variables(db):
+    order_ids = [f"ZZZ-{n:05d}" for n in range(40000)] + ["GHI-012"]
+    assert set(db.get_orders(order_ids)) == {"GHI-012"}
+
+
+def test_concurrent_lookups_share_the_pool(db):
+    order_ids = ["ABC-123", "XYZ-456", "DEF-789", "NOP-000"] * 50
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        statuses = list(executor.map(db.get_order_status, order_ids))
+        batches = list(executor.map(lambda _: db.get_orders(order_ids[:4]), range(50)))
+    assert statuses == ["shipped", "processing", "delivered", None] * 50
+    assert all(set(batch) == {"ABC-123", "XYZ-456", "DEF-789"} for batch in batches)
+    assert db.pool._opened <= db.pool.size
+
+
+def test_get_orders_by_email_newest_first(db, tmp_path):
+    write_csv(tmp_path / "orders.csv", [
+        ("NEW-001", "John Doe", "john@email.com", "Charger", 1, 9.99, "2025-09-01", "processing", "", ""),
+    ])
+    db.bulk_load_csv(str(tmp_path / "orders.csv"))
+    orders = db.get_orders_by_email("john@email.com")
+    assert [order["order_id"] for order in orders] == ["NEW-001", "ABC-123"]
+    assert db.get_orders_by_email("nobody@email.com") == []
+
+
+def test_bulk_load_csv_inserts_and_replaces_in_batches(db, tmp_path):
+    write_csv(tmp_path / "orders.csv", [
+        ("NEW-001", "Ann Lee", "ann@email.com", "Desk Lamp", 1, 24.5, "2025-09-01", "processing", "", ""),
+        ("NEW-002", "Ann Lee", "ann@email.com", "Monitor", 1, 199.0, "2025-09-02", "shipped", "TRK1", "2025-09-09"),
+        ("ABC-123", "John Doe", "john@email.com", "Wireless Headphones", 1, 99.99, "2025-08-14", "delivered",
+         "TRK123456789", "2025-08-29"),
+    ])
+    assert db.bulk_load_csv(str(tmp_path / "orders.csv"), batch_size=2) == 3
+    new_order = db.get_order("NEW-001")
+    assert (new_order["quantity"], new_order["total_amount"], new_order["tracking_number"]) == (1, 24.5, None)
+    assert db.get_order_status("NEW-002") == "shipped"
+    assert db.get_order_status("ABC-123") == "delivered"
+
+
+def test_bulk_load_csv_rejects_missing_columns(db, tmp_path):
+    write_csv(tmp_path / "orders.csv", [("NEW-001", "shipped")], columns=("order_id", "status"))
+    with pytest.raises(ValueError, match="missing columns"):
+        db.bulk_load_csv(str(tmp_path / "orders.csv"))
+    assert db.get_order("NEW-001") is None
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from rag.vector_index import MIN_RUN_ROWS, NumpyVectorIndex
+
+
+def payload(section, text="chunk"):
+    return {"page_content": text, "metadata": {"section": section}}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path / "index"), dim=3, initial_capacity=2, indexed_fields=("section",))
+    index.create()
+    return index
+
+
+def test_search_ranks_by_cosine_similarity(index):
+    index.upsert(["x", "y", "z"], [[1, 0, 0], [0, 1, 0], [1, 1, 0]], [payload("a")] * 3)
+    results = index.search([1, 0.1, 0], k=2)
+    assert [point_id for point_id, _, _ in results] == ["x", "z"]
+    assert results[0][1] == pytest.approx(1 / np.sqrt(1.01), rel=1e-5)
+
+
+def test_upsert_overwrites_existing_points(index):
+    index.upsert(["x"], [[1, 0, 0]], [payload("a", "old")])
+    index.upsert(["x"], [[0, 1, 0]], [payload("b", "new")])
+    assert index.count() == 1
+    point_id, score, stored = index.search([0, 1, 0], k=1)[0]
+    assert (point_id, stored["page_content"]) == ("x", "new")
+    assert score == pytest.approx(1.0)
+    assert index.search([0, 1, 0], k=1, where={"section": ["a"]}) == []
+
+
+def test_grows_past_initial_capacity(index):
+    vectors = np.eye(3).tolist() * 4
+    index.upsert([f"p{i}" for i in range(12)], vectors, [payload("a")] * 12)
+    assert index.count() == 12
+    assert index._capacity >= 12
+    assert len(index._alive) == index._capacity
+
+
+def test_delete_and_compact(index):
+    index.upsert(["x", "y", "z"], [[1, 0, 0], [0, 1, 0], [0, 0, 1]], [payload("a")] * 3)
+    index.delete(["x"])
+    assert index.count() == 2
+    assert "x" not in [point_id for point_id, _, _ in index.search([1, 0, 0], k=3)]
+    index.compact()
+    assert index.count() == 2
+    assert [point_id for point_id, _, _ in index.search([0, 0, 1], k=1)] == ["z"]
+
+
+def test_filtered_search_only_scores_matching_rows(index):
+    index.upsert(
+        ["a1", "b1", "a2"], [[1, 0, 0], [1, 0, 0], [0, 1, 0]], [payload("a"), payload("b"), payload("a")]
+    )
+    results = index.search([1, 0, 0], k=3, where={"section": ["b"]})
+    assert [point_id for point_id, _, _ in results] == ["b1"]
+    results = index.search([1, 0, 0], k=3, where={"section": ["a", "b"]})
+    assert {point_id for point_id, _, _ in results} == {"a1", "b1", "a2"}
+
+
+def test_filtered_search_over_contiguous_runs_matches_full_scan(index):
+    rng = np.random.default_rng(0)
+    n = MIN_RUN_ROWS * 8
+    vectors = rng.normal(size=(n, 3))
+    sections = ["a" if (i // (MIN_RUN_ROWS * 2)) % 2 else "b" for i in range(n)]
+    index.upsert([f"p{i}" for i in range(n)], vectors.tolist(), [payload(s) for s in sections])
+    query = rng.normal(size=3)
+    filtered = index.search(query, k=5, where={"section": ["a"]})
+    expected = [r for r in index.search(query, k=n) if r[2]["metadata"]["section"] == "a"][:5]
+    assert [r[0] for r in filtered] == [r[0] for r in expected]
+
+
+def test_unindexed_field_filter_falls_back_to_payload_scan(index):
+    index.upsert(["x", "y"], [[1, 0, 0], [1, 0, 0]], [
+        {"metadata": {"section": "a", "page": 1}}, {"metadata": {"section": "a", "page": 2}},
+    ])
+    assert [r[0] for r in index.search([1, 0, 0], k=2, where={"page": [2]})] == ["y"]
+
+
+def test_set_payload_reindexes_fields(index):
+    index.upsert(["x"], [[1, 0, 0]], [payload("a")])
+    index.set_payload(["x", "missing"], [payload("b"), payload("c")])
+    assert index.search([1, 0, 0], k=1, where={"section": ["a"]}) == []
+    assert [r[0] for r in index.search([1, 0, 0], k=1, where={"section": ["b"]})] == ["x"]
+    assert index.count() == 1
+
+
+def test_save_and_load_round_trip(index, tmp_path):
+    index.upsert(["x", "y"], [[1, 0, 0], [0, 1, 0]], [payload("a"), payload("b")])
+    index.delete(["x"])
+    index.save()
+    loaded = NumpyVectorIndex(index.index_dir, dim=3, initial_capacity=2, indexed_fields=("section",))
+    loaded.load()
+    assert loaded.count() == 1
+    assert [r[0] for r in loaded.search([0, 1, 0], k=2, where={"section": ["b"]})] == ["y"]
+    loaded.upsert(["z"], [[0, 0, 1]], [payload("a")])
+    assert [r[0] for r in loaded.search([0, 0, 1], k=1)] == ["z"]
+
+
+def test_load_rejects_other_dimensions(index):
+    index.save()
+    with pytest.raises(ValueError):
+        NumpyVectorIndex(index.index_dir, dim=4).load()